@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 
+from griot_backend.managers import ActiveManager
+
 
 class Account(models.Model):
     owner_user = models.ForeignKey(User, related_name="owned_accounts", on_delete=models.CASCADE)
@@ -11,5 +14,15 @@ class Account(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = models.Manager()
+    # Live rows only, what the partial indexes below cover
+    active = ActiveManager()
+
     def __str__(self):
         return self.name
+
+    class Meta:
+        indexes = [
+            # The ACL is built from the accounts a user owns or is a beloved one of
+            models.Index(fields=['owner_user'], condition=Q(is_active=True), name='account_owner_active_idx'),
+        ]
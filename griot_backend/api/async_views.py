@@ -0,0 +1,48 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+
+
+class AsyncAPIViewMixin:
+    """
+    Lets DRF views define ``async def`` handlers. Authentication, permission
+    checks and throttling still run DRF's sync code, in the request's database
+    thread, so they keep working with the ORM and the token cache.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def get_request_data(self):
+        # Parsing reads the (possibly spooled to disk) body, keep it off the event loop
+        return await sync_to_async(lambda: self.request.data)()
+
+
+async def save_file(field, content):
+    """
+    Stores an uploaded file for a model FileField and returns its storage name.
+    Runs outside the request's database thread because remote storages block
+    on the network for the whole upload.
+    """
+    name = field.generate_filename(None, content.name)
+    return await sync_to_async(field.storage.save, thread_sensitive=False)(name, content, max_length=field.max_length)
@@ -0,0 +1,9 @@
+from django.db import connection
+
+
+def run_in_background(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Every worker thread opens its own connection, release it between tasks
+        connection.close()
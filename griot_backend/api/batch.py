@@ -0,0 +1,89 @@
+"""
+Runs the sub-requests of ``/api/batch/`` inside the batch request. Each one
+goes straight to its view, without the middleware, with the batch's user and
+token instead of being authenticated again.
+"""
+import asyncio
+import io
+import logging
+from urllib.parse import unquote_to_bytes, urlsplit
+
+import orjson
+from asgiref.sync import async_to_sync
+from django.core.handlers.wsgi import WSGIRequest
+from django.urls import Resolver404, resolve, reverse
+from rest_framework import status
+from rest_framework.response import Response
+
+from griot_backend import replicas
+
+# Parts of the batch request that don't carry over to its sub-requests, nor do its If-* headers
+DROPPED_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING', 'HTTP_COOKIE', 'HTTP_AUTHORIZATION')
+# Sub-requests can't set these, the batch decides them
+RESERVED_HEADERS = ('authorization', 'cookie', 'content-type', 'content-length', 'content-encoding', 'host')
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control', 'Location', 'Retry-After')
+
+logger = logging.getLogger(__name__)
+
+
+def get_api_prefix():
+    return reverse('batch').rstrip('/').rsplit('/', 1)[0] + '/'
+
+
+def build_request(request, method, path, body=None, headers=None):
+    url = urlsplit(path)
+    content = b'' if body is None else orjson.dumps(body)
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in DROPPED_META and not key.startswith('HTTP_IF_')
+    }
+    environ.update({
+        'REQUEST_METHOD': method,
+        # What a WSGI server would pass: percent-decoded, bytes as latin-1
+        'PATH_INFO': unquote_to_bytes(url.path).decode('iso-8859-1'),
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    sub_request = WSGIRequest(environ)
+    # Read by DRF's Request in place of its authenticators
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def dispatch(request, method, path, body=None, headers=None):
+    """Runs one sub-request and returns its status, headers and body."""
+    prefix = get_api_prefix()
+    sub_request = build_request(request, method, path, body, headers)
+    try:
+        match = None if not sub_request.path_info.startswith(prefix) else resolve(sub_request.path_info)
+    except Resolver404:
+        match = None
+    if match is None or match.url_name == 'batch':
+        return {'status': status.HTTP_404_NOT_FOUND, 'headers': {}, 'body': {'detail': 'Not found.'}}
+    sub_request.resolver_match = match
+
+    try:
+        with replicas.routing(sub_request):
+            if asyncio.iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(sub_request, *match.args, **match.kwargs)
+            else:
+                response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        # A server error fails its own entry, not the sub-requests already run
+        logger.exception('Batch sub-request %s %s failed', method, path)
+        return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'headers': {}, 'body': {'detail': 'Internal server error.'}}
+
+    headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+    if isinstance(response, Response):
+        # Rendered once, together with the other responses
+        body = response.data
+    else:
+        headers['Content-Type'] = response['Content-Type']
+        body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'headers': headers, 'body': body}
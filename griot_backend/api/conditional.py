@@ -0,0 +1,75 @@
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from griot_backend.media_urls import get_url_version
+
+
+def get_versions(queryset, *relations, **extra):
+    """
+    Returns the row count and latest ``updated_at`` of the queryset and of each
+    related table, computed in a single aggregate query. ``extra`` aggregates
+    are computed in the same query and their values come last.
+    """
+    aggregates = {'count': Count('pk', distinct=True), 'latest': Max('updated_at')}
+    for relation in relations:
+        aggregates[f'{relation}_count'] = Count(f'{relation}__pk', distinct=True)
+        aggregates[f'{relation}_latest'] = Max(f'{relation}__updated_at')
+    aggregates.update(extra)
+    versions = queryset.order_by().aggregate(**aggregates)
+    return [versions[name] for name in aggregates]
+
+
+def strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    # If-None-Match uses the weak comparison
+    return '*' in etags or strip_weak(etag) in [strip_weak(tag) for tag in etags]
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETags for GET responses. ``get_etag_parts()`` returns cheap version
+    information (ids, ``updated_at``, row counts) that changes whenever the
+    serialized body would, so a request with a matching If-None-Match gets a
+    304 before anything is serialized.
+    """
+
+    def get_etag_parts(self):
+        raise NotImplementedError('`get_etag_parts()` must be implemented.')
+
+    def get_etag(self, request):
+        parts = [
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            get_url_version(default_storage),
+            *self.get_etag_parts(),
+        ]
+        return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def get_object(self):
+        # The ETag and the response use the same object
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            # Clients may keep the body but must revalidate it, shared caches must not keep it
+            response['Cache-Control'] = 'private, no-cache'
+        return response
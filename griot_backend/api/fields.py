@@ -0,0 +1,35 @@
+from django.db import models
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from griot_backend.media_urls import get_file_url
+
+
+class MediaURLMixin:
+    """Renders file URLs through the media URL cache instead of signing each time."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        url = get_file_url(value)
+        request = self.context.get('request', None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class MediaFileField(MediaURLMixin, serializers.FileField):
+    pass
+
+
+class MediaImageField(MediaURLMixin, serializers.ImageField):
+    pass
+
+
+MEDIA_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.FileField: MediaFileField,
+    models.ImageField: MediaImageField,
+}
@@ -0,0 +1,160 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from .loaders import LoadedListField
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+class Fieldset:
+    """
+    The fields a request asked for, as a tree: ``?fields=id,videos.url``
+    keeps ``id`` and ``videos``, and only ``url`` of each video.
+
+    ``fields`` is None when the request named no fields at this level, then
+    every field is kept except the expandable ones (Meta.expandable_fields),
+    which cost a query of their own and are kept only when expanded.
+    """
+
+    def __init__(self, path=''):
+        # Dotted path from the top-level serializer, for error messages
+        self.path = path
+        self.fields = None
+        self.expand = set()
+        self.nested = {}
+
+    def get(self, name):
+        return self.nested.get(name) or Fieldset(f'{self.path}{name}.')
+
+    def add(self, path, expand=False):
+        name, _, rest = path.partition('.')
+        if expand:
+            self.expand.add(name)
+        else:
+            if self.fields is None:
+                self.fields = set()
+            self.fields.add(name)
+        if rest:
+            self.nested.setdefault(name, Fieldset(f'{self.path}{name}.')).add(rest, expand)
+
+    def names(self):
+        return (self.fields or set()) | self.expand | set(self.nested)
+
+    def includes(self, name, expandable):
+        if name in self.expand:
+            return True
+        if self.fields is not None:
+            return name in self.fields
+        return name not in expandable
+
+
+def parse_fieldset(query_params):
+    """The requested Fieldset, or None when the request asked for the default fields."""
+    fieldset = None
+    for param, expand in ((FIELDS_QUERY_PARAM, False), (EXPAND_QUERY_PARAM, True)):
+        for value in query_params.getlist(param):
+            for path in value.split(','):
+                path = path.strip()
+                if not path:
+                    continue
+                if fieldset is None:
+                    fieldset = Fieldset()
+                fieldset.add(path, expand)
+    return fieldset
+
+
+def get_nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    return field
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Keeps only the fields of ``fieldset`` and hands each nested serializer
+    its part of it. Without a fieldset every field is kept, as before.
+    """
+
+    def __init__(self, *args, fieldset=None, **kwargs):
+        self.fieldset = fieldset
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.fieldset is None:
+            return fields
+
+        unknown = self.fieldset.names() - set(fields)
+        if unknown:
+            raise serializers.ValidationError({
+                FIELDS_QUERY_PARAM: f'Unknown fields: {", ".join(self.fieldset.path + name for name in sorted(unknown))}.'
+            })
+        expandable = getattr(self.Meta, 'expandable_fields', ())
+        fields = {
+            name: field for name, field in fields.items()
+            if field.write_only or self.fieldset.includes(name, expandable)
+        }
+        for name, field in fields.items():
+            nested = get_nested_serializer(field)
+            if isinstance(nested, SparseFieldsetSerializerMixin):
+                nested.fieldset = self.fieldset.get(name)
+                # Unknown nested names fail here, not only once there is an item to render
+                nested.fields
+            elif isinstance(field, LoadedListField) and issubclass(field.serializer_class, SparseFieldsetSerializerMixin):
+                field.fieldset = self.fieldset.get(name)
+                field.serializer_class(fieldset=field.fieldset).fields
+        return fields
+
+    def get_columns(self):
+        """Model fields the kept fields read, for ``only()``. None when all of them are needed."""
+        if self.fieldset is None:
+            return None
+        model = self.Meta.model
+        sources = getattr(self.Meta, 'fieldset_sources', {})
+        columns = {model._meta.pk.name}
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            for source in sources.get(name, [field.source]):
+                try:
+                    model_field = model._meta.get_field(source.split('.')[0])
+                except FieldDoesNotExist:
+                    continue
+                if model_field.concrete and not model_field.many_to_many:
+                    columns.add(model_field.name)
+        return columns
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` and ``?expand=`` for read views. The serializer drops what
+    was not asked for, expansions not asked for are never loaded, and
+    ``only_requested()`` lets ``get_queryset()`` select just the columns the
+    kept fields read.
+    """
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = parse_fieldset(self.request.query_params)
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fieldset', self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_requested_serializer(self):
+        # Unbound, only for the names of its fields
+        if not hasattr(self, '_requested_serializer'):
+            self._requested_serializer = self.get_serializer()
+        return self._requested_serializer
+
+    def is_requested(self, name):
+        return name in self.get_requested_serializer().fields
+
+    def only_requested(self, queryset, *required):
+        """``queryset`` limited to the requested columns and ``required``, which the view itself reads."""
+        columns = self.get_requested_serializer().get_columns()
+        if columns is None:
+            return queryset
+        return queryset.only(*columns, *required)
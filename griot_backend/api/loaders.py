@@ -0,0 +1,185 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import F
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, PrimaryKeyRelatedField
+
+from profiles.models import Profile
+from accounts.models import Account
+from characters.models import Character
+from memories.models import Video
+
+
+class Loader:
+    """
+    Per-request batching loader in the style of DataLoader.
+
+    Keys are registered up front (see BatchListSerializer); the first load()
+    fetches every pending key in a single batch_load() call and later loads
+    are served from memory.
+    """
+    default = list
+
+    def __init__(self):
+        self.pending = set()
+        self.results = {}
+
+    def register(self, keys):
+        self.pending.update(key for key in keys if key not in self.results)
+
+    def load(self, key):
+        if key not in self.results:
+            self.pending.add(key)
+            self.dispatch()
+        return self.results[key]
+
+    def dispatch(self):
+        keys, self.pending = self.pending, set()
+        if not keys:
+            return
+        loaded = self.batch_load(keys)
+        for key in keys:
+            self.results[key] = loaded.get(key) if key in loaded else self.default()
+
+    def batch_load(self, keys):
+        raise NotImplementedError('`batch_load()` must be implemented.')
+
+
+class BelovedOnesProfilesLoader(Loader):
+    """Account id -> profiles of the account's beloved ones."""
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        profiles = Profile.objects.filter(
+            user__beloved_accounts__in=keys
+        ).annotate(
+            loader_key=F('user__beloved_accounts')
+        ).select_related('user').order_by('id')
+        for profile in profiles:
+            grouped[profile.loader_key].append(profile)
+        return grouped
+
+
+class BelovedOnesLoader(Loader):
+    """Account id -> ids of the account's beloved ones."""
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        links = Account.beloved_ones.through.objects.filter(
+            account_id__in=keys
+        ).values_list('account_id', 'user_id').order_by('user_id')
+        for account_id, user_id in links:
+            grouped[account_id].append(PKOnlyObject(pk=user_id))
+        return grouped
+
+
+class MemoryVideosLoader(Loader):
+    """Memory id -> videos of the memory."""
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        for video in Video.active.filter(memory_id__in=keys).order_by('id'):
+            grouped[video.memory_id].append(video)
+        return grouped
+
+
+class CharacterMemoriesLoader(Loader):
+    """Character id -> ids of the memories the character is tagged in."""
+
+    def batch_load(self, keys):
+        grouped = defaultdict(list)
+        links = Character.memories.through.objects.filter(
+            character_id__in=keys
+        ).values_list('character_id', 'memory_id').order_by('memory_id')
+        for character_id, memory_id in links:
+            grouped[character_id].append(PKOnlyObject(pk=memory_id))
+        return grouped
+
+
+def get_loader(context, loader_class):
+    # Loaders live on the request when there is one, so every serializer
+    # used while handling it shares the same batches.
+    request = context.get('request')
+    if request is not None:
+        if not hasattr(request, '_loaders'):
+            request._loaders = {}
+        loaders = request._loaders
+    else:
+        loaders = context.setdefault('_loaders', {})
+    if loader_class not in loaders:
+        loaders[loader_class] = loader_class()
+    return loaders[loader_class]
+
+
+def register_instances(serializer, instances):
+    pks = [instance.pk for instance in instances if instance.pk is not None]
+    for field in serializer.fields.values():
+        loader_class = getattr(field, 'loader_class', None)
+        if loader_class is not None and not field.write_only:
+            get_loader(serializer.context, loader_class).register(pks)
+
+
+class BatchListSerializer(serializers.ListSerializer):
+    """Registers every item with the loaders its fields use before rendering."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        register_instances(self.child, instances)
+        return super().to_representation(instances)
+
+
+class LoadedListField(serializers.Field):
+    """Read-only nested list fetched through a loader keyed by the instance pk."""
+
+    def __init__(self, loader_class, serializer_class, **kwargs):
+        self.loader_class = loader_class
+        self.serializer_class = serializer_class
+        # Set by a sparse fieldset serializer parent, see api/fieldsets.py
+        self.fieldset = None
+        kwargs['read_only'] = True
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        if instance.pk is None:
+            return []
+        objects = get_loader(self.context, self.loader_class).load(instance.pk)
+        kwargs = {} if self.fieldset is None else {'fieldset': self.fieldset}
+        return self.serializer_class(objects, many=True, context=self.context, **kwargs).data
+
+
+class LoadedManyRelatedField(ManyRelatedField):
+    """
+    ManyRelatedField that reads through a loader. Written ids are looked up
+    in one query rather than one per id.
+    """
+
+    def __init__(self, loader_class, child_relation=None, **kwargs):
+        self.loader_class = loader_class
+        super().__init__(child_relation=child_relation, **kwargs)
+
+    def get_attribute(self, instance):
+        if instance.pk is None:
+            return []
+        return get_loader(self.context, self.loader_class).load(instance.pk)
+
+    def to_internal_value(self, data):
+        child = self.child_relation
+        if isinstance(data, str) or not hasattr(data, '__iter__') or not isinstance(child, PrimaryKeyRelatedField) or child.pk_field:
+            return super().to_internal_value(data)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        queryset = child.get_queryset()
+        try:
+            pks = [queryset.model._meta.pk.to_python(value) for value in data if not isinstance(value, bool)]
+        except ValidationError:
+            return super().to_internal_value(data)
+        objects = queryset.in_bulk(pks)
+        if len(pks) < len(data) or len(objects) < len(set(pks)):
+            # Let the child report which id is wrong
+            return super().to_internal_value(data)
+        return [objects[pk] for pk in pks]
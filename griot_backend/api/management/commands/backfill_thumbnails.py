@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from api.background import run_in_background
+from api.thumbnails import generate_thumbnails
+from memories.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Generates the poster frame and thumbnails of existing videos in batches, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry videos whose generation failed.')
+        parser.add_argument('--all', action='store_true', help='Regenerate the thumbnails of every video.')
+
+    def handle(self, *args, **options):
+        videos = Video.active.all()
+        if not options['all']:
+            statuses = [Video.THUMBNAILS_PENDING]
+            if options['retry_failed']:
+                statuses.append(Video.THUMBNAILS_FAILED)
+            videos = videos.filter(thumbnail_status__in=statuses)
+
+        counts = {}
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                # Keyset batches, so videos updated by the workers never shift the window
+                batch = list(videos.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                for result in executor.map(partial(run_in_background, generate_thumbnails), batch):
+                    counts[result] = counts.get(result, 0) + 1
+                last_id = batch[-1]
+                self.stdout.write(f'Processed videos up to id {last_id}.')
+
+        self.stdout.write(
+            f'{counts.get(Video.THUMBNAILS_READY, 0)} ready, {counts.get(Video.THUMBNAILS_FAILED, 0)} failed.'
+        )
@@ -0,0 +1,54 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from griot_backend.authentication import CustomTokenAuthentication, token_cache
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Measures queries and time per token authentication with a cold and a warm token cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        authentication = CustomTokenAuthentication()
+
+        # Everything created here is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench-auth-user', password='bench-auth-password')
+            Profile.objects.create(user=user, name='Bench')
+            token = Token.objects.create(user=user)
+
+            cold = self.measure(authentication, token.key, iterations, warm=False)
+            warm = self.measure(authentication, token.key, iterations, warm=True)
+
+            token_cache.delete(token.key)
+            transaction.set_rollback(True)
+
+        for label, (queries, elapsed) in (('cold', cold), ('warm', warm)):
+            self.stdout.write(
+                f'{label}: {queries / iterations:.2f} queries/request, '
+                f'{elapsed / iterations * 1e6:.1f} us/request'
+            )
+
+    def measure(self, authentication, key, iterations, warm):
+        queries = 0
+        elapsed = 0.0
+        if warm:
+            authentication.authenticate_credentials(key)
+        for _ in range(iterations):
+            if not warm:
+                token_cache.delete(key)
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                authentication.authenticate_credentials(key)
+                elapsed += time.perf_counter() - start
+            queries += len(context)
+        return queries, elapsed
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+from accounts.models import Account
+
+MODES = [
+    ('per-request', 0, False),
+    ('persistent', None, False),
+    ('persistent+health-checks', None, True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the per-request database connection overhead with and without '
+        'persistent connections. Run it outside of any transaction, against the '
+        'database (or pooler) the app uses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=1, help='Queries per request.')
+
+    def handle(self, *args, **options):
+        saved = {key: connection.settings_dict[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        results = []
+        try:
+            for label, max_age, health_checks in MODES:
+                connection.close()
+                connection.settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+                results.append((label, self.measure(options['requests'], options['queries'])))
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
+
+        baseline = results[1][1]
+        for label, elapsed in results:
+            self.stdout.write(
+                f'{label}: {elapsed * 1000:.2f} ms/request ({(elapsed - baseline) * 1000:+.2f} ms vs persistent)'
+            )
+
+    def measure(self, requests, queries):
+        # The signals are what Django's handlers send, so connections are opened,
+        # health checked and closed exactly as they are while serving requests
+        start = time.perf_counter()
+        for _ in range(requests):
+            request_started.send(sender=self.__class__)
+            for _ in range(queries):
+                Account.objects.exists()
+            request_finished.send(sender=self.__class__)
+        return (time.perf_counter() - start) / requests
@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import Account
+from api.serializers import MemorySerializer
+from griot_backend.media_urls import url_cache
+from memories.models import Memory, Video
+
+# Presigning happens locally, so fake credentials are enough to measure it
+S3_SETTINGS = {
+    'DEFAULT_FILE_STORAGE': 'storages.backends.s3boto3.S3Boto3Storage',
+    'AWS_STORAGE_BUCKET_NAME': 'griot-bench-bucket',
+    'AWS_S3_REGION_NAME': 'us-east-1',
+    'AWS_S3_SIGNATURE_VERSION': 's3v4',
+    'AWS_ACCESS_KEY_ID': 'bench',
+    'AWS_SECRET_ACCESS_KEY': 'bench',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measures the time to serialize memories with many videos with and without the media URL cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--videos', type=int, default=1000)
+        parser.add_argument('--memories', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--s3', action='store_true', help='Sign URLs with the S3 storage backend.')
+
+    def handle(self, *args, **options):
+        storage_settings = S3_SETTINGS if options['s3'] else {}
+        # The request only builds absolute URLs, it never goes through host validation
+        request = APIRequestFactory().get('/api/memory/list/')
+        request.get_host = lambda: 'localhost'
+
+        # Everything created here is rolled back at the end
+        with override_settings(**storage_settings), transaction.atomic():
+            user = User.objects.create_user(username='bench-media-user', password='bench-media-password')
+            account = Account.objects.create(owner_user=user, name='Bench')
+            memories = Memory.objects.bulk_create(
+                Memory(title=f'Memory {index}', account=account) for index in range(options['memories'])
+            )
+            Video.objects.bulk_create(
+                Video(
+                    memory=memories[index % len(memories)],
+                    file=f'videos/bench-{index}.mp4',
+                    thumbnail=f'thumbnails/bench-{index}.png',
+                )
+                for index in range(options['videos'])
+            )
+
+            results = []
+            for enabled in (False, True):
+                url_cache.clear()
+                with override_settings(MEDIA_URL_CACHE_ENABLED=enabled):
+                    results.append((enabled, self.measure(request, account, options['rounds'])))
+
+            url_cache.clear()
+            transaction.set_rollback(True)
+
+        for enabled, elapsed in results:
+            label = 'cached' if enabled else 'uncached'
+            self.stdout.write(f'{label}: {elapsed * 1000:.1f} ms/list')
+
+    def measure(self, request, account, rounds):
+        elapsed = 0.0
+        for _ in range(rounds):
+            memories = list(Memory.objects.filter(account=account))
+            start = time.perf_counter()
+            MemorySerializer(memories, many=True, context={'request': request}).data
+            elapsed += time.perf_counter() - start
+        return elapsed / rounds
@@ -0,0 +1,96 @@
+import gzip
+import time
+
+import brotli
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Account
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.views import ListMemoriesView, ListUserAccountsViews
+from memories.models import Memory, Video
+from profiles.models import Profile
+
+RENDERERS = [
+    ('json (drf)', JSONRenderer()),
+    ('json (orjson)', ORJSONRenderer()),
+    ('msgpack', MessagePackRenderer()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures render time and response size of the memory and account lists '
+        'for each renderer, uncompressed, gzipped and brotli-compressed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memories', type=int, default=200)
+        parser.add_argument('--videos', type=int, default=3, help='Videos per memory.')
+        parser.add_argument('--accounts', type=int, default=20)
+        parser.add_argument('--beloved-ones', type=int, default=5, help='Beloved ones per account.')
+        parser.add_argument('--rounds', type=int, default=20)
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+
+        # Everything created here is rolled back at the end
+        with transaction.atomic():
+            user = self.create_data(options)
+            payloads = []
+            for label, view, path in [
+                ('memory/list', ListMemoriesView, '/api/memory/list/?page_size=200'),
+                ('user/list-accounts', ListUserAccountsViews, '/api/user/list-accounts/'),
+            ]:
+                request = factory.get(path, HTTP_HOST='localhost')
+                force_authenticate(request, user=user)
+                payloads.append((label, view.as_view()(request).data))
+            transaction.set_rollback(True)
+
+        for label, data in payloads:
+            self.stdout.write(label)
+            for renderer_label, renderer in RENDERERS:
+                self.report(renderer_label, renderer, data, options['rounds'])
+
+    def create_data(self, options):
+        user = User.objects.create_user(username='bench-payload-user', password='bench-payload-password')
+        account = Account.objects.create(owner_user=user, name='Bench')
+        memories = Memory.objects.bulk_create(
+            Memory(title=f'Memory {index}', account=account) for index in range(options['memories'])
+        )
+        Video.objects.bulk_create(
+            Video(memory=memory, file=f'videos/bench-{memory.id}-{index}.mp4', thumbnail=f'thumbnails/bench-{memory.id}-{index}.png')
+            for memory in memories
+            for index in range(options['videos'])
+        )
+        for index in range(options['accounts']):
+            other = Account.objects.create(owner_user=user, name=f'Account {index}')
+            for beloved_index in range(options['beloved_ones']):
+                beloved_one = User.objects.create_user(username=f'bench-payload-{index}-{beloved_index}')
+                Profile.objects.create(user=beloved_one, name=f'Beloved {index} {beloved_index}', last_name='Bench')
+                other.beloved_ones.add(beloved_one)
+        return user
+
+    def report(self, label, renderer, data, rounds):
+        media_type = renderer.media_type
+        body, render_time = self.measure(lambda: renderer.render(data, media_type), rounds)
+        gzipped, gzip_time = self.measure(lambda: gzip.compress(body, compresslevel=6), rounds)
+        brotlied, brotli_time = self.measure(
+            lambda: brotli.compress(body, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)), rounds
+        )
+        self.stdout.write(
+            f'  {label:14} render {render_time * 1000:7.2f} ms  {len(body):8} B'
+            f' | gzip +{gzip_time * 1000:6.2f} ms {len(gzipped):7} B'
+            f' | brotli +{brotli_time * 1000:6.2f} ms {len(brotlied):7} B'
+        )
+
+    def measure(self, func, rounds):
+        # CPU time, so the numbers don't depend on what else the machine is doing
+        start = time.process_time()
+        for _ in range(rounds):
+            result = func()
+        return result, (time.process_time() - start) / rounds
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import resumable
+from memories.models import VideoUpload
+
+
+class Command(BaseCommand):
+    help = 'Discards the staged chunks of resumable uploads that were abandoned or already finished.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=48)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        stale = VideoUpload.objects.filter(updated_at__lt=cutoff, video__isnull=True, is_active=True)
+        count = 0
+        for upload in stale.iterator():
+            resumable.discard(upload)
+            count += 1
+        stale.update(is_active=False)
+        self.stdout.write(f'Discarded {count} abandoned uploads.')
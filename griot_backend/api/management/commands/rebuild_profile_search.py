@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from profiles.models import Profile, build_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored search vector of every profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+        for profile in Profile.objects.select_related('user').order_by('pk').iterator(chunk_size=batch_size):
+            profile.search_vector = build_search_vector(
+                profile.user.email, profile.name, profile.middle_name, profile.last_name
+            )
+            batch.append(profile)
+            if len(batch) >= batch_size:
+                Profile.objects.bulk_update(batch, ['search_vector'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Profile.objects.bulk_update(batch, ['search_vector'])
+            updated += len(batch)
+        self.stdout.write(f'Updated {updated} profiles.')
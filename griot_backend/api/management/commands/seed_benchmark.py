@@ -0,0 +1,51 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-creates users, accounts, beloved ones, characters, memories and '
+        'videos with long-tailed counts for the load generator in '
+        'py_client/benchmark.py, and writes the manifest it reads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix, also used to clear the data.')
+        parser.add_argument('--password', default='bench-password')
+        parser.add_argument('--output', default='benchmark-manifest.json')
+        parser.add_argument('--clear', action='store_true', help='Delete data seeded with the same prefix first.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        for name, (mean, cap) in seeding.DEFAULTS.items():
+            parser.add_argument(
+                f'--{name.replace("_", "-")}', type=float, nargs=2, metavar=('MEAN', 'CAP'), default=(mean, cap),
+                help=f'Average and maximum {name.replace("_", " ")} per parent (default {mean} {cap}).',
+            )
+
+    def handle(self, *args, **options):
+        sizes = {name: (options[name][0], int(options[name][1])) for name in seeding.DEFAULTS}
+        start = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                deleted, _ = seeding.clear(options['prefix'])
+                self.stdout.write(f'Deleted {deleted} rows seeded with prefix {options["prefix"]!r}.')
+            manifest = seeding.seed(
+                options['users'],
+                prefix=options['prefix'],
+                password=options['password'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                **sizes,
+            )
+        elapsed = time.perf_counter() - start
+
+        with open(options['output'], 'w') as output:
+            json.dump(manifest, output)
+        counts = ', '.join(f'{count} {name.replace("_", " ")}' for name, count in manifest['counts'].items())
+        self.stdout.write(f'Created {counts} in {elapsed:.1f} s. Manifest written to {options["output"]}.')
@@ -0,0 +1,54 @@
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def reject_extension(code, data):
+    raise ValueError(f'extension type {code} is not supported')
+
+
+def reject_timestamps(values):
+    # Timestamps are decoded before ext_hook is consulted
+    if any(isinstance(value, msgpack.Timestamp) for value in values):
+        raise ValueError('timestamps are not supported')
+
+
+def check_list(items):
+    reject_timestamps(items)
+    return items
+
+
+def check_map(obj):
+    reject_timestamps([*obj, *obj.values()])
+    return obj
+
+
+class MessagePackParser(BaseParser):
+    """
+    Bodies decode to what ORJSONParser would return: extension types and
+    timestamps, which JSON has no equivalent for, are rejected.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(
+                stream.read(), raw=False, strict_map_key=False,
+                ext_hook=reject_extension, list_hook=check_list, object_hook=check_map,
+            )
+            reject_timestamps([data])
+        # TypeError: a map key that can't be hashed, like an array
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+        return data
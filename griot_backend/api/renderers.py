@@ -0,0 +1,53 @@
+import msgpack
+import orjson
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.mediatypes import _MediaType
+
+# Converts what orjson and msgpack can't encode themselves (Decimal, lazy
+# translations, querysets, ...) the same way DRF's JSONRenderer does
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    return _encoder.default(obj)
+
+
+def vary_on_accept(renderer_context):
+    # The same URL renders differently depending on the Accept header
+    response = (renderer_context or {}).get('response')
+    if response is not None:
+        patch_vary_headers(response, ('Accept',))
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Drop-in for DRF's JSONRenderer, several times faster on large lists."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        vary_on_accept(renderer_context)
+
+        options = orjson.OPT_NON_STR_KEYS
+        # The browsable API asks for indented JSON
+        if accepted_media_type and _MediaType(accepted_media_type).params.get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=options)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Smaller bodies for clients that send ``Accept: application/msgpack``."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        vary_on_accept(renderer_context)
+        return msgpack.packb(data, default=default, use_bin_type=True)
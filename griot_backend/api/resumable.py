@@ -0,0 +1,177 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import posixpath
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from memories.models import Video
+
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class IncompleteChunk(Exception):
+    pass
+
+
+def get_staging_root():
+    return getattr(settings, 'RESUMABLE_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'griot-uploads'))
+
+
+def get_staging_dir(upload):
+    return os.path.join(get_staging_root(), str(upload.id))
+
+
+def get_chunk_path(upload, offset):
+    return os.path.join(get_staging_dir(upload), f'{offset:015d}.part')
+
+
+def parse_checksum(header):
+    """Parses a tus ``Upload-Checksum: sha256 <base64 digest>`` header into a hex digest."""
+    if not header:
+        return None
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, binascii.Error):
+        raise ValueError('Malformed Upload-Checksum header.')
+    if algorithm.lower() != 'sha256':
+        raise ValueError('Only sha256 checksums are supported.')
+    return digest.hex()
+
+
+def stage_chunk(upload, stream, length, expected_sha256=None):
+    """
+    Writes ``length`` bytes from ``stream`` to a temporary file in the upload's
+    staging directory and returns its path and chunk record. The caller makes
+    it visible with commit_chunk() once it holds the upload row lock; a
+    request that is interrupted or fails the checksum leaves nothing behind.
+    """
+    staging_dir = get_staging_dir(upload)
+    os.makedirs(staging_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    received = 0
+
+    fd, temp_path = tempfile.mkstemp(dir=staging_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while stream is not None and received < length:
+                data = stream.read(min(CHUNK_READ_SIZE, length - received))
+                if not data:
+                    break
+                temp_file.write(data)
+                digest.update(data)
+                received += len(data)
+        if received != length:
+            raise IncompleteChunk()
+        if expected_sha256 is not None and digest.hexdigest() != expected_sha256:
+            raise ChecksumMismatch()
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, {'offset': upload.offset, 'length': length, 'sha256': digest.hexdigest()}
+
+
+def commit_chunk(upload, temp_path, chunk):
+    os.replace(temp_path, get_chunk_path(upload, chunk['offset']))
+    upload.chunks.append(chunk)
+    upload.offset += chunk['length']
+
+
+def drop_chunk(temp_path):
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    Reads the staged chunks of an upload back as one continuous stream and
+    raises ChecksumMismatch at the end of a chunk whose bytes no longer hash
+    to the sha256 it was received with.
+    """
+
+    def __init__(self, chunks):
+        # [(path, sha256 hex digest), ...]
+        self.chunks = list(chunks)
+        self.current = None
+        self.expected = None
+        self.digest = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.chunks:
+                    return 0
+                path, self.expected = self.chunks.pop(0)
+                self.current = open(path, 'rb')
+                self.digest = hashlib.sha256()
+            count = self.current.readinto(buffer)
+            if count:
+                self.digest.update(memoryview(buffer)[:count])
+                return count
+            self.current.close()
+            self.current = None
+            if self.digest.hexdigest() != self.expected:
+                raise ChecksumMismatch()
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def is_assembling(upload):
+    if upload.assembling_at is None:
+        return False
+    timeout = timedelta(seconds=getattr(settings, 'RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT', 60 * 60))
+    return upload.assembling_at > timezone.now() - timeout
+
+
+def store(upload):
+    """
+    Streams the staged chunks into storage and returns the new, unsaved Video.
+    Runs outside any transaction: copying several GB must not hold the upload
+    row lock or a connection. On ChecksumMismatch, or any other failure,
+    nothing is left in storage.
+    """
+    # Uploads from before file names were validated may hold a path
+    filename = posixpath.basename(upload.filename.replace('\\', '/'))
+    if filename in ('', '.', '..'):
+        filename = 'video'
+    chunks = [(get_chunk_path(upload, chunk['offset']), chunk['sha256']) for chunk in upload.chunks]
+    reader = io.BufferedReader(ChunkReader(chunks), buffer_size=1024 * 1024)
+    content = File(reader, name=filename)
+    content.size = upload.size
+    video = Video(memory=upload.memory)
+    # Under the upload's own directory, so a failed copy only ever removes its own partial file
+    name = f'{upload.id}/{filename}'
+    try:
+        video.file.save(name, content, save=False)
+    except BaseException:
+        partial = video.file.field.generate_filename(video, name)
+        if video.file.storage.exists(partial):
+            video.file.storage.delete(partial)
+        raise
+    finally:
+        reader.close()
+    return video
+
+
+def discard(upload):
+    shutil.rmtree(get_staging_dir(upload), ignore_errors=True)
@@ -0,0 +1,164 @@
+"""
+Synthetic data for the benchmark harness (``seed_benchmark``) and the query
+budget tests. Counts are long-tailed the way real usage is: most accounts
+have a handful of memories and beloved ones, a few have hundreds, and a few
+popular users are the beloved one of many accounts.
+"""
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+
+from accounts.models import Account
+from characters.models import Character
+from memories.models import Memory, Video
+from profiles.models import Profile, build_search_vector
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elena', 'Felipe', 'Grace', 'Hugo', 'Iris', 'João', 'Karen', 'Lucas']
+LAST_NAMES = ['Silva', 'Santos', 'Smith', 'Oliveira', 'Johnson', 'Souza', 'Brown', 'Costa', 'Garcia', 'Pereira']
+RELATIONSHIPS = ['family', 'friend', 'other']
+
+DEFAULTS = {
+    # (mean, cap) per parent
+    'accounts': (1.5, 5),
+    'beloved_ones': (4, 50),
+    'characters': (3, 20),
+    'memories': (20, 500),
+    'videos': (1.5, 10),
+    'tags': (1, 3),
+}
+
+
+def skewed(rng, mean, cap):
+    """A long-tailed count: most draws are small, a few are close to ``cap``."""
+    # A Pareto draw with alpha 1.5 averages 3, scaled so the counts average about ``mean``
+    return min(cap, round(rng.paretovariate(1.5) * mean / 3))
+
+
+def seed(users, prefix='bench', password='bench-password', seed=0, batch_size=1000, **sizes):
+    """
+    Bulk-creates ``users`` users with profiles and tokens, their accounts,
+    beloved ones, characters, memories, videos and character tags. ``sizes``
+    overrides the (mean, cap) pairs in DEFAULTS. Returns a manifest of what
+    each user can reach, which is what the load generator drives requests with.
+    """
+    sizes = {**DEFAULTS, **sizes}
+    rng = random.Random(seed)
+    # Hashing once keeps seeding fast, every seeded user shares the password
+    password_hash = make_password(password)
+
+    created_users = User.objects.bulk_create([
+        User(username=f'{prefix}-{index}', email=f'{prefix}-{index}@example.com', password=password_hash)
+        for index in range(users)
+    ], batch_size=batch_size)
+    profiles = []
+    for user in created_users:
+        name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        profiles.append(Profile(
+            user=user, name=name, last_name=last_name, language='en', timezone='UTC',
+            search_vector=build_search_vector(user.email, name, None, last_name),
+        ))
+    Profile.objects.bulk_create(profiles, batch_size=batch_size)
+    tokens = Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in created_users], batch_size=batch_size
+    )
+
+    # Zipf popularity: the user at rank r is picked as a beloved one 1/r as often as the first
+    popularity = [1 / rank for rank in range(1, users + 1)]
+    accounts = []
+    for user in created_users:
+        for index in range(max(1, skewed(rng, *sizes['accounts']))):
+            accounts.append(Account(owner_user=user, name=f'{user.username} account {index}'))
+    Account.objects.bulk_create(accounts, batch_size=batch_size)
+
+    links = []
+    for account in accounts:
+        count = min(skewed(rng, *sizes['beloved_ones']), users - 1)
+        chosen = {user.pk for user in rng.choices(created_users, weights=popularity, k=count)}
+        chosen.discard(account.owner_user_id)
+        links.extend(Account.beloved_ones.through(account_id=account.pk, user_id=pk) for pk in chosen)
+    Account.beloved_ones.through.objects.bulk_create(links, batch_size=batch_size)
+
+    characters = [
+        Character(account=account, name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', relationship=rng.choice(RELATIONSHIPS))
+        for account in accounts
+        for _ in range(skewed(rng, *sizes['characters']))
+    ]
+    Character.objects.bulk_create(characters, batch_size=batch_size)
+
+    memories = [
+        Memory(account=account, title=f'Memory {index} of {account.name}')
+        for account in accounts
+        for index in range(skewed(rng, *sizes['memories']))
+    ]
+    Memory.objects.bulk_create(memories, batch_size=batch_size)
+
+    videos = [
+        Video(memory=memory, file=f'videos/{prefix}-{memory.pk}-{index}.mp4', thumbnail_status=Video.THUMBNAILS_READY)
+        for memory in memories
+        for index in range(skewed(rng, *sizes['videos']))
+    ]
+    Video.objects.bulk_create(videos, batch_size=batch_size)
+
+    account_characters = {}
+    for character in characters:
+        account_characters.setdefault(character.account_id, []).append(character.pk)
+    tags = []
+    for memory in memories:
+        candidates = account_characters.get(memory.account_id, [])
+        count = min(skewed(rng, *sizes['tags']), len(candidates))
+        tags.extend(
+            Character.memories.through(character_id=pk, memory_id=memory.pk)
+            for pk in rng.sample(candidates, count)
+        )
+    Character.memories.through.objects.bulk_create(tags, batch_size=batch_size)
+
+    return build_manifest(created_users, tokens, accounts, links, characters, memories, videos, prefix, password, seed)
+
+
+def build_manifest(users, tokens, accounts, links, characters, memories, videos, prefix, password, seed):
+    entries = {
+        user.pk: {
+            'id': user.pk, 'username': user.username, 'email': user.email,
+            # Characters are per account: {account id: [character ids]}
+            'accounts': [], 'beloved_accounts': [], 'characters': {}, 'memories': [], 'videos': [],
+        }
+        for user in users
+    }
+    for token in tokens:
+        entries[token.user_id]['token'] = token.key
+    owners = {}
+    for account in accounts:
+        owners[account.pk] = account.owner_user_id
+        entries[account.owner_user_id]['accounts'].append(account.pk)
+    for link in links:
+        entries[link.user_id]['beloved_accounts'].append(link.account_id)
+    for character in characters:
+        entries[owners[character.account_id]]['characters'].setdefault(character.account_id, []).append(character.pk)
+    memory_owners = {}
+    for memory in memories:
+        memory_owners[memory.pk] = owners[memory.account_id]
+        entries[memory_owners[memory.pk]]['memories'].append(memory.pk)
+    for video in videos:
+        entries[memory_owners[video.memory_id]]['videos'].append(video.pk)
+
+    return {
+        'prefix': prefix,
+        'password': password,
+        'seed': seed,
+        'counts': {
+            'users': len(users),
+            'accounts': len(accounts),
+            'beloved_ones': len(links),
+            'characters': len(characters),
+            'memories': len(memories),
+            'videos': len(videos),
+        },
+        'users': list(entries.values()),
+    }
+
+
+def clear(prefix='bench'):
+    """Deletes everything a previous ``seed`` (or load test run) with ``prefix`` created."""
+    return User.objects.filter(username__startswith=f'{prefix}-').delete()
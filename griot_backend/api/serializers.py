@@ -1,25 +1,50 @@
+import re
+
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
-from django.core.mail import send_mail
+from django.core import signing
+from django.conf import settings
 
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes, smart_str 
+from django.utils.http import urlsafe_base64_decode
+from django.utils.encoding import smart_str 
 
 from django.contrib.auth import authenticate, password_validation
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.tokens import default_token_generator
 
-from django.template.loader import render_to_string
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.db.models.functions import Lower
 
 from rest_framework import serializers, exceptions
 
+from griot_backend.authentication import invalidate_user_tokens
+from jobs.queue import enqueue
+
 from profiles.models import Profile
 from accounts.models import Account
 from characters.models import Character
-from memories.models import Memory, Video
-
-class UserSerializer(serializers.ModelSerializer):
+from memories.models import Memory, Video, VideoUpload
+
+from .loaders import (
+    BatchListSerializer,
+    BelovedOnesLoader,
+    BelovedOnesProfilesLoader,
+    CharacterMemoriesLoader,
+    LoadedListField,
+    LoadedManyRelatedField,
+    MemoryVideosLoader,
+    register_instances,
+)
+from .batch import RESERVED_HEADERS
+from .fieldsets import SparseFieldsetSerializerMixin
+from .sync import decode_cursor
+from .uploads import read_upload_token
+from .tasks import send_password_reset_email
+from .fields import MEDIA_FIELD_MAPPING
+from griot_backend.media_urls import get_file_url, get_storage_url
+
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     username = serializers.CharField(required=True)
     email = serializers.EmailField(required=True)
     password = serializers.CharField(required=True, write_only=True)
@@ -91,14 +116,8 @@ class PasswordResetSerializer(serializers.Serializer):
         email = self.validated_data['email']
         try:
             user = User.objects.get(email=email)
-            token = default_token_generator.make_token(user)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            password_reset_url = request.build_absolute_uri(f'/user/password-reset-confirm/{uid}/{token}/')
-            email_body = render_to_string('emails/password_reset_email.html', {
-                'password_reset_url': password_reset_url,
-                'username': user.username}
-            )
-            send_mail('Password Reset Request', email_body, 'admin@yourwebsite.com', [email])
+            # SMTP is slow, the e-mail goes out from a background worker
+            enqueue(send_password_reset_email, user.id, request.build_absolute_uri('/'))
         except User.DoesNotExist:
             pass
 
@@ -126,26 +145,32 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         user = User.objects.get(pk=uid)
         user.set_password(self.validated_data['new_password'])
         user.save()
+        invalidate_user_tokens(user)
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
 
     class Meta:
         model = Profile
-        fields = '__all__'
-
-class AccountSerializer(serializers.ModelSerializer):
-    owner_user = serializers.ReadOnlyField(source='owner_user.id')
-    beloved_ones_profiles = serializers.SerializerMethodField()
+        exclude = ('search_vector',)
+        expandable_fields = ('user',)
+
+class AccountSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    owner_user = serializers.ReadOnlyField(source='owner_user_id')
+    beloved_ones = LoadedManyRelatedField(
+        BelovedOnesLoader,
+        child_relation=serializers.PrimaryKeyRelatedField(queryset=User.objects.all()),
+        required=False,
+    )
+    # Profile objects related to the 'beloved_ones' Users, batched per request.
+    beloved_ones_profiles = LoadedListField(BelovedOnesProfilesLoader, ProfileSerializer)
     
     class Meta:
         model = Account
         fields = '__all__'
-
-    def get_beloved_ones_profiles(self, instance):
-        # This method gets the Profile objects related to the 'beloved_ones' Users.
-        profiles = Profile.objects.filter(user__in=instance.beloved_ones.all())
-        return ProfileSerializer(profiles, many=True).data
+        expandable_fields = ('beloved_ones', 'beloved_ones_profiles')
+        list_serializer_class = BatchListSerializer
 
     def update(self, instance, validated_data):
         if 'owner_user' in self.initial_data:
@@ -155,7 +180,61 @@ class AccountSerializer(serializers.ModelSerializer):
         
         return super().update(instance, validated_data)
     
-class UserAccountSerializer(serializers.ModelSerializer):
+class BelovedOneReferenceField(serializers.Field):
+    """A user id, or the user's e-mail address."""
+    default_error_messages = {'invalid': 'Expected a user id or an e-mail address.'}
+
+    def to_internal_value(self, data):
+        if isinstance(data, int) and not isinstance(data, bool):
+            return data
+        if not isinstance(data, str):
+            self.fail('invalid')
+        # ASCII only: isdigit() also accepts digits like '²' that int() rejects
+        if data.isascii() and data.isdigit():
+            return int(data)
+        try:
+            validate_email(data)
+        except ValidationError:
+            self.fail('invalid')
+        return data.lower()
+
+    def to_representation(self, value):
+        return value
+
+class AccountBelovedOnesSerializer(serializers.Serializer):
+    add = serializers.ListField(child=BelovedOneReferenceField(), default=list, max_length=500)
+    remove = serializers.ListField(child=BelovedOneReferenceField(), default=list, max_length=500)
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError('Nothing to add or remove.')
+
+        references = set(data['add']) | set(data['remove'])
+        ids = {reference for reference in references if isinstance(reference, int)}
+        emails = references - ids
+        # One query for the whole request. Lowest id first, so a shared e-mail always picks the same user
+        users = {}
+        matches = (
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(Q(pk__in=ids) | Q(email_lower__in=emails))
+            .order_by('pk')
+            .values_list('pk', 'email_lower')
+        )
+        for pk, email in matches:
+            if pk in ids:
+                users[pk] = pk
+            if email in emails:
+                users.setdefault(email, pk)
+
+        both = {users[r] for r in data['add'] if r in users} & {users[r] for r in data['remove'] if r in users}
+        if both:
+            raise serializers.ValidationError(
+                f'Users can not be added and removed at once: {", ".join(map(str, sorted(both)))}.'
+            )
+        data['users'] = users
+        return data
+
+class UserAccountSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     owned_accounts = AccountSerializer(many=True, read_only=True)
     beloved_accounts = AccountSerializer(many=True, read_only=True)
 
@@ -163,29 +242,178 @@ class UserAccountSerializer(serializers.ModelSerializer):
         model = User
         fields = ('owned_accounts', 'beloved_accounts')
 
-class CharacterSerializer(serializers.ModelSerializer):
-    memories = serializers.PrimaryKeyRelatedField(queryset=Memory.objects.all(), many=True, required=False)
+    def to_representation(self, instance):
+        # Register both account lists up front so their beloved ones'
+        # profiles are fetched in a single query.
+        names = [name for name in ('owned_accounts', 'beloved_accounts') if name in self.fields]
+        if not names:
+            return super().to_representation(instance)
+        child = self.fields[names[0]].child
+        columns = child.get_columns()
+        # Prefetching owned_accounts groups the accounts by owner
+        queryset = Account.active.all() if columns is None else Account.active.only(*columns, 'owner_user')
+        prefetch_related_objects([instance], *[Prefetch(name, queryset=queryset) for name in names])
+        accounts = [account for name in names for account in getattr(instance, name).all()]
+        register_instances(child, accounts)
+        return super().to_representation(instance)
+
+class CharacterSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
+    memories = LoadedManyRelatedField(
+        CharacterMemoriesLoader,
+        child_relation=serializers.PrimaryKeyRelatedField(queryset=Memory.active.all()),
+        required=False,
+    )
 
     class Meta:
         model = Character
         fields = '__all__'
+        expandable_fields = ('memories',)
+        list_serializer_class = BatchListSerializer
         
-class VideoSerializer(serializers.ModelSerializer):
+class VideoSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    serializer_field_mapping = MEDIA_FIELD_MAPPING
     id = serializers.ReadOnlyField(required=False)
     url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = Video
         fields = '__all__'
+        # A form upload without is_active would read it as an unchecked box and hide the video
+        read_only_fields = ('poster', 'thumbnail_status', 'hls_playlist', 'hls_renditions', 'hls_status', 'is_active')
+        extra_kwargs = {'memory': {'queryset': Memory.active.all()}}
+        fieldset_sources = {'url': ['file'], 'thumbnails': ['file', 'thumbnails']}
         
     def get_url(self, obj):
         request = self.context.get('request')
-        return request.build_absolute_uri(obj.file.url)
+        return request.build_absolute_uri(get_file_url(obj.file))
 
-class MemorySerializer(serializers.ModelSerializer):
-    videos = VideoSerializer(many=True, read_only=True)
+    def get_thumbnails(self, obj):
+        request = self.context.get('request')
+        storage = obj.file.storage
+        return {
+            size: request.build_absolute_uri(get_storage_url(storage, name))
+            for size, name in obj.thumbnails.items()
+        }
+
+class MemorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    videos = LoadedListField(MemoryVideosLoader, VideoSerializer)
     id = serializers.ReadOnlyField(required=False)
     
     class Meta:
         model = Memory
         fields = ('id', 'account', 'title', 'videos')
+        expandable_fields = ('videos',)
+        list_serializer_class = BatchListSerializer
+
+
+class MemoryCharactersSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=500)
+    remove = serializers.ListField(child=serializers.IntegerField(), default=list, max_length=500)
+
+    def validate(self, data):
+        add, remove = set(data['add']), set(data['remove'])
+        if not add and not remove:
+            raise serializers.ValidationError('Nothing to add or remove.')
+        if add & remove:
+            raise serializers.ValidationError(f'Characters both added and removed: {sorted(add & remove)}.')
+
+        # Every id in one query, against the memory's own account
+        memory = self.context['memory']
+        found = dict(
+            Character.objects.filter(account_id=memory.account_id, pk__in=add | remove).values_list('pk', 'is_active')
+        )
+        errors = {}
+        # Deleted characters can still be untagged, not tagged
+        invalid = sorted(pk for pk in add if not found.get(pk))
+        if invalid:
+            errors['add'] = [f'Invalid characters: {invalid}.']
+        invalid = sorted(pk for pk in remove if pk not in found)
+        if invalid:
+            errors['remove'] = [f'Invalid characters: {invalid}.']
+        if errors:
+            raise serializers.ValidationError(errors)
+        return {'add': add, 'remove': remove}
+
+def validate_video_size(value):
+    max_size = getattr(settings, 'VIDEO_UPLOAD_MAX_SIZE', 5 * 1024 ** 3)
+    if value > max_size:
+        raise serializers.ValidationError(f'Videos may not be larger than {max_size} bytes.')
+    return value
+
+def validate_video_filename(value):
+    # Stored under the upload's directory as given, so it can't hold a path
+    if value in ('.', '..') or '/' in value or '\\' in value:
+        raise serializers.ValidationError('The file name may not contain a path.')
+    return value
+
+class VideoUploadInitiateSerializer(serializers.Serializer):
+    memory = serializers.PrimaryKeyRelatedField(queryset=Memory.active.all())
+    filename = serializers.CharField(max_length=200)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, default='video/mp4')
+
+    def validate_size(self, value):
+        return validate_video_size(value)
+
+class VideoUploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=10000)
+    etag = serializers.CharField(max_length=255)
+
+class VideoUploadTokenSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
+
+    def validate_upload_token(self, value):
+        try:
+            return read_upload_token(value)
+        except signing.BadSignature:
+            raise serializers.ValidationError('Invalid or expired upload token.')
+
+class VideoUploadCompleteSerializer(VideoUploadTokenSerializer):
+    parts = VideoUploadPartSerializer(many=True, allow_empty=False)
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    memory = serializers.PrimaryKeyRelatedField(queryset=Memory.active.all())
+
+    class Meta:
+        model = VideoUpload
+        fields = ('id', 'memory', 'filename', 'size', 'offset', 'created_at')
+        read_only_fields = ('id', 'offset', 'created_at')
+
+    def validate_filename(self, value):
+        return validate_video_filename(value)
+
+    def validate_size(self, value):
+        return validate_video_size(value)
+
+
+class BatchSubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+    headers = serializers.DictField(child=serializers.CharField(allow_blank=True), default=dict)
+
+    def validate_headers(self, value):
+        for name in value:
+            if not re.fullmatch(r'[A-Za-z0-9-]+', name) or name.lower() in RESERVED_HEADERS:
+                raise serializers.ValidationError(f'Header {name!r} can not be set on a sub-request.')
+        return value
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchSubRequestSerializer(many=True, allow_empty=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Checked before any sub-request is validated
+        fields['requests'].max_length = getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+        return fields
+
+class SyncSerializer(serializers.Serializer):
+    since = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_since(self, value):
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor.')
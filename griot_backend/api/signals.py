@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from griot_backend.authentication import invalidate_token, invalidate_user_tokens
+
+
+# Changes made outside the API views too, like in the admin. The views that
+# log out or change passwords also invalidate explicitly.
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user_tokens(sender, instance, created, **kwargs):
+    # Cached tokens carry a copy of the user, is_active included
+    if not created:
+        invalidate_user_tokens(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    # Also sent for each token a deleted user's cascade removes
+    invalidate_token(instance.key)
@@ -0,0 +1,132 @@
+"""
+Delta sync for the mobile clients: what the user can see that changed after
+a cursor, with the ids of the rows deleted since as tombstones.
+
+The cursor holds a time and the accounts the client has synced. Accounts
+that became visible since are sent in full, accounts that are no longer
+visible (deleted, or the user was removed as a beloved one) come back as
+tombstones, and the client drops their memories, videos and characters.
+Tagging a character saves the memory, not the character, so the tags are
+sent with the memories.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+import orjson
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import Account
+from characters.models import Character
+from memories.models import Memory, Video
+from profiles.models import Profile
+from griot_backend.acl import get_account_roles
+
+from .fieldsets import Fieldset
+
+
+def encode_cursor(synced_at, account_ids):
+    raw = orjson.dumps({'t': synced_at.isoformat(), 'a': sorted(account_ids)})
+    return urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(encoded):
+    """Returns (time, account ids) of the cursor, (None, empty set) for a first sync. Raises ValueError."""
+    if not encoded:
+        return None, set()
+    try:
+        data = orjson.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        synced_at = datetime.fromisoformat(data['t'])
+        account_ids = {int(pk) for pk in data['a']}
+    except (TypeError, KeyError, UnicodeError, orjson.JSONDecodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+    if timezone.is_naive(synced_at):
+        raise ValueError('Invalid cursor')
+    return synced_at, account_ids
+
+
+def get_next_cursor(started_at, account_ids):
+    # Rows saved just before the sync started may commit after it, so the
+    # next sync looks back a little further. Clients upsert, repeats are harmless.
+    overlap = timedelta(seconds=getattr(settings, 'SYNC_CURSOR_OVERLAP_SECONDS', 60))
+    return encode_cursor(started_at - overlap, account_ids)
+
+
+def make_fieldset(*expand):
+    # Nested lists are synced as rows of their own, so only ids are expanded
+    fieldset = Fieldset()
+    for path in expand:
+        fieldset.add(path, expand=True)
+    return fieldset
+
+
+def account_users(account_ids):
+    """Profiles of the owners and beloved ones of ``account_ids``, as subqueries rather than joins."""
+    owners = Account.objects.filter(pk__in=account_ids).values('owner_user_id')
+    beloved_ones = Account.beloved_ones.through.objects.filter(account_id__in=account_ids).values('user_id')
+    return Q(user_id__in=owners) | Q(user_id__in=beloved_ones)
+
+
+def split_deleted(rows):
+    live, deleted = [], []
+    for row in rows:
+        if row.is_active:
+            live.append(row)
+        else:
+            deleted.append(row.pk)
+    return live, deleted
+
+
+def changed(queryset, account_field, since, synced, new, **live):
+    """
+    Rows of the synced accounts saved after ``since``, deleted ones included,
+    and the live rows of the accounts new to the client.
+    """
+    condition = Q(**{f'{account_field}__in': new, 'is_active': True, **live})
+    if synced:
+        condition |= Q(**{f'{account_field}__in': synced, 'updated_at__gt': since})
+    return queryset.filter(condition).order_by('updated_at', 'pk')
+
+
+def get_changes(user, since, synced_accounts):
+    """
+    The rows to send, by kind, and the ids deleted since, by kind. Also
+    returns the accounts visible now, which the next cursor is made of.
+    """
+    visible = set(get_account_roles(user))
+    new = visible - synced_accounts
+    synced = visible & synced_accounts
+    rows, deleted = {}, {}
+
+    accounts = Account.objects.filter(pk__in=visible)
+    if since is not None:
+        accounts = accounts.filter(Q(pk__in=new) | Q(updated_at__gt=since))
+    rows['accounts'] = list(accounts.order_by('updated_at', 'pk'))
+    # Deleted accounts and the ones the user was removed from alike
+    deleted['accounts'] = sorted(synced_accounts - visible)
+
+    # The user, and the owners and beloved ones of the visible accounts. All
+    # of them for a sent account, so a beloved one added since comes with its profile.
+    sent_accounts = [account.pk for account in rows['accounts']]
+    profiles = Profile.objects.filter(Q(user_id=user.id) | account_users(visible))
+    if since is not None:
+        profiles = profiles.filter(Q(updated_at__gt=since) | account_users(sent_accounts))
+    rows['profiles'] = list(profiles.defer('search_vector').order_by('updated_at', 'pk'))
+
+    for name, queryset, account_field, live in [
+        ('memories', Memory.objects.all(), 'account_id', {}),
+        ('videos', Video.objects.all(), 'memory__account_id', {'memory__is_active': True}),
+        ('characters', Character.objects.all(), 'account_id', {}),
+    ]:
+        rows[name], deleted[name] = split_deleted(changed(queryset, account_field, since, synced, new, **live))
+
+    tags = {memory.pk: [] for memory in rows['memories']}
+    if tags:
+        pairs = Character.memories.through.objects.filter(
+            memory_id__in=list(tags), character__is_active=True
+        ).order_by('character_id').values_list('memory_id', 'character_id')
+        for memory_id, character_id in pairs:
+            tags[memory_id].append(character_id)
+    rows['tags'] = tags
+    return rows, deleted, visible
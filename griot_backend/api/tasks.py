@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from jobs.queue import enqueue, is_last_attempt, task
+
+from . import thumbnails, transcoding
+
+
+@task(priority=10)
+def send_password_reset_email(user_id, base_url):
+    # The token is made here rather than at request time, so it never sits in the jobs table
+    user = User.objects.filter(id=user_id).first()
+    if user is None:
+        return
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    password_reset_url = f"{base_url.rstrip('/')}/user/password-reset-confirm/{uid}/{token}/"
+    email_body = render_to_string('emails/password_reset_email.html', {
+        'password_reset_url': password_reset_url,
+        'username': user.username}
+    )
+    send_mail('Password Reset Request', email_body, 'admin@yourwebsite.com', [user.email])
+
+
+@task(priority=5, max_attempts=3)
+def generate_video_thumbnails(video_id):
+    # Like transcoding, only the last transient failure is recorded
+    thumbnails.generate_thumbnails(video_id, retry=not is_last_attempt())
+
+
+@task(priority=0, max_attempts=3)
+def transcode_video(video_id):
+    # Transient failures are retried by the queue, only the last one is recorded
+    transcoding.transcode(video_id, retry=not is_last_attempt())
+
+
+def schedule_video_processing(video):
+    """Queues thumbnail generation and transcoding for a freshly uploaded video."""
+    if getattr(settings, 'VIDEO_THUMBNAILS_ENABLED', True):
+        enqueue(generate_video_thumbnails, video.id)
+    if getattr(settings, 'VIDEO_HLS_ENABLED', True):
+        enqueue(transcode_video, video.id)
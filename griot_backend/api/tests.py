@@ -1,20 +1,85 @@
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 
+from django.db.models import Count
 from django.utils import timezone
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes, smart_str 
 
 from rest_framework import status
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework.authtoken.models import Token
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core import mail
+from django.db import connection, transaction
+from django.conf import settings
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from unittest import mock, skipUnless
+from datetime import timedelta
+from django.core.management import call_command
+from PIL import Image
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import io
+import os
+import posixpath
+import runpy
+import shutil
+import subprocess
+import tempfile
+import threading
+import requests
+from griot_backend.authentication import CustomTokenAuthentication, token_cache
+from griot_backend.acl import OWNER, BELOVED_ONE, acl_cache, get_account_roles, invalidate_acl
+from griot_backend.permissions import MemoryPermissions
+from griot_backend.media_urls import get_storage_url, get_url_ttl, get_url_version, url_cache
+from griot_backend.memory import format_memory_stats, read_memory_stats
+from griot_backend.replicas import is_pinned
+from griot_backend.compression import parse_accept_encoding
+from griot_backend.timing import RequestTimings, _current, record_query, timed
+import brotli
+import msgpack
+from rest_framework.test import APIRequestFactory
+from django.test import AsyncRequestFactory
+from asgiref.sync import sync_to_async
+from api import resumable, seeding, urls as api_urls
+from api.pagination import KeysetPagination
+from api.uploads import make_upload_token
+from api.views import AsyncCreateVideoMemoryView, AsyncPasswordResetView, AsyncRetrieveVideoMemoryView
+from api.serializers import CharacterSerializer, MemorySerializer, ProfileSerializer, UserAccountSerializer
+from api.tasks import generate_video_thumbnails, send_password_reset_email, transcode_video
+from api.thumbnails import FrameExtractionError, TransientFrameExtractionError, generate_thumbnails
+from api.transcoding import TranscodingError, TransientTranscodingError, make_playlist_token, plan_renditions, transcode
 from profiles.models import Profile
 from accounts.models import Account
 from characters.models import Character
-from memories.models import Memory, Video
-
+from memories.models import Memory, Video, VideoUpload
+from jobs.models import Job
+from jobs.queue import UnknownTask, claim, enqueue, execute, requeue_stale, task
+from jobs.management.commands.run_worker import Worker
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+S3_TEST_SETTINGS = {
+    'DEFAULT_FILE_STORAGE': 'storages.backends.s3boto3.S3Boto3Storage',
+    'AWS_STORAGE_BUCKET_NAME': 'griot-test-bucket',
+    'AWS_S3_REGION_NAME': 'us-east-1',
+    'AWS_DEFAULT_ACL': 'private',
+    'AWS_S3_SIGNATURE_VERSION': 's3v4',
+}
 
 
 # User and Auth related tests
@@ -253,6 +318,103 @@ class LogoutTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(response.data, {'detail': 'Invalid token'})
 
+class TokenCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear_local()
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', password='T%R$E#W@Q!')
+        Profile.objects.create(user=self.user, name='Test')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_warm_cache_runs_no_queries(self):
+        authentication = CustomTokenAuthentication()
+
+        with CaptureQueriesContext(connection) as cold:
+            user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertGreaterEqual(len(cold), 1)
+
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(self.token.key)
+            self.assertEqual(user.profile.name, 'Test')
+        self.assertEqual(user, self.user)
+
+    def test_shared_cache_hit_runs_no_queries(self):
+        authentication = CustomTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+        token_cache.clear_local()
+
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+    def test_logout_invalidates_cached_token(self):
+        response = self.client.get(reverse('retrieve_profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('logout_user'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('retrieve_profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_reset_invalidates_cached_token(self):
+        self.client.get(reverse('retrieve_profile'))
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        reset_token = default_token_generator.make_token(self.user)
+        url = reverse('reset_password_confirm', kwargs={'uidb64': uid, 'token': reset_token})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'new_password': 'Q!w2e3r4T%'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_inactive_user_is_rejected_from_cache(self):
+        self.client.get(reverse('retrieve_profile'))
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.client.get(reverse('retrieve_profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(reverse('retrieve_profile'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+        # Until the change commits, a concurrent request could re-cache the old user
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_deleted_token_is_rejected_from_cache(self):
+        self.client.get(reverse('retrieve_profile'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(pk=self.token.pk).delete()
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        response = self.client.get(reverse('retrieve_profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected_from_cache(self):
+        self.client.get(reverse('retrieve_profile'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+
+        response = self.client.get(reverse('retrieve_profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
 class PasswordResetViewTest(APITestCase):
 
     def setUp(self):
@@ -263,6 +425,19 @@ class PasswordResetViewTest(APITestCase):
         response = self.client.post(self.url, {'email': 'test@test.com'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_reset_password_email_is_sent_by_a_worker(self):
+        self.client.post(self.url, {'email': 'test@test.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get()
+        self.assertEqual(job.name, send_password_reset_email.task_name)
+
+        Worker('test-worker', 0, threading.Event(), io.StringIO()).run_pending()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['test@test.com'])
+        self.assertIn('http://testserver/user/password-reset-confirm/', mail.outbox[0].body)
+        self.assertFalse(Job.objects.exists())
+
     def test_reset_password_with_non_existent_email(self):
         response = self.client.post(self.url, {'email': 'nonexistent@test.com'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -377,6 +552,52 @@ class RetrieveProfileTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class SearchProfileTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', email='searcher@example.com', password='testpassword')
+        Profile.objects.create(user=self.user, name='Searcher')
+
+        self.alice_user = User.objects.create_user(username='alice', email='alice@example.com', password='testpassword')
+        self.alice = Profile.objects.create(user=self.alice_user, name='Alice', last_name='Walker')
+        self.bob_user = User.objects.create_user(username='bob', email='walker@example.com', password='testpassword')
+        self.bob = Profile.objects.create(user=self.bob_user, name='Bob', last_name='Stone')
+
+        self.client.force_authenticate(user=self.user)
+        self.search_url = reverse('list-profiles')
+
+    def test_search_ranks_name_matches_first(self):
+        response = self.client.get(self.search_url, {'q': 'walker'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.alice.id, self.bob.id])
+        self.assertNotIn('search_vector', response.data['results'][0])
+
+    def test_search_by_email(self):
+        response = self.client.get(self.search_url, {'q': 'alice@example.com'})
+
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.alice.id])
+
+    def test_profile_update_refreshes_search_vector(self):
+        self.client.force_authenticate(user=self.bob_user)
+        self.client.patch(reverse('update_profile'), {'last_name': 'Rivers'}, format='json')
+
+        response = self.client.get(self.search_url, {'q': 'rivers'})
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.bob.id])
+
+    def test_email_change_refreshes_search_vector(self):
+        self.bob_user.email = 'bobby@example.com'
+        self.bob_user.save()
+
+        response = self.client.get(self.search_url, {'q': 'walker'})
+        self.assertEqual([profile['id'] for profile in response.data['results']], [self.alice.id])
+
+    def test_search_is_paginated(self):
+        response = self.client.get(self.search_url, {'q': 'walker', 'page_size': 1})
+
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+
 # Account related tests
 class AccountCreateTestCase(APITestCase):
     def setUp(self):
@@ -560,6 +781,70 @@ class ListUserAccountsViewsTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+class NestedSerializerBatchingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mainuser', password='testpassword')
+        Profile.objects.create(user=self.user, name='Main')
+        self.accounts = []
+        for i in range(4):
+            account = Account.objects.create(owner_user=self.user, name=f'Owned {i}')
+            other = Account.objects.create(owner_user=User.objects.create_user(username=f'owner{i}'), name=f'Beloved {i}')
+            other.beloved_ones.add(self.user)
+            for j in range(3):
+                beloved_one = User.objects.create_user(username=f'beloved{i}{j}')
+                Profile.objects.create(user=beloved_one, name=f'Beloved {i}{j}')
+                account.beloved_ones.add(beloved_one)
+                other.beloved_ones.add(beloved_one)
+            self.accounts.append(account)
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_accounts_query_count(self):
+        # ETag versions, owned accounts, beloved accounts, beloved ones and their profiles
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('list_accounts'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['owned_accounts']), 4)
+        for account in response.data['owned_accounts']:
+            self.assertEqual(len(account['beloved_ones_profiles']), 3)
+        for account in response.data['beloved_accounts']:
+            self.assertEqual(len(account['beloved_ones_profiles']), 4)
+
+    def test_memory_and_character_lists_batch_relations(self):
+        characters = []
+        memories = []
+        for account in self.accounts:
+            character = Character.objects.create(name='Character', account=account)
+            for i in range(3):
+                memory = Memory.objects.create(title=f'Memory {i}', account=account)
+                Video.objects.create(file='path/to/video', memory=memory)
+                character.memories.add(memory)
+                memories.append(memory)
+            characters.append(character)
+        request = APIRequestFactory().get('/')
+
+        with self.assertNumQueries(1):
+            data = MemorySerializer(memories, many=True, context={'request': request}).data
+        self.assertTrue(all(len(memory['videos']) == 1 for memory in data))
+
+        with self.assertNumQueries(1):
+            data = CharacterSerializer(characters, many=True).data
+        self.assertTrue(all(len(character['memories']) == 3 for character in data))
+
+    def test_written_ids_are_validated_in_one_query(self):
+        memories = [Memory.objects.create(title=f'Memory {i}', account=self.accounts[0]) for i in range(5)]
+        data = {'account': self.accounts[0].id, 'name': 'Character', 'memories': [str(memory.id) for memory in memories]}
+
+        serializer = CharacterSerializer(data=data)
+        # The account and every memory
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data['memories'], memories)
+
+        serializer = CharacterSerializer(data={**data, 'memories': [memories[0].id, 0]})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Invalid pk "0"', str(serializer.errors['memories']))
+
 class DeleteAccountViewTestCase(APITestCase):
     def setUp(self):
         # Create a test user
@@ -743,6 +1028,170 @@ class ListBelovedOneFromAccountViewTest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class UpdateBelovedOnesTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Family')
+        self.relatives = [
+            User.objects.create_user(username=f'relative{i}', email=f'relative{i}@example.com') for i in range(8)
+        ]
+        self.account.beloved_ones.add(*self.relatives[:2])
+        self.url = reverse('update_beloved_ones', kwargs={'pk': self.account.id})
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        acl_cache.clear_local()
+
+    def beloved_ones(self):
+        return set(self.account.beloved_ones.values_list('id', flat=True))
+
+    def test_add_and_remove(self):
+        add = [relative.id for relative in self.relatives[1:5]]
+        response = self.client.patch(self.url, {'add': add, 'remove': [self.relatives[0].id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in response.data['add']], ['unchanged', 'added', 'added', 'added']
+        )
+        self.assertEqual(response.data['remove'], [{'user': self.relatives[0].id, 'id': self.relatives[0].id, 'status': 'removed'}])
+        self.assertEqual(self.beloved_ones(), set(add))
+
+    def test_match_by_email(self):
+        response = self.client.patch(self.url, {
+            'add': ['Relative5@Example.com', 'nobody@example.com', self.relatives[6].id, 99999],
+            'remove': ['relative1@example.com', 'relative7@example.com'],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['add'], [
+            {'user': 'relative5@example.com', 'id': self.relatives[5].id, 'status': 'added'},
+            {'user': 'nobody@example.com', 'id': None, 'status': 'not_found'},
+            {'user': self.relatives[6].id, 'id': self.relatives[6].id, 'status': 'added'},
+            {'user': 99999, 'id': None, 'status': 'not_found'},
+        ])
+        self.assertEqual(response.data['remove'], [
+            {'user': 'relative1@example.com', 'id': self.relatives[1].id, 'status': 'removed'},
+            {'user': 'relative7@example.com', 'id': self.relatives[7].id, 'status': 'unchanged'},
+        ])
+        self.assertEqual(self.beloved_ones(), {self.relatives[0].id, self.relatives[5].id, self.relatives[6].id})
+
+    def test_query_count_does_not_grow_with_users(self):
+        # Account, account roles, users, current links, removed rows, added rows,
+        # updated_at, and a savepoint around the writes since the test runs in a transaction
+        with self.assertNumQueries(9):
+            self.client.patch(self.url, {'add': [self.relatives[2].email], 'remove': [self.relatives[0].id]}, format='json')
+        # Minus the account roles, which are cached now
+        with self.assertNumQueries(8):
+            self.client.patch(self.url, {
+                'add': [relative.email for relative in self.relatives[3:]],
+                'remove': [relative.id for relative in self.relatives[:3]],
+            }, format='json')
+        self.assertEqual(self.beloved_ones(), {relative.id for relative in self.relatives[3:]})
+
+    def test_nothing_changed_writes_nothing(self):
+        before = self.account.updated_at
+
+        # Account, account roles, users, current links and the savepoint, no writes
+        with self.assertNumQueries(6):
+            response = self.client.patch(self.url, {'add': [self.relatives[0].id], 'remove': ['nobody@example.com']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.updated_at, before)
+
+    def test_updates_access(self):
+        memory = Memory.objects.create(title='Family video', account=self.account)
+        url = reverse('retrieve_memory', kwargs={'pk': memory.pk})
+        self.client.force_authenticate(user=self.relatives[5])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(self.url, {'add': [self.relatives[5].email]}, format='json')
+        self.client.force_authenticate(user=self.relatives[5])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(self.url, {'remove': [self.relatives[5].id]}, format='json')
+        self.client.force_authenticate(user=self.relatives[5])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_requests(self):
+        for data in [
+            {},
+            {'add': [], 'remove': []},
+            {'add': ['not an email']},
+            {'add': ['²']},
+            {'add': [True]},
+            {'add': [self.relatives[3].id], 'remove': [self.relatives[3].email]},
+        ]:
+            with self.subTest(data=data):
+                response = self.client.patch(self.url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.beloved_ones(), {self.relatives[0].id, self.relatives[1].id})
+
+    def test_beloved_one_cannot_manage(self):
+        self.client.force_authenticate(user=self.relatives[0])
+
+        response = self.client.patch(self.url, {'add': [self.relatives[3].id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.beloved_ones(), {self.relatives[0].id, self.relatives[1].id})
+
+class AccessControlIndexTestCase(APITestCase):
+    def setUp(self):
+        acl_cache.clear_local()
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='testpassword')
+        self.beloved_one = User.objects.create_user(username='beloved', password='testpassword')
+        self.account = Account.objects.create(owner_user=self.owner, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.retrieve_memory_url = reverse('retrieve_memory', kwargs={'pk': self.memory.pk})
+
+    def test_roles(self):
+        self.account.beloved_ones.add(self.beloved_one)
+
+        self.assertEqual(get_account_roles(self.owner), {self.account.id: OWNER})
+        self.assertEqual(get_account_roles(self.beloved_one), {self.account.id: BELOVED_ONE})
+
+    def test_warm_index_runs_no_queries(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.owner
+        permission = MemoryPermissions()
+        get_account_roles(self.owner)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(permission.has_object_permission(request, None, self.memory))
+
+    def test_add_and_remove_beloved_one_update_index(self):
+        self.client.force_authenticate(user=self.beloved_one)
+        response = self.client.get(self.retrieve_memory_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.patch(reverse('add_beloved_one', kwargs={'pk': self.account.pk, 'beloved_one_id': self.beloved_one.pk}))
+        self.client.force_authenticate(user=self.beloved_one)
+        response = self.client.get(self.retrieve_memory_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.patch(reverse('remove_beloved_one', kwargs={'pk': self.account.pk, 'beloved_one_id': self.beloved_one.pk}))
+        self.client.force_authenticate(user=self.beloved_one)
+        response = self.client.get(self.retrieve_memory_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_delete_account_updates_index(self):
+        self.account.beloved_ones.add(self.beloved_one)
+        self.client.force_authenticate(user=self.beloved_one)
+        response = self.client.get(self.retrieve_memory_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.delete(reverse('delete_account', args=[self.account.pk]))
+
+        self.assertEqual(get_account_roles(self.owner), {})
+        self.client.force_authenticate(user=self.beloved_one)
+        response = self.client.get(self.retrieve_memory_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 # Character related tests
 class CharacterCreateTestCase(APITestCase):
     def setUp(self):
@@ -1089,6 +1538,66 @@ class MemoryListTestCase(APITestCase):
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+class MemoryListPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='TestAccount')
+        self.beloved_account = Account.objects.create(owner_user=User.objects.create_user(username='other'), name='Other')
+        self.beloved_account.beloved_ones.add(self.user)
+        for i in range(3):
+            self.account.beloved_ones.add(User.objects.create_user(username=f'beloved{i}'))
+        self.memories = [
+            Memory.objects.create(title=f'Memory {i}', account=self.account if i % 2 else self.beloved_account)
+            for i in range(5)
+        ]
+        for memory in self.memories:
+            Video.objects.create(file='path/to/video', memory=memory)
+        self.list_url = reverse('list_memories')
+        self.client.force_authenticate(user=self.user)
+
+    def test_pages_follow_next_link(self):
+        seen = []
+        url = self.list_url + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data), 2)
+            seen.extend(memory['id'] for memory in response.data)
+            link = response.get('Link')
+            url = link[1:link.index('>')] if link else None
+
+        self.assertEqual(seen, [memory.id for memory in reversed(self.memories)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_url + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(KeysetPagination, 'page_size', 2)
+    def test_unpaginated_without_page_size_or_cursor(self):
+        response = self.client.get(self.list_url)
+
+        # Clients from before pagination get every memory, newest first
+        self.assertEqual([memory['id'] for memory in response.data], [memory.id for memory in reversed(self.memories)])
+        self.assertFalse(response.has_header('Link'))
+
+        response = self.client.get(self.list_url, {'page_size': 2})
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(response.has_header('Link'))
+
+    def test_query_count_does_not_grow_with_memories(self):
+        # ETag versions, memories and their videos
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 5)
+
+        for i in range(10):
+            memory = Memory.objects.create(title=f'More {i}', account=self.account)
+            Video.objects.create(file='path/to/video', memory=memory)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 15)
+
 class MemoryAddCharacterTestCase(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
@@ -1183,6 +1692,87 @@ class MemoryRemoveCharacterTestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+class MemoryCharactersTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.beloved_one = User.objects.create_user(username='belovedone', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='TestAccount')
+        self.account.beloved_ones.add(self.beloved_one)
+        self.characters = [Character.objects.create(name=f'Character {i}', account=self.account) for i in range(8)]
+        self.memory = Memory.objects.create(title='Family video', account=self.account)
+        self.memory.characters.add(*self.characters[:2])
+        self.url = reverse('update_memory_characters', kwargs={'pk': self.memory.id})
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        acl_cache.clear_local()
+
+    def tagged(self):
+        return set(self.memory.characters.values_list('id', flat=True))
+
+    def test_add_and_remove(self):
+        add = [character.id for character in self.characters[1:]]
+        response = self.client.patch(self.url, {'add': add, 'remove': [self.characters[0].id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.memory.id)
+        self.assertEqual(self.tagged(), set(add))
+
+    def test_query_count_does_not_grow_with_characters(self):
+        # Memory, account roles, characters, added rows, updated_at, videos,
+        # and a savepoint around the writes since the test runs in a transaction
+        with self.assertNumQueries(8):
+            self.client.patch(self.url, {'add': [self.characters[2].id]}, format='json')
+        # Plus the removal, minus the account roles which are cached now
+        with self.assertNumQueries(8):
+            self.client.patch(self.url, {
+                'add': [character.id for character in self.characters[3:]],
+                'remove': [character.id for character in self.characters[:3]],
+            }, format='json')
+        self.assertEqual(self.tagged(), {character.id for character in self.characters[3:]})
+
+    def test_bumps_updated_at(self):
+        before = self.memory.updated_at
+        self.client.patch(self.url, {'add': [self.characters[2].id]}, format='json')
+
+        self.memory.refresh_from_db()
+        self.assertGreater(self.memory.updated_at, before)
+
+    def test_characters_of_other_accounts_are_rejected(self):
+        other_account = Account.objects.create(owner_user=self.beloved_one, name='Other')
+        other_character = Character.objects.create(name='Other', account=other_account)
+
+        response = self.client.patch(self.url, {'add': [self.characters[2].id, other_character.id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(other_character.id), str(response.data['add']))
+        self.assertEqual(self.tagged(), {self.characters[0].id, self.characters[1].id})
+
+    def test_deactivated_characters(self):
+        self.characters[1].is_active = False
+        self.characters[1].save()
+        self.characters[2].is_active = False
+        self.characters[2].save()
+
+        response = self.client.patch(self.url, {'add': [self.characters[2].id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.patch(self.url, {'remove': [self.characters[1].id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tagged(), {self.characters[0].id})
+
+    def test_invalid_requests(self):
+        for data in [{}, {'add': [], 'remove': []}, {'add': [self.characters[0].id], 'remove': [self.characters[0].id]}, {'add': ['x']}]:
+            with self.subTest(data=data):
+                response = self.client.patch(self.url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_beloved_one_cannot_tag(self):
+        self.client.force_authenticate(user=self.beloved_one)
+
+        response = self.client.patch(self.url, {'add': [self.characters[2].id]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
 # Video related tests
 
 class VideoCreateTestCase(APITestCase):
@@ -1224,6 +1814,7 @@ class VideoCreateTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Video.objects.count(), 1)
         self.assertEqual(Video.objects.get().memory.id, self.memory.id)
+        self.assertTrue(Video.objects.get().is_active)
 
     def test_create_video_not_authenticated(self):
 
@@ -1332,4 +1923,2211 @@ class VideoDeleteTestCase(APITestCase):
         self.client.force_authenticate(user=self.user)
         non_existent_video_url = reverse('delete_video', kwargs={'pk': 9999})
         response = self.client.delete(non_existent_video_url)
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class MediaURLCacheTestCase(APITestCase):
+    def setUp(self):
+        url_cache.clear()
+        self.addCleanup(url_cache.clear)
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/clip.mp4', thumbnail='thumbnails/clip.png')
+        self.client.force_authenticate(user=self.user)
+
+    def count_url_calls(self):
+        return mock.patch.object(FileSystemStorage, 'url', autospec=True, side_effect=lambda storage, name: f'/media/{name}')
+
+    def test_signed_urls_are_reused(self):
+        with self.count_url_calls() as url:
+            for _ in range(3):
+                response = self.client.get(reverse('retrieve_memory_video', kwargs={'pk': self.video.id}))
+                self.assertEqual(response.data['url'], 'http://testserver/media/videos/clip.mp4')
+            response = self.client.get(reverse('retrieve_memory', kwargs={'pk': self.memory.id}))
+        self.assertEqual(response.data['videos'][0]['thumbnail'], 'http://testserver/media/thumbnails/clip.png')
+        # One signature for the file and one for the thumbnail
+        self.assertEqual(url.call_count, 2)
+
+    @override_settings(MEDIA_URL_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self):
+        with self.count_url_calls() as url:
+            self.client.get(reverse('retrieve_memory_video', kwargs={'pk': self.video.id}))
+            self.client.get(reverse('retrieve_memory_video', kwargs={'pk': self.video.id}))
+        self.assertEqual(url.call_count, 2)
+
+    def test_delete_invalidates_urls(self):
+        self.client.get(reverse('retrieve_memory', kwargs={'pk': self.memory.id}))
+        self.assertEqual(len(url_cache), 2)
+
+        response = self.client.delete(reverse('delete_video', kwargs={'pk': self.video.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(url_cache), 0)
+
+    def test_delete_invalidates_every_signed_name(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_dir):
+            storage = default_storage
+            hls = [storage.save(f'hls/{self.video.id}/{name}', ContentFile(b'x')) for name in (
+                'master.m3u8', '360p/index.m3u8', '360p/segment-000.ts', '720p/segment-000.ts',
+            )]
+            self.video.poster = 'posters/clip.jpg'
+            self.video.thumbnails = {'small': 'thumbnails/clip-small.jpg', 'large': 'thumbnails/clip-large.jpg'}
+            self.video.hls_playlist = hls[0]
+            self.video.save()
+            names = [self.video.file.name, self.video.thumbnail.name, self.video.poster.name, *self.video.thumbnails.values(), *hls]
+            for name in names:
+                get_storage_url(storage, name)
+            self.assertEqual(len(url_cache), len(names))
+
+            response = self.client.delete(reverse('delete_video', kwargs={'pk': self.video.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(url_cache), 0)
+
+    @override_settings(MEDIA_URL_CACHE_MARGIN=300, MEDIA_URL_CACHE_TIMEOUT=600)
+    def test_ttl_stays_inside_signature_expiry(self):
+        storage = mock.Mock(querystring_auth=True, querystring_expire=3600)
+        self.assertEqual(get_url_ttl(storage), 3300)
+        storage.querystring_expire = 120
+        self.assertEqual(get_url_ttl(storage), 0)
+        self.assertEqual(get_url_ttl(mock.Mock(querystring_auth=False)), 600)
+
+@skipUnless(mock_aws, 'moto is not installed')
+@override_settings(VIDEO_UPLOAD_PART_SIZE=5 * 1024 * 1024, **S3_TEST_SETTINGS)
+class DirectVideoUploadTestCase(APITestCase):
+    def setUp(self):
+        # moto stands in for S3, including the presigned part URLs
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='griot-test-bucket')
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.another_user = User.objects.create_user(username='anotheruser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.client.force_authenticate(user=self.user)
+
+    def initiate(self, size):
+        return self.client.post(reverse('initiate_memory_video_upload'), {
+            'memory': self.memory.id,
+            'filename': 'clip.mp4',
+            'size': size,
+        }, format='json')
+
+    def upload_parts(self, upload, content):
+        parts = []
+        for part in upload['parts']:
+            start = (part['part_number'] - 1) * upload['part_size']
+            response = requests.put(part['url'], data=content[start:start + upload['part_size']])
+            self.assertEqual(response.status_code, 200)
+            parts.append({'part_number': part['part_number'], 'etag': response.headers['ETag']})
+        return parts
+
+    def test_multipart_upload(self):
+        content = b'v' * (6 * 1024 * 1024)
+        response = self.initiate(len(content))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = response.data
+        self.assertEqual(len(upload['parts']), 2)
+
+        parts = self.upload_parts(upload, content)
+        response = self.client.post(reverse('complete_memory_video_upload'), {
+            'upload_token': upload['upload_token'],
+            'parts': parts,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        video = Video.objects.get(memory=self.memory)
+        self.assertEqual(video.file.name, upload['name'])
+        self.assertEqual(self.s3.head_object(Bucket='griot-test-bucket', Key=upload['name'])['ContentLength'], len(content))
+
+    def test_initiate_not_authorized(self):
+        self.client.force_authenticate(user=self.another_user)
+        response = self.initiate(1024)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_complete_with_another_users_token(self):
+        upload = self.initiate(1024).data
+        parts = self.upload_parts(upload, b'v' * 1024)
+
+        self.client.force_authenticate(user=self.another_user)
+        response = self.client.post(reverse('complete_memory_video_upload'), {
+            'upload_token': upload['upload_token'],
+            'parts': parts,
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Video.objects.exists())
+
+    def test_complete_with_tampered_token(self):
+        response = self.client.post(reverse('complete_memory_video_upload'), {
+            'upload_token': 'tampered',
+            'parts': [{'part_number': 1, 'etag': 'etag'}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_abort(self):
+        upload = self.initiate(1024).data
+        response = self.client.post(reverse('abort_memory_video_upload'), {'upload_token': upload['upload_token']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.s3.list_multipart_uploads(Bucket='griot-test-bucket').get('Uploads', []), [])
+
+    @override_settings(DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage')
+    def test_filesystem_storage_is_not_supported(self):
+        response = self.initiate(1024)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ResumableVideoUploadTestCase(APITestCase):
+    def setUp(self):
+        staging_dir = tempfile.mkdtemp()
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        settings_override = override_settings(RESUMABLE_UPLOAD_DIR=staging_dir, MEDIA_ROOT=media_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.another_user = User.objects.create_user(username='anotheruser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.content = bytes(range(256)) * 400
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.post(reverse('create_resumable_memory_video_upload'), {
+            'memory': self.memory.id,
+            'filename': 'clip.mp4',
+            'size': len(self.content),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.upload_url = response['Location']
+
+    def send_chunk(self, offset, data, checksum=None):
+        if checksum is None:
+            checksum = base64.b64encode(hashlib.sha256(data).digest()).decode()
+        return self.client.patch(
+            self.upload_url,
+            data=data,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_UPLOAD_CHECKSUM=f'sha256 {checksum}',
+        )
+
+    def test_upload_resumes_from_current_offset(self):
+        half = len(self.content) // 2
+        response = self.send_chunk(0, self.content[:half])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response['Upload-Offset'], str(half))
+
+        # A client that lost track of the offset asks for it and only sends the rest
+        response = self.client.head(self.upload_url)
+        self.assertEqual(response['Upload-Offset'], str(half))
+        response = self.send_chunk(half, self.content[half:])
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.post(self.upload_url + 'finish/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        video = Video.objects.get(memory=self.memory)
+        with video.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(VideoUpload.objects.get().video, video)
+
+    def test_offset_mismatch(self):
+        self.send_chunk(0, self.content[:1000])
+        response = self.send_chunk(0, self.content[:1000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '1000')
+
+    def test_checksum_mismatch_discards_chunk(self):
+        wrong = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self.send_chunk(0, self.content[:1000], checksum=wrong)
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(self.client.head(self.upload_url)['Upload-Offset'], '0')
+
+    def test_finish_incomplete_upload(self):
+        self.send_chunk(0, self.content[:1000])
+        response = self.client.post(self.upload_url + 'finish/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Video.objects.exists())
+
+    def test_chunk_past_declared_size(self):
+        response = self.send_chunk(0, self.content + b'extra')
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_other_user_cannot_resume(self):
+        self.client.force_authenticate(user=self.another_user)
+        response = self.client.head(self.upload_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_upload(self):
+        self.send_chunk(0, self.content[:1000])
+        response = self.client.delete(self.upload_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.head(self.upload_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_copy_to_storage_runs_after_the_claim(self):
+        self.send_chunk(0, self.content)
+        claims = []
+
+        def store(upload):
+            # Committed before the copy starts, so the row lock is already released
+            claims.append(VideoUpload.objects.get(pk=upload.pk).assembling_at)
+            return real_store(upload)
+
+        real_store = resumable.store
+        with mock.patch('api.resumable.store', side_effect=store):
+            response = self.client.post(self.upload_url + 'finish/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(claims[0])
+        self.assertIsNone(VideoUpload.objects.get().assembling_at)
+
+    def test_upload_being_finished_is_not_finished_or_deleted_twice(self):
+        self.send_chunk(0, self.content)
+        VideoUpload.objects.update(assembling_at=timezone.now())
+
+        self.assertEqual(self.client.post(self.upload_url + 'finish/').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.delete(self.upload_url).status_code, status.HTTP_409_CONFLICT)
+
+        # A claim whose request died is taken over once it times out
+        VideoUpload.objects.update(assembling_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(self.client.post(self.upload_url + 'finish/').status_code, status.HTTP_201_CREATED)
+
+    def test_file_name_with_a_path_is_rejected(self):
+        for filename in ['../clip.mp4', 'videos/clip.mp4', '..\\clip.mp4', '..']:
+            with self.subTest(filename=filename):
+                response = self.client.post(reverse('create_resumable_memory_video_upload'), {
+                    'memory': self.memory.id,
+                    'filename': filename,
+                    'size': len(self.content),
+                }, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('filename', response.data)
+
+    def test_finish_upload_staged_with_a_path(self):
+        self.send_chunk(0, self.content)
+        VideoUpload.objects.update(filename='../../clip.mp4')
+
+        response = self.client.post(self.upload_url + 'finish/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = VideoUpload.objects.get()
+        self.assertEqual(upload.video.file.name, f'videos/{upload.id}/clip.mp4')
+
+    def test_memory_deleted_while_copying(self):
+        self.send_chunk(0, self.content)
+
+        def store(upload):
+            Memory.objects.filter(pk=self.memory.pk).update(is_active=False)
+            return real_store(upload)
+
+        real_store = resumable.store
+        with mock.patch('api.resumable.store', side_effect=store):
+            response = self.client.post(self.upload_url + 'finish/')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Video.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(settings.MEDIA_ROOT) if files], [])
+        # Nor can a memory deleted before finishing get one
+        self.assertEqual(self.client.post(self.upload_url + 'finish/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_corrupted_chunk_is_rejected_on_finish(self):
+        half = len(self.content) // 2
+        self.send_chunk(0, self.content[:half])
+        self.send_chunk(half, self.content[half:])
+        upload = VideoUpload.objects.get()
+        with open(resumable.get_chunk_path(upload, half), 'r+b') as chunk:
+            chunk.write(b'corrupted')
+
+        response = self.client.post(self.upload_url + 'finish/')
+
+        self.assertEqual(response.status_code, 460)
+        self.assertFalse(Video.objects.exists())
+        # The partial copy is gone from storage
+        self.assertEqual([files for _, _, files in os.walk(settings.MEDIA_ROOT) if files], [])
+        self.assertEqual(self.client.head(self.upload_url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+def make_png(width=1280, height=720):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class VideoThumbnailTestCase(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.video = Video.objects.create(
+            memory=self.memory, file=SimpleUploadedFile('clip.mp4', b'video', content_type='video/mp4')
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_generates_poster_and_sizes(self):
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            self.assertEqual(generate_thumbnails(self.video.id), Video.THUMBNAILS_READY)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_status, Video.THUMBNAILS_READY)
+        self.assertEqual(set(self.video.thumbnails), {'small', 'medium', 'large'})
+        self.assertEqual(self.video.thumbnail.name, self.video.thumbnails['medium'])
+        with self.video.file.storage.open(self.video.thumbnails['small']) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (160, 90))
+        with self.video.poster.open() as poster:
+            self.assertEqual(Image.open(poster).size, (1280, 720))
+
+    def test_regenerating_replaces_images(self):
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            generate_thumbnails(self.video.id)
+            self.video.refresh_from_db()
+            previous = [self.video.poster.name, *self.video.thumbnails.values()]
+            generate_thumbnails(self.video.id)
+
+        storage = self.video.file.storage
+        self.assertFalse(any(storage.exists(name) for name in previous))
+        self.video.refresh_from_db()
+        self.assertTrue(storage.exists(self.video.thumbnail.name))
+
+    def test_regenerating_never_deletes_new_images(self):
+        # Storages that overwrite, like S3 by default, hand back the name they were given
+        storage = self.video.file.storage
+        save = storage.save
+
+        def overwrite(name, content, max_length=None):
+            storage.delete(name)
+            return save(name, content, max_length)
+
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()), \
+                mock.patch('api.thumbnails.get_image_stem', return_value=f'{self.video.id}-fixed'):
+            generate_thumbnails(self.video.id)
+            with mock.patch.object(storage, 'save', side_effect=overwrite):
+                generate_thumbnails(self.video.id)
+
+        self.video.refresh_from_db()
+        self.assertTrue(storage.exists(self.video.poster.name))
+        self.assertTrue(all(storage.exists(name) for name in self.video.thumbnails.values()))
+
+    def test_videos_with_the_same_file_name_keep_their_own_images(self):
+        other = Video.objects.create(memory=self.memory, file=self.video.file.name)
+
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            generate_thumbnails(self.video.id)
+            generate_thumbnails(other.id)
+
+        self.video.refresh_from_db()
+        other.refresh_from_db()
+        self.assertNotEqual(self.video.poster.name, other.poster.name)
+        self.assertTrue(self.video.poster.name.startswith(f'posters/{self.video.id}-'))
+
+    def test_uploaded_thumbnail_is_kept(self):
+        self.video.thumbnail = SimpleUploadedFile('custom.png', make_png(32, 32), content_type='image/png')
+        self.video.save()
+
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            generate_thumbnails(self.video.id)
+
+        self.video.refresh_from_db()
+        self.assertTrue(self.video.thumbnail.name.startswith('thumbnails/custom'))
+        self.assertEqual(len(self.video.thumbnails), 3)
+
+    def test_failed_extraction_is_recorded(self):
+        with mock.patch('api.thumbnails.extract_frame', side_effect=FrameExtractionError('boom')):
+            self.assertEqual(generate_thumbnails(self.video.id), Video.THUMBNAILS_FAILED)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_status, Video.THUMBNAILS_FAILED)
+        self.assertEqual(self.video.thumbnails, {})
+
+    def test_transient_failure_is_raised_for_retry(self):
+        with mock.patch('api.thumbnails.extract_frame', side_effect=TransientFrameExtractionError('ffmpeg exited with 1')):
+            with self.assertRaises(TransientFrameExtractionError):
+                generate_thumbnails(self.video.id, retry=True)
+            self.video.refresh_from_db()
+            self.assertEqual(self.video.thumbnail_status, Video.THUMBNAILS_PENDING)
+
+            self.assertEqual(generate_thumbnails(self.video.id), Video.THUMBNAILS_FAILED)
+
+    def test_storage_failure_removes_partial_images(self):
+        storage = self.video.file.storage
+        save = storage.save
+        saved = []
+
+        def save_then_fail(name, content, max_length=None):
+            if saved:
+                raise OSError('storage unavailable')
+            saved.append(save(name, content, max_length))
+            return saved[-1]
+
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()), \
+                mock.patch.object(storage, 'save', side_effect=save_then_fail):
+            with self.assertRaises(OSError):
+                generate_thumbnails(self.video.id, retry=True)
+
+        self.assertFalse(storage.exists(saved[0]))
+
+    def test_thumbnail_job_retries_transient_failures(self):
+        enqueue(generate_video_thumbnails, self.video.id)
+
+        for attempt in range(generate_video_thumbnails.task_max_attempts):
+            Job.objects.update(run_at=timezone.now())
+            [job] = claim('test-worker')
+            with mock.patch('api.thumbnails.extract_frame', side_effect=TransientFrameExtractionError('boom')):
+                result = execute(job)
+            if attempt < generate_video_thumbnails.task_max_attempts - 1:
+                self.assertEqual(result, Job.QUEUED)
+
+        # The last attempt records the failure instead of raising
+        self.assertEqual(result, Job.SUCCEEDED)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_status, Video.THUMBNAILS_FAILED)
+
+    def test_upload_queues_processing(self):
+        response = self.client.post(reverse('upload_memory_video'), {
+            'memory': self.memory.id,
+            'file': SimpleUploadedFile('new.mp4', b'video', content_type='video/mp4'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        jobs = Job.objects.order_by('-priority')
+        self.assertEqual(
+            [(job.name, job.args) for job in jobs],
+            [
+                (generate_video_thumbnails.task_name, [response.data['id']]),
+                (transcode_video.task_name, [response.data['id']]),
+            ],
+        )
+
+    def test_serializer_exposes_thumbnail_urls(self):
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            generate_thumbnails(self.video.id)
+
+        response = self.client.get(reverse('retrieve_memory', kwargs={'pk': self.memory.id}))
+
+        video = response.data['videos'][0]
+        self.assertEqual(video['thumbnail_status'], Video.THUMBNAILS_READY)
+        self.assertTrue(video['poster'].startswith('http://testserver/media/posters/'))
+        self.assertEqual(set(video['thumbnails']), {'small', 'medium', 'large'})
+        self.assertTrue(video['thumbnails']['small'].startswith('http://testserver/media/thumbnails/'))
+
+    @skipUnless(shutil.which('ffmpeg'), 'ffmpeg is not installed')
+    def test_extracts_frame_with_ffmpeg(self):
+        path = os.path.join(tempfile.mkdtemp(), 'clip.mp4')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=0.5:size=320x240:rate=10', path],
+            check=True,
+        )
+        with open(path, 'rb') as clip:
+            video = Video.objects.create(memory=self.memory, file=SimpleUploadedFile('clip.mp4', clip.read()))
+
+        self.assertEqual(generate_thumbnails(video.id), Video.THUMBNAILS_READY)
+
+
+class BackfillThumbnailsTestCase(APITransactionTestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = User.objects.create_user(username='testuser', password='testpass')
+        account = Account.objects.create(owner_user=user, name='Test Account')
+        memory = Memory.objects.create(title='Test memory', account=account)
+        self.videos = [
+            Video.objects.create(memory=memory, file=f'videos/clip-{index}.mp4') for index in range(5)
+        ]
+        Video.objects.filter(id=self.videos[0].id).update(thumbnail_status=Video.THUMBNAILS_FAILED)
+        Video.objects.filter(id=self.videos[1].id).update(is_active=False)
+
+    def test_backfill_processes_pending_videos(self):
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            call_command('backfill_thumbnails', batch_size=2, workers=2, stdout=io.StringIO())
+
+        statuses = dict(Video.objects.values_list('id', 'thumbnail_status'))
+        self.assertEqual(statuses[self.videos[0].id], Video.THUMBNAILS_FAILED)
+        self.assertEqual(statuses[self.videos[1].id], Video.THUMBNAILS_PENDING)
+        for video in self.videos[2:]:
+            self.assertEqual(statuses[video.id], Video.THUMBNAILS_READY)
+
+    def test_backfill_retries_failed_videos(self):
+        with mock.patch('api.thumbnails.extract_frame', return_value=make_png()):
+            call_command('backfill_thumbnails', retry_failed=True, stdout=io.StringIO())
+
+        self.assertEqual(Video.objects.get(id=self.videos[0].id).thumbnail_status, Video.THUMBNAILS_READY)
+
+
+def fake_transcode_rendition(source, output_dir, rendition, has_audio):
+    os.makedirs(os.path.join(output_dir, rendition['name']))
+    with open(os.path.join(output_dir, rendition['name'], 'index.m3u8'), 'w') as playlist:
+        playlist.write('#EXTM3U\n#EXTINF:6.0,\nsegment_00000.ts\n#EXT-X-ENDLIST\n')
+    with open(os.path.join(output_dir, rendition['name'], 'segment_00000.ts'), 'wb') as segment:
+        segment.write(b'ts')
+
+
+class VideoTranscodingTestCase(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        url_cache.clear()
+
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.video = Video.objects.create(
+            memory=self.memory, file=SimpleUploadedFile('clip.mp4', b'video', content_type='video/mp4')
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def transcode(self, width=1920, height=1080):
+        with mock.patch('api.transcoding.probe', return_value=(width, height, True)), \
+                mock.patch('api.transcoding.transcode_rendition', side_effect=fake_transcode_rendition):
+            return transcode(self.video.id)
+
+    def test_transcode_stores_renditions_and_master_playlist(self):
+        self.assertEqual(self.transcode(), Video.HLS_READY)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, Video.HLS_READY)
+        self.assertEqual([rendition['name'] for rendition in self.video.hls_renditions], ['360p', '480p', '720p', '1080p'])
+        self.assertTrue(self.video.hls_playlist.startswith(f'videos/hls/{self.video.id}-'))
+
+        storage = self.video.file.storage
+        with storage.open(self.video.hls_playlist) as master:
+            lines = master.read().decode().splitlines()
+        self.assertIn('#EXT-X-STREAM-INF:BANDWIDTH=896000,RESOLUTION=640x360', lines)
+        self.assertIn('1080p/index.m3u8', lines)
+        for rendition in self.video.hls_renditions:
+            self.assertTrue(storage.exists(rendition['playlist']))
+
+    def test_retranscode_replaces_previous_renditions(self):
+        self.transcode()
+        self.video.refresh_from_db()
+        previous = self.video.hls_playlist
+
+        self.transcode()
+
+        self.video.refresh_from_db()
+        self.assertNotEqual(self.video.hls_playlist, previous)
+        self.assertFalse(self.video.file.storage.exists(previous))
+
+    def test_renditions_never_upscale(self):
+        renditions = plan_renditions(720, 1280)
+        self.assertEqual([rendition['name'] for rendition in renditions], ['360p', '480p', '720p'])
+        self.assertEqual((renditions[0]['width'], renditions[0]['height']), (360, 640))
+
+        renditions = plan_renditions(320, 240)
+        self.assertEqual(len(renditions), 1)
+        self.assertEqual((renditions[0]['width'], renditions[0]['height']), (320, 240))
+
+    def test_failed_transcode_is_recorded(self):
+        with mock.patch('api.transcoding.probe', side_effect=TranscodingError('boom')):
+            self.assertEqual(transcode(self.video.id), Video.HLS_FAILED)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, Video.HLS_FAILED)
+        self.assertEqual(self.video.hls_playlist, '')
+
+    def run_transcode_job(self, error):
+        job = Job.objects.get(name=transcode_video.task_name)
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        [job] = claim('test-worker')
+        with mock.patch('api.transcoding.probe', side_effect=error):
+            return execute(job)
+
+    def test_transient_failure_is_retried_by_the_queue(self):
+        enqueue(transcode_video, self.video.id)
+
+        for _ in range(transcode_video.task_max_attempts - 1):
+            self.assertEqual(self.run_transcode_job(TransientTranscodingError('ffmpeg exited with 1')), Job.QUEUED)
+            self.video.refresh_from_db()
+            self.assertEqual(self.video.hls_status, Video.HLS_PENDING)
+
+        # The last attempt records the failure instead of raising
+        self.assertEqual(self.run_transcode_job(TransientTranscodingError('ffmpeg exited with 1')), Job.SUCCEEDED)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, Video.HLS_FAILED)
+
+    def test_permanent_failure_is_not_retried(self):
+        enqueue(transcode_video, self.video.id)
+
+        self.assertEqual(self.run_transcode_job(TranscodingError('The file has no video stream.')), Job.SUCCEEDED)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_status, Video.HLS_FAILED)
+
+    def test_retrieve_falls_back_to_original(self):
+        response = self.client.get(reverse('retrieve_memory_video', kwargs={'pk': self.video.id}))
+
+        self.assertEqual(response.data['format'], 'original')
+        self.assertEqual(response.data['url'], f'http://testserver{self.video.file.url}')
+
+    def test_retrieve_returns_playlist_when_ready(self):
+        self.transcode()
+        self.video.refresh_from_db()
+
+        response = self.client.get(reverse('retrieve_memory_video', kwargs={'pk': self.video.id}))
+
+        self.assertEqual(response.data['format'], 'hls')
+        self.assertEqual(response.data['url'], f'http://testserver/media/{self.video.hls_playlist}')
+
+    def test_signed_playlist_rewrites_uris(self):
+        self.transcode()
+        self.video.refresh_from_db()
+        token = make_playlist_token(self.video)
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(reverse('hls_playlist', kwargs={'token': token, 'name': 'master.m3u8'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        variant_url = reverse('hls_playlist', kwargs={'token': token, 'name': '360p/index.m3u8'})
+        self.assertIn(f'http://testserver{variant_url}', response.content.decode().splitlines())
+
+        response = self.client.get(variant_url)
+        directory = posixpath.dirname(self.video.hls_playlist)
+        self.assertIn(f'/media/{directory}/360p/segment_00000.ts', response.content.decode().splitlines())
+
+    def test_playlist_rejects_bad_links(self):
+        self.transcode()
+        self.video.refresh_from_db()
+        token = make_playlist_token(self.video)
+
+        response = self.client.get(reverse('hls_playlist', kwargs={'token': token + 'x', 'name': 'master.m3u8'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('hls_playlist', kwargs={'token': token, 'name': '../../clip.m3u8'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        Video.objects.filter(id=self.video.id).update(is_active=False)
+        response = self.client.get(reverse('hls_playlist', kwargs={'token': token, 'name': 'master.m3u8'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), 'ffmpeg is not installed')
+    def test_transcodes_with_ffmpeg(self):
+        path = os.path.join(tempfile.mkdtemp(), 'clip.mp4')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), ignore_errors=True)
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=2:size=640x360:rate=10', path],
+            check=True,
+        )
+        with open(path, 'rb') as clip:
+            video = Video.objects.create(memory=self.memory, file=SimpleUploadedFile('clip.mp4', clip.read()))
+
+        self.assertEqual(transcode(video.id), Video.HLS_READY)
+
+
+CALLS = []
+
+
+@task
+def record_call(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise RuntimeError('boom')
+
+
+class JobQueueTestCase(APITestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def run_worker(self):
+        worker = Worker('test-worker', 0, threading.Event(), io.StringIO())
+        worker.run_pending()
+        return worker.processed
+
+    def test_jobs_run_by_priority_then_age(self):
+        enqueue(record_call, 'low', priority=-1)
+        enqueue(record_call, 'first')
+        enqueue(record_call, 'urgent', priority=10)
+        enqueue(record_call, 'second')
+
+        self.assertEqual(self.run_worker(), 4)
+        self.assertEqual(CALLS, ['urgent', 'first', 'second', 'low'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_scheduled_jobs_wait_until_due(self):
+        job = enqueue(record_call, 'later', delay=60)
+
+        self.assertEqual(self.run_worker(), 0)
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(self.run_worker(), 1)
+        self.assertEqual(CALLS, ['later'])
+
+    def test_claimed_jobs_are_skipped(self):
+        enqueue(record_call, 'a')
+        enqueue(record_call, 'b')
+
+        first = claim('worker-1')
+        second = claim('worker-2')
+
+        self.assertNotEqual(first[0].id, second[0].id)
+        self.assertEqual(claim('worker-3'), [])
+        self.assertEqual(Job.objects.get(id=first[0].id).locked_by, 'worker-1')
+
+    def test_failed_jobs_retry_with_backoff(self):
+        job = enqueue(always_fails)
+
+        self.assertEqual(execute(claim('worker')[0]), Job.QUEUED)
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(execute(claim('worker')[0]), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(claim('worker'), [])
+
+    def test_unknown_tasks_fail(self):
+        Job.objects.create(name='api.tests.removed_task')
+
+        self.assertEqual(execute(claim('worker')[0]), Job.FAILED)
+        with self.assertRaises(UnknownTask):
+            enqueue(lambda: None)
+
+    def test_stale_jobs_are_requeued(self):
+        running = enqueue(record_call, 'stale')
+        exhausted = enqueue(record_call, 'exhausted', max_attempts=1)
+        claim('dead-worker', limit=2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=3))
+
+        self.assertEqual(requeue_stale(timeout=60 * 60), 2)
+
+        running.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual((running.status, running.locked_by), (Job.QUEUED, ''))
+        self.assertEqual(exhausted.status, Job.FAILED)
+
+    @override_settings(JOB_KEEP_SUCCEEDED=True)
+    def test_succeeded_jobs_can_be_kept(self):
+        job = enqueue(record_call, 'kept')
+
+        self.run_worker()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+
+
+class AsyncViewsTestCase(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', email='test@test.com', password='testpass')
+        self.another_user = User.objects.create_user(username='anotheruser', password='testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.another_token = Token.objects.create(user=self.another_user)
+        self.account = Account.objects.create(owner_user=self.user, name='Test Account')
+        self.memory = Memory.objects.create(title='Test memory', account=self.account)
+        self.factory = AsyncRequestFactory()
+
+    def auth(self, token):
+        return {'headers': {'Authorization': f'Token {token.key}'}}
+
+    def test_views_run_as_coroutines(self):
+        for view in (AsyncCreateVideoMemoryView, AsyncRetrieveVideoMemoryView, AsyncPasswordResetView):
+            self.assertTrue(asyncio.iscoroutinefunction(view.as_view()))
+
+    async def test_upload_video(self):
+        request = self.factory.post('/api/memory/video/upload/', {
+            'memory': self.memory.id,
+            'file': SimpleUploadedFile('clip.mp4', b'video', content_type='video/mp4'),
+        }, **self.auth(self.token))
+
+        response = await AsyncCreateVideoMemoryView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        video = await Video.objects.aget(id=response.data['id'])
+        self.assertTrue(video.file.name.startswith('videos/clip'))
+        self.assertTrue(await sync_to_async(video.file.storage.exists)(video.file.name))
+        self.assertEqual(await Job.objects.filter(args=[video.id]).acount(), 2)
+
+    async def test_upload_video_not_owner(self):
+        request = self.factory.post('/api/memory/video/upload/', {
+            'memory': self.memory.id,
+            'file': SimpleUploadedFile('clip.mp4', b'video', content_type='video/mp4'),
+        }, **self.auth(self.another_token))
+
+        response = await AsyncCreateVideoMemoryView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(await Video.objects.aexists())
+
+    async def test_retrieve_video(self):
+        video = await Video.objects.acreate(memory=self.memory, file='videos/clip.mp4')
+        request = self.factory.get(f'/api/memory/video/retrieve/{video.id}/', **self.auth(self.token))
+
+        response = await AsyncRetrieveVideoMemoryView.as_view()(request, pk=video.id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'url': 'http://testserver/media/videos/clip.mp4', 'format': 'original'})
+
+    async def test_retrieve_video_not_authenticated(self):
+        video = await Video.objects.acreate(memory=self.memory, file='videos/clip.mp4')
+        request = self.factory.get(f'/api/memory/video/retrieve/{video.id}/')
+
+        response = await AsyncRetrieveVideoMemoryView.as_view()(request, pk=video.id)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_password_reset_queues_email(self):
+        request = self.factory.post('/api/user/password-reset/', {'email': 'test@test.com'})
+
+        response = await AsyncPasswordResetView.as_view()(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await Job.objects.filter(name=send_password_reset_email.task_name).acount(), 1)
+
+
+class GunicornConfigTestCase(APITestCase):
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+    def load_config(self, **environ):
+        environ = {'SERVER_MODE': '', 'WEB_CONCURRENCY': '', 'GUNICORN_THREADS': '', **environ}
+        with mock.patch.dict(os.environ, environ), mock.patch('os.sched_getaffinity', return_value={0, 1}, create=True):
+            return runpy.run_path(self.config_path)
+
+    def test_sync_workers_from_cpu_count(self):
+        config = self.load_config()
+
+        self.assertEqual(config['worker_class'], 'sync')
+        self.assertEqual(config['workers'], 5)
+        self.assertTrue(config['preload_app'])
+        self.assertGreater(config['max_requests'], 0)
+        self.assertGreater(config['max_requests_jitter'], 0)
+
+    def test_threaded_workers(self):
+        config = self.load_config(GUNICORN_THREADS='4')
+
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertEqual(config['threads'], 4)
+
+    def test_asgi_workers(self):
+        config = self.load_config(SERVER_MODE='asgi')
+
+        self.assertEqual(config['worker_class'], 'uvicorn_worker.UvicornWorker')
+        self.assertEqual(config['workers'], 2)
+
+    def test_web_concurrency_overrides_worker_count(self):
+        self.assertEqual(self.load_config(WEB_CONCURRENCY='3')['workers'], 3)
+        self.assertEqual(self.load_config(SERVER_MODE='asgi', WEB_CONCURRENCY='3')['workers'], 3)
+
+    def test_memory_stats(self):
+        stats = read_memory_stats()
+
+        self.assertGreater(stats['rss'], 0)
+        self.assertIn('rss=', format_memory_stats(stats))
+
+    @skipUnless(os.path.exists('/proc/self/smaps_rollup'), 'Requires /proc/<pid>/smaps_rollup')
+    def test_memory_stats_split_shared_and_private(self):
+        stats = read_memory_stats()
+
+        self.assertEqual(stats['shared'] + stats['private'], stats['rss'])
+        self.assertGreater(stats['pss'], 0)
+
+
+class DatabaseConnectionSettingsTestCase(APITestCase):
+    settings_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'griot_backend', 'settings_dev.py')
+
+    def load_database(self, **environ):
+        environ = {
+            'SERVER_MODE': '', 'DATABASE_CONN_MAX_AGE': '', 'DATABASE_CONN_HEALTH_CHECKS': '', 'DATABASE_POOLER': '',
+            **environ,
+        }
+        with mock.patch.dict(os.environ, environ):
+            for name, value in environ.items():
+                if not value:
+                    del os.environ[name]
+            return runpy.run_path(self.settings_path)['DATABASES']['default']
+
+    def test_persistent_connections_by_default(self):
+        database = self.load_database()
+
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertFalse(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_connection_settings_from_environment(self):
+        database = self.load_database(DATABASE_CONN_MAX_AGE='none', DATABASE_CONN_HEALTH_CHECKS='false')
+
+        self.assertIsNone(database['CONN_MAX_AGE'])
+        self.assertFalse(database['CONN_HEALTH_CHECKS'])
+
+    def test_asgi_closes_connections_after_requests(self):
+        self.assertEqual(self.load_database(SERVER_MODE='asgi')['CONN_MAX_AGE'], 0)
+
+    def test_transaction_pooler_mode(self):
+        database = self.load_database(DATABASE_POOLER='transaction')
+
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertIs(database['OPTIONS']['server_side_binding'], False)
+
+    def test_pooler_mode_iterates_without_server_side_cursors(self):
+        user = User.objects.create_user(username='pooler-user', password='pooler-password')
+        for index in range(3):
+            Account.objects.create(owner_user=user, name=f'Account {index}')
+
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            names, cursors = self.iterate_accounts()
+        self.assertEqual(names, ['Account 0', 'Account 1', 'Account 2'])
+        self.assertEqual(cursors, [])
+
+        names, cursors = self.iterate_accounts()
+        self.assertEqual(len(cursors), 1)
+
+    def iterate_accounts(self):
+        iterator = Account.objects.order_by('id').iterator(chunk_size=2)
+        names = [next(iterator).name]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM pg_cursors WHERE name LIKE '_django_curs%%'")
+            cursors = cursor.fetchall()
+        return names + [account.name for account in iterator], cursors
+
+
+class BatchTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='batch-user', password='batch-password')
+        self.profile = Profile.objects.create(user=self.user, name='Batch')
+        self.account = Account.objects.create(owner_user=self.user, name='Batch Account')
+        self.memory = Memory.objects.create(title='Batch Memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/batch.mp4')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('batch')
+
+    def batch(self, *requests):
+        return self.client.post(self.url, {'requests': list(requests)}, format='json')
+
+    def test_home_screen(self):
+        paths = [
+            reverse('retrieve_profile'),
+            reverse('list_accounts'),
+            reverse('list_memories'),
+            reverse('retrieve_memory_video', args=[self.video.id]),
+        ]
+
+        response = self.batch(*[{'path': path} for path in paths])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        responses = response.data['responses']
+        self.assertEqual([item['status'] for item in responses], [200] * 4)
+        for path, item in zip(paths, responses):
+            with self.subTest(path=path):
+                self.assertEqual(item['body'], json.loads(self.client.get(path).content))
+        self.assertIn('ETag', responses[0]['headers'])
+
+    def test_authenticates_once(self):
+        with mock.patch.object(
+            CustomTokenAuthentication, 'authenticate_credentials', autospec=True,
+            side_effect=CustomTokenAuthentication.authenticate_credentials,
+        ) as authenticate:
+            response = self.batch({'path': reverse('retrieve_profile')}, {'path': reverse('list_memories')})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_requests_run_in_order(self):
+        response = self.batch(
+            {'method': 'POST', 'path': reverse('create_memory'), 'body': {'account': self.account.id, 'title': 'Second'}},
+            {'path': reverse('list_memories') + '?page_size=1'},
+            {'method': 'POST', 'path': reverse('create_memory'), 'body': {'title': 'No account'}},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created, listed, invalid = response.data['responses']
+        self.assertEqual(created['status'], status.HTTP_201_CREATED)
+        self.assertEqual([memory['title'] for memory in listed['body']], ['Second'])
+        # A failed sub-request doesn't undo the ones before it
+        self.assertEqual(invalid['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertIn('account', invalid['body'])
+        self.assertTrue(Memory.objects.filter(title='Second').exists())
+
+    def test_conditional_sub_requests(self):
+        path = reverse('retrieve_memory', args=[self.memory.id])
+        etag = self.batch({'path': path}).data['responses'][0]['headers']['ETag']
+
+        response = self.client.post(
+            self.url, {'requests': [{'path': path, 'headers': {'If-None-Match': etag}}, {'path': path}]},
+            format='json', HTTP_IF_NONE_MATCH=etag,
+        )
+
+        not_modified, full = response.data['responses']
+        self.assertEqual(not_modified['status'], status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(not_modified['body'])
+        # The batch's own If-None-Match is not passed on
+        self.assertEqual(full['status'], status.HTTP_200_OK)
+        self.assertEqual(full['body']['title'], 'Batch Memory')
+
+    def test_permissions_apply_to_sub_requests(self):
+        other = User.objects.create_user(username='batch-other', password='batch-password')
+        other_memory = Memory.objects.create(title='Other', account=Account.objects.create(owner_user=other, name='Other'))
+
+        response = self.batch({'path': reverse('retrieve_memory', args=[other_memory.id])})
+
+        self.assertEqual(response.data['responses'][0]['status'], status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_paths(self):
+        response = self.batch(
+            {'path': '/api/nothing-here/'},
+            {'path': '/admin/'},
+            {'path': self.url},
+            {'method': 'DELETE', 'path': reverse('list_memories')},
+        )
+
+        self.assertEqual(
+            [item['status'] for item in response.data['responses']],
+            [status.HTTP_404_NOT_FOUND] * 3 + [status.HTTP_405_METHOD_NOT_ALLOWED],
+        )
+
+    def test_server_errors(self):
+        with mock.patch.object(MemorySerializer, 'to_representation', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.batch', 'ERROR') as logs:
+            response = self.batch(
+                {'path': reverse('retrieve_memory', args=[self.memory.id])},
+                {'path': reverse('retrieve_profile')},
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        failed, profile = response.data['responses']
+        self.assertEqual(failed, {'status': 500, 'headers': {}, 'body': {'detail': 'Internal server error.'}})
+        # The error fails its own entry only
+        self.assertEqual(profile['status'], status.HTTP_200_OK)
+        self.assertIn('RuntimeError: boom', logs.output[0])
+
+    def test_async_views(self):
+        # Under ASGI the video retrieve route is served by an async view
+        path = reverse('retrieve_memory_video', args=[self.video.id])
+        match = resolve(path)
+        match.func = AsyncRetrieveVideoMemoryView.as_view()
+
+        with mock.patch('api.batch.resolve', return_value=match):
+            response = self.batch({'path': path})
+
+        self.assertEqual(response.data['responses'][0]['status'], status.HTTP_200_OK)
+        self.assertEqual(response.data['responses'][0]['body']['format'], 'original')
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_max_requests(self):
+        path = reverse('retrieve_profile')
+
+        self.assertEqual(self.batch(*[{'path': path}] * 2).status_code, status.HTTP_200_OK)
+        response = self.batch(*[{'path': path}] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('no more than 2', str(response.data['requests']))
+
+    def test_invalid_batches(self):
+        path = reverse('retrieve_profile')
+        for requests in [
+            [],
+            [{}],
+            [{'method': 'OPTIONS', 'path': path}],
+            [{'path': path, 'headers': {'Authorization': 'Token other'}}],
+            [{'path': path, 'headers': {'Bad Header': 'x'}}],
+        ]:
+            with self.subTest(requests=requests):
+                self.assertEqual(self.batch(*requests).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unauthenticated(self):
+        self.client.credentials()
+
+        response = self.batch({'path': reverse('retrieve_profile')})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+@override_settings(DATABASE_READ_REPLICAS=['replica'], DATABASE_REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTestCase(APITransactionTestCase):
+    # The replica is a second database that only gets the rows a test copies to it, so
+    # anything missing there stands for writes that have not been replicated yet. Reads
+    # inside a transaction stay on the primary, hence a transaction test case.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        acl_cache.clear_local()
+        token_cache.clear_local()
+        self.user = User.objects.create_user(username='replica-user', password='replica-password')
+        self.account = Account.objects.create(owner_user=self.user, name='Replica Account')
+        self.token = Token.objects.create(user=self.user)
+        self.replicate(self.user, self.account)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def replicate(self, *objects):
+        for obj in objects:
+            obj.save(using='replica', force_insert=True)
+            obj._state.db = 'default'
+
+    def list_titles(self):
+        response = self.client.get(reverse('list_memories'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [memory['title'] for memory in response.data]
+
+    def test_reads_go_to_replica(self):
+        replicated = Memory.objects.create(title='Replicated', account=self.account)
+        self.replicate(replicated)
+        Memory.objects.create(title='Lagging', account=self.account)
+
+        self.assertEqual(self.list_titles(), ['Replicated'])
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.client.post(reverse('create_memory'), {'account': self.account.id, 'title': 'New'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertTrue(is_pinned(self.user.id))
+        self.assertEqual(self.list_titles(), ['New'])
+
+        # Once the pin expires reads go back to the replica, which by now would have the memory
+        cache.clear()
+        self.assertEqual(self.list_titles(), [])
+
+    def test_pin_is_per_user(self):
+        other = User.objects.create_user(username='replica-other', password='replica-password')
+        other_token = Token.objects.create(user=other)
+        self.account.beloved_ones.add(other)
+        self.replicate(other)
+        Account.beloved_ones.through.objects.using('replica').create(account_id=self.account.id, user_id=other.id)
+
+        self.client.post(reverse('create_memory'), {'account': self.account.id, 'title': 'New'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {other_token.key}')
+
+        self.assertEqual(self.list_titles(), [])
+
+    def test_authentication_reads_from_primary(self):
+        # A token created by a login that has not reached the replica yet
+        Token.objects.filter(user=self.user).delete()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(self.list_titles(), [])
+
+    def test_unsafe_requests_read_from_primary(self):
+        memory = Memory.objects.create(title='Lagging', account=self.account)
+
+        response = self.client.patch(reverse('update_memory', args=[memory.id]), {'title': 'Renamed'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Memory.objects.get(id=memory.id).title, 'Renamed')
+
+    def test_acl_is_built_from_primary(self):
+        other = User.objects.create_user(username='replica-other', password='replica-password')
+        other_token = Token.objects.create(user=other)
+        self.replicate(other)
+        memory = Memory.objects.create(title='Shared', account=self.account)
+        self.replicate(memory)
+        self.account.beloved_ones.add(other)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {other_token.key}')
+
+        response = self.client.get(reverse('retrieve_memory', args=[memory.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_account_roles(other), {self.account.id: BELOVED_ONE})
+
+    def test_read_only_batch_reads_from_replica(self):
+        Memory.objects.create(title='Lagging', account=self.account)
+
+        response = self.client.post(reverse('batch'), {'requests': [{'path': reverse('list_memories')}]}, format='json')
+
+        self.assertEqual(response.data['responses'][0]['body'], [])
+        self.assertFalse(is_pinned(self.user.id))
+
+    def test_batch_reads_its_own_writes(self):
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'method': 'POST', 'path': reverse('create_memory'), 'body': {'account': self.account.id, 'title': 'New'}},
+            {'path': reverse('list_memories')},
+        ]}, format='json')
+
+        self.assertEqual([memory['title'] for memory in response.data['responses'][1]['body']], ['New'])
+        self.assertTrue(is_pinned(self.user.id))
+
+    @override_settings(DATABASE_READ_REPLICAS=[])
+    def test_no_replicas(self):
+        Memory.objects.create(title='Lagging', account=self.account)
+
+        self.assertEqual(self.list_titles(), ['Lagging'])
+        self.assertFalse(is_pinned(self.user.id))
+
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='etag-user', password='etag-password')
+        self.beloved_one = User.objects.create_user(username='etag-beloved', password='etag-password')
+        self.profile = Profile.objects.create(user=self.user)
+        self.account = Account.objects.create(owner_user=self.user, name='ETag Account')
+        self.memory = Memory.objects.create(title='ETag Memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/etag.mp4')
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assertNotModified(self, url, etag, serializer):
+        with mock.patch.object(serializer, 'to_representation', side_effect=AssertionError('serialized')):
+            response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_retrieve_memory(self):
+        url = reverse('retrieve_memory', args=[self.memory.id])
+        response = self.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+
+        self.assertNotModified(url, etag, MemorySerializer)
+
+        self.memory.title = 'Renamed'
+        self.memory.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_retrieve_memory_changes_with_videos(self):
+        url = reverse('retrieve_memory', args=[self.memory.id])
+        etag = self.get(url)['ETag']
+
+        self.video.is_active = False
+        self.video.save()
+        etag_after_delete = self.get(url)['ETag']
+        Video.objects.create(memory=self.memory, file='videos/etag-2.mp4')
+
+        self.assertEqual(len({etag, etag_after_delete, self.get(url)['ETag']}), 3)
+
+    def test_retrieve_memory_permissions_checked_first(self):
+        url = reverse('retrieve_memory', args=[self.memory.id])
+        etag = self.get(url)['ETag']
+        other = User.objects.create_user(username='etag-other', password='etag-password')
+        self.client.force_authenticate(user=other)
+
+        self.assertEqual(self.get(url, etag).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_memories(self):
+        url = reverse('list_memories')
+        etag = self.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertNotModified(url, etag, MemorySerializer)
+
+        Memory.objects.create(title='Another', account=self.account)
+        self.assertEqual(self.get(url, etag).status_code, status.HTTP_200_OK)
+
+    def test_list_memories_video_processed(self):
+        url = reverse('list_memories')
+        etag = self.get(url)['ETag']
+
+        Video.objects.filter(id=self.video.id).update(thumbnail_status=Video.THUMBNAILS_FAILED, updated_at=timezone.now())
+
+        self.assertNotEqual(self.get(url)['ETag'], etag)
+
+    def test_list_memories_page_etag(self):
+        url = reverse('list_memories') + '?page_size=1'
+        older = self.memory
+        Memory.objects.filter(id=older.id).update(created_at=timezone.now() - timedelta(days=1))
+        newest = Memory.objects.create(title='Newest', account=self.account)
+        oldest = Memory.objects.create(title='Oldest', account=self.account)
+        Memory.objects.filter(id=oldest.id).update(created_at=timezone.now() - timedelta(days=2))
+        etag = self.get(url)['ETag']
+
+        # The page and the row after it are versioned, the rest of the history is not
+        Memory.objects.filter(id=oldest.id).update(title='Renamed', updated_at=timezone.now())
+        self.assertEqual(self.get(url, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Memory.objects.filter(id=older.id).update(title='Renamed', updated_at=timezone.now())
+        etag_after_next = self.get(url)['ETag']
+        self.assertNotEqual(etag_after_next, etag)
+
+        Video.objects.create(memory=newest, file='videos/etag-newest.mp4')
+        self.assertNotEqual(self.get(url)['ETag'], etag_after_next)
+
+    def test_list_memories_page_row_deleted(self):
+        url = reverse('list_memories') + '?page_size=2'
+        self.video.delete()
+        memories = [Memory.objects.create(title=f'Page {index}', account=self.account) for index in range(3)]
+        etag = self.get(url)['ETag']
+
+        # The rows after it move up, keeping the count and the latest updated_at
+        Memory.objects.filter(id=memories[1].id).update(is_active=False)
+
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([memory['id'] for memory in response.data], [memories[2].id, memories[0].id])
+
+    def test_list_etag_depends_on_query(self):
+        url = reverse('list_memories')
+
+        self.assertNotEqual(self.get(url)['ETag'], self.get(url + '?page_size=1')['ETag'])
+
+    def test_retrieve_profile(self):
+        url = reverse('retrieve_profile')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, ProfileSerializer)
+
+        self.profile.bio = 'Updated'
+        self.profile.save()
+        self.assertEqual(self.get(url, etag).status_code, status.HTTP_200_OK)
+
+    def test_list_accounts(self):
+        url = reverse('list_accounts')
+        etag = self.get(url)['ETag']
+
+        self.assertNotModified(url, etag, UserAccountSerializer)
+
+        self.client.patch(reverse('add_beloved_one', args=[self.account.id, self.beloved_one.id]))
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['owned_accounts'][0]['beloved_ones'], [self.beloved_one.id])
+
+    def test_list_accounts_beloved_one_user_changed(self):
+        self.account.beloved_ones.add(self.beloved_one)
+        url = reverse('list_accounts')
+        etag = self.get(url)['ETag']
+
+        User.objects.filter(id=self.beloved_one.id).update(email='etag-beloved@example.com')
+
+        self.assertEqual(self.get(url, etag).status_code, status.HTTP_200_OK)
+
+    def test_list_accounts_beloved_one(self):
+        self.account.beloved_ones.add(self.beloved_one)
+        self.client.force_authenticate(user=self.beloved_one)
+        url = reverse('list_accounts')
+        etag = self.get(url)['ETag']
+
+        self.client.force_authenticate(user=self.user)
+        self.client.patch(reverse('remove_beloved_one', args=[self.account.id, self.beloved_one.id]))
+        # A fresh instance, as authentication loads for each request
+        self.client.force_authenticate(user=User.objects.get(id=self.beloved_one.id))
+
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['beloved_accounts'], [])
+
+    def test_weak_and_wildcard_match(self):
+        url = reverse('list_memories')
+        etag = self.get(url)['ETag']
+
+        self.assertEqual(self.get(url, f'"other", W/{etag}').status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get(url, '*').status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.get(url, '"other"').status_code, status.HTTP_200_OK)
+
+    @override_settings(MEDIA_URL_CACHE_MARGIN=300)
+    def test_url_version_expires_signed_urls(self):
+        storage = mock.Mock(querystring_auth=True)
+
+        with mock.patch('time.time', return_value=1000):
+            version = get_url_version(storage)
+        with mock.patch('time.time', return_value=1300):
+            self.assertNotEqual(get_url_version(storage), version)
+        self.assertEqual(get_url_version(FileSystemStorage()), 0)
+
+
+class SparseFieldsetTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        acl_cache.clear_local()
+        self.user = User.objects.create_user(username='fieldset-user', email='fieldset@example.com', password='testpass')
+        self.profile = Profile.objects.create(user=self.user, name='Fieldset', last_name='User')
+        self.account = Account.objects.create(owner_user=self.user, name='Fieldset Account')
+        for i in range(3):
+            beloved_one = User.objects.create_user(username=f'fieldset-beloved{i}')
+            Profile.objects.create(user=beloved_one, name=f'Beloved {i}')
+            self.account.beloved_ones.add(beloved_one)
+        self.memories = [Memory.objects.create(title=f'Memory {i}', account=self.account) for i in range(3)]
+        for memory in self.memories:
+            Video.objects.create(memory=memory, file=f'videos/fieldset-{memory.id}.mp4')
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_screen_fields(self):
+        url = reverse('list_memories')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,title'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': memory.id, 'title': memory.title} for memory in reversed(self.memories)])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        # No videos loaded, and only the columns needed by the body and the cursor selected
+        self.assertNotIn('FROM "memories_video"', sql)
+        self.assertIn('SELECT "memories_memory"."id", "memories_memory"."title", "memories_memory"."created_at" FROM', sql)
+        self.assertLess(len(queries), self.count_queries(url))
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        return len(queries)
+
+    def test_nested_fields(self):
+        response = self.client.get(reverse('retrieve_memory', args=[self.memories[0].id]), {'fields': 'title,videos.url'})
+
+        self.assertEqual(response.data, {
+            'title': 'Memory 0',
+            'videos': [{'url': f'http://testserver/media/videos/fieldset-{self.memories[0].id}.mp4'}],
+        })
+
+    def test_expand(self):
+        url = reverse('retrieve_memory', args=[self.memories[0].id])
+
+        self.assertEqual(set(self.client.get(url, {'fields': 'id'}).data), {'id'})
+        self.assertEqual(set(self.client.get(url, {'expand': 'videos'}).data), {'id', 'account', 'title', 'videos'})
+        self.assertEqual(set(self.client.get(url, {'fields': 'id', 'expand': 'videos'}).data), {'id', 'videos'})
+        # Without either parameter the response is as it always was
+        self.assertEqual(set(self.client.get(url).data), {'id', 'account', 'title', 'videos'})
+
+    def test_unknown_fields(self):
+        for params, message in [
+            ({'fields': 'id,bogus'}, 'bogus'),
+            ({'fields': 'videos.bogus'}, 'videos.bogus'),
+            ({'expand': 'bogus.id'}, 'bogus'),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse('list_memories'), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(message, str(response.data['fields']))
+
+    def test_keyset_pagination_with_fields(self):
+        url = reverse('list_memories')
+        response = self.client.get(url, {'fields': 'title', 'page_size': 2})
+        next_url = response['Link'][1:response['Link'].index('>')]
+
+        # ETag versions and the page: the cursor is read from the loaded rows, not from deferred columns
+        with self.assertNumQueries(2):
+            response = self.client.get(next_url)
+
+        self.assertEqual(response.data, [{'title': 'Memory 0'}])
+
+    def test_permissions_still_apply(self):
+        other = User.objects.create_user(username='fieldset-other')
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(reverse('retrieve_memory', args=[self.memories[0].id]), {'fields': 'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_etag_depends_on_fields(self):
+        url = reverse('retrieve_memory', args=[self.memories[0].id])
+        etag = self.client.get(url).headers['ETag']
+
+        response = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_accounts(self):
+        url = reverse('list_accounts')
+        params = {'fields': 'owned_accounts.id,owned_accounts.name'}
+
+        # ETag versions, owned accounts; no beloved accounts, beloved ones or profiles
+        with self.assertNumQueries(2):
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.data, {'owned_accounts': [{'id': self.account.id, 'name': 'Fieldset Account'}]})
+        # A fresh user, the prefetched accounts are cached on the one the client authenticates with
+        self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+
+        response = self.client.get(url, {'fields': 'owned_accounts', 'expand': 'owned_accounts.beloved_ones_profiles'})
+        account = response.data['owned_accounts'][0]
+        self.assertNotIn('beloved_ones', account)
+        self.assertEqual(len(account['beloved_ones_profiles']), 3)
+
+    def test_beloved_ones(self):
+        response = self.client.get(
+            reverse('list_beloved_ones', args=[self.account.id]),
+            {'fields': 'name,beloved_ones_profiles.name'},
+        )
+
+        self.assertEqual(response.data, {
+            'name': 'Fieldset Account',
+            'beloved_ones_profiles': [{'name': f'Beloved {i}'} for i in range(3)],
+        })
+
+    def test_profile(self):
+        url = reverse('retrieve_profile')
+
+        self.assertEqual(self.client.get(url, {'fields': 'name,last_name'}).data, {'name': 'Fieldset', 'last_name': 'User'})
+        response = self.client.get(url, {'fields': 'name,user.email'})
+        self.assertEqual(response.data, {'name': 'Fieldset', 'user': {'email': 'fieldset@example.com'}})
+
+    def test_search(self):
+        response = self.client.get(reverse('list-profiles'), {'q': 'beloved', 'fields': 'id,name'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+@override_settings(SYNC_CURSOR_OVERLAP_SECONDS=0)
+class SyncTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        acl_cache.clear_local()
+        self.url = reverse('sync')
+        self.user = User.objects.create_user(username='sync-user', email='sync@example.com', password='testpass')
+        self.profile = Profile.objects.create(user=self.user, name='Sync', last_name='User')
+        self.account = Account.objects.create(owner_user=self.user, name='Sync Account')
+        self.beloved_one = User.objects.create_user(username='sync-beloved')
+        self.beloved_profile = Profile.objects.create(user=self.beloved_one, name='Beloved')
+        self.account.beloved_ones.add(self.beloved_one)
+        self.memory = Memory.objects.create(title='Memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/sync.mp4')
+        self.character = Character.objects.create(account=self.account, name='Character')
+        self.character.memories.add(self.memory)
+
+        self.other_user = User.objects.create_user(username='sync-other')
+        Profile.objects.create(user=self.other_user, name='Other')
+        self.other_account = Account.objects.create(owner_user=self.other_user, name='Other Account')
+        self.other_memory = Memory.objects.create(title='Other Memory', account=self.other_account)
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, cursor=None):
+        response = self.client.get(self.url, {'since': cursor} if cursor else None)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response.data
+
+    def ids(self, data, name):
+        return [row['id'] for row in data[name]]
+
+    def test_first_sync_sends_everything_visible(self):
+        Memory.objects.create(title='Deleted', account=self.account, is_active=False)
+
+        data = self.sync()
+
+        self.assertEqual(self.ids(data, 'accounts'), [self.account.id])
+        self.assertEqual(data['accounts'][0]['beloved_ones'], [self.beloved_one.id])
+        self.assertEqual(sorted(self.ids(data, 'profiles')), [self.profile.id, self.beloved_profile.id])
+        self.assertEqual(self.ids(data, 'memories'), [self.memory.id])
+        self.assertEqual(self.ids(data, 'videos'), [self.video.id])
+        self.assertEqual(self.ids(data, 'characters'), [self.character.id])
+        self.assertEqual(data['tags'], {self.memory.id: [self.character.id]})
+        self.assertEqual(data['deleted'], {'accounts': [], 'memories': [], 'videos': [], 'characters': []})
+        self.assertTrue(data['cursor'])
+
+    def test_nothing_changed(self):
+        data = self.sync(self.sync()['cursor'])
+
+        for name in ('accounts', 'profiles', 'memories', 'videos', 'characters'):
+            self.assertEqual(data[name], [], name)
+        self.assertEqual(data['tags'], {})
+        self.assertEqual(data['deleted'], {'accounts': [], 'memories': [], 'videos': [], 'characters': []})
+
+    def test_sends_changes_after_the_cursor(self):
+        cursor = self.sync()['cursor']
+        untouched = Memory.objects.create(title='Untouched', account=self.account)
+        cursor = self.sync(cursor)['cursor']
+
+        self.client.patch(reverse('update_memory', args=[self.memory.id]), {'title': 'Renamed'}, format='json')
+        self.client.patch(reverse('update_profile'), {'name': 'Renamed'}, format='json')
+        data = self.sync(cursor)
+
+        self.assertEqual(self.ids(data, 'memories'), [self.memory.id])
+        self.assertEqual(data['memories'][0]['title'], 'Renamed')
+        self.assertNotIn(untouched.id, self.ids(data, 'memories'))
+        self.assertEqual(self.ids(data, 'profiles'), [self.profile.id])
+        self.assertEqual(data['accounts'], [])
+        self.assertEqual(data['videos'], [])
+
+    def test_deletes_come_back_as_tombstones(self):
+        cursor = self.sync()['cursor']
+        video = Video.objects.create(memory=self.memory, file='videos/sync-deleted.mp4')
+        memory = Memory.objects.create(title='Deleted', account=self.account)
+
+        self.client.delete(reverse('delete_video', args=[video.id]))
+        self.client.delete(reverse('delete_memory', args=[memory.id]))
+        self.client.delete(reverse('delete_character', args=[self.character.id]))
+        data = self.sync(cursor)
+
+        self.assertEqual(data['deleted']['videos'], [video.id])
+        self.assertEqual(data['deleted']['memories'], [memory.id])
+        self.assertEqual(data['deleted']['characters'], [self.character.id])
+        self.assertEqual(data['videos'] + data['memories'] + data['characters'], [])
+
+    def test_deleted_account_comes_back_as_tombstone(self):
+        cursor = self.sync()['cursor']
+
+        self.client.delete(reverse('delete_account', args=[self.account.id]))
+        data = self.sync(cursor)
+
+        self.assertEqual(data['deleted']['accounts'], [self.account.id])
+        self.assertEqual(data['accounts'], [])
+        self.assertEqual(data['memories'], [])
+
+    def test_accounts_shared_and_unshared(self):
+        cursor = self.sync()['cursor']
+
+        self.other_account.beloved_ones.add(self.user)
+        invalidate_acl(self.user.id)
+        data = self.sync(cursor)
+
+        # Everything of an account new to the client, however old
+        self.assertEqual(self.ids(data, 'accounts'), [self.other_account.id])
+        self.assertEqual(self.ids(data, 'memories'), [self.other_memory.id])
+        self.assertIn(self.other_user.profile.id, self.ids(data, 'profiles'))
+
+        self.other_account.beloved_ones.remove(self.user)
+        invalidate_acl(self.user.id)
+        data = self.sync(data['cursor'])
+
+        self.assertEqual(data['deleted']['accounts'], [self.other_account.id])
+        self.assertEqual(data['memories'], [])
+
+    def test_tags_come_with_the_memory(self):
+        cursor = self.sync()['cursor']
+        character = Character.objects.create(account=self.account, name='Tagged')
+        cursor = self.sync(cursor)['cursor']
+
+        self.client.patch(reverse('update_memory_characters', args=[self.memory.id]), {
+            'add': [character.id], 'remove': [self.character.id],
+        }, format='json')
+        data = self.sync(cursor)
+
+        self.assertEqual(self.ids(data, 'memories'), [self.memory.id])
+        self.assertEqual(data['tags'], {self.memory.id: [character.id]})
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00"}').decode()):
+            response = self.client.get(self.url, {'since': cursor})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('since', response.data)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        cursor = self.sync()['cursor']
+        for i in range(5):
+            memory = Memory.objects.create(title=f'More {i}', account=self.account)
+            Video.objects.create(memory=memory, file=f'videos/sync-more-{i}.mp4')
+            Character.objects.create(account=self.account, name=f'More {i}').memories.add(memory)
+        self.account.save()
+
+        # Accounts, their beloved ones, profiles, memories, videos, characters and tags. The ACL is cached.
+        with self.assertNumQueries(7):
+            data = self.sync(cursor)
+        self.assertEqual(len(data['memories']), 5)
+        self.assertEqual(len(data['characters']), 5)
+
+
+class ActiveManagerTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        acl_cache.clear_local()
+        self.user = User.objects.create_user(username='active-user', password='testpass')
+        Profile.objects.create(user=self.user, name='Active')
+        self.account = Account.objects.create(owner_user=self.user, name='Active Account')
+        self.memory = Memory.objects.create(title='Memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/active.mp4')
+        self.client.force_authenticate(user=self.user)
+
+    def test_managers_skip_deleted_rows(self):
+        deleted = Memory.objects.create(title='Deleted', account=self.account, is_active=False)
+
+        self.assertEqual(list(Memory.active.all()), [self.memory])
+        # The default manager still sees every row
+        self.assertEqual(set(Memory.objects.all()), {self.memory, deleted})
+
+    def test_deleted_memory_is_gone(self):
+        self.client.delete(reverse('delete_memory', args=[self.memory.id]))
+
+        self.assertEqual(self.client.get(reverse('retrieve_memory', args=[self.memory.id])).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.patch(reverse('update_memory', args=[self.memory.id]), {'title': 'Back'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(reverse('delete_memory', args=[self.memory.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_video_leaves_its_memory(self):
+        self.client.delete(reverse('delete_video', args=[self.video.id]))
+
+        response = self.client.get(reverse('retrieve_memory', args=[self.memory.id]), {'expand': 'videos'})
+        self.assertEqual(response.data['videos'], [])
+        self.assertEqual(self.client.delete(reverse('delete_video', args=[self.video.id])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_account_is_not_listed(self):
+        self.client.delete(reverse('delete_account', args=[self.account.id]))
+
+        response = self.client.get(reverse('list_accounts'))
+        self.assertEqual(response.data['owned_accounts'], [])
+
+    def test_deleted_account_memories_are_not_listed(self):
+        other_user = User.objects.create_user(username='active-other')
+        shared = Account.objects.create(owner_user=other_user, name='Shared')
+        shared.beloved_ones.add(self.user)
+        Memory.objects.create(title='Shared memory', account=shared)
+        Account.objects.filter(pk__in=[self.account.pk, shared.pk]).update(is_active=False)
+
+        response = self.client.get(reverse('list_memories'))
+
+        self.assertEqual(response.data, [])
+
+    def test_deleted_account_beloved_ones_are_gone(self):
+        beloved_one = User.objects.create_user(username='active-beloved', email='active-beloved@example.com')
+        self.client.delete(reverse('delete_account', args=[self.account.id]))
+
+        for method, url, data in [
+            ('patch', reverse('add_beloved_one', args=[self.account.id, beloved_one.id]), None),
+            ('patch', reverse('remove_beloved_one', args=[self.account.id, beloved_one.id]), None),
+            ('patch', reverse('update_beloved_ones', args=[self.account.id]), {'add': [beloved_one.id]}),
+        ]:
+            with self.subTest(url=url):
+                response = getattr(self.client, method)(url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(self.account.beloved_ones.exists())
+
+    def test_deleted_character_can_be_untagged(self):
+        character = Character.objects.create(name='Deleted', account=self.account)
+        self.memory.characters.add(character)
+        character_id = {'character_id': character.id}
+        Character.objects.filter(id=character.id).update(is_active=False)
+
+        response = self.client.patch(reverse('add_character_to_memory', args=[self.memory.id]), character_id, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(reverse('remove_character_from_memory', args=[self.memory.id]), character_id, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(self.memory.characters.exists())
+
+    def test_hot_indexes_cover_live_rows_only(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexname, indexdef FROM pg_indexes WHERE indexname IN %s',
+                [('memory_account_created_idx', 'memory_created_idx', 'video_memory_active_idx',
+                  'character_account_active_idx', 'account_owner_active_idx')],
+            )
+            definitions = dict(cursor.fetchall())
+
+        self.assertEqual(len(definitions), 5)
+        for name, definition in definitions.items():
+            self.assertIn('WHERE is_active', definition, name)
+
+
+class ResponseEncodingTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='encoding-user', password='encoding-password')
+        self.account = Account.objects.create(owner_user=self.user, name='Encoding Account')
+        for index in range(30):
+            memory = Memory.objects.create(title=f'Memory {index}', account=self.account)
+            Video.objects.create(memory=memory, file=f'videos/encoding-{index}.mp4')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('list_memories')
+
+    def test_json(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(len(response.json()), 30)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_msgpack(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(self.url).json())
+
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({'account': self.account.id, 'title': 'Packed'})
+
+        response = self.client.post(reverse('create_memory'), body, content_type='application/msgpack')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Packed')
+
+    def test_invalid_msgpack_body(self):
+        for body in [
+            b'\xc1',
+            # A map with an array key
+            b'\x81\x91\x01\x01',
+            msgpack.packb({'title': msgpack.ExtType(5, b'x')}),
+            msgpack.packb({'title': [msgpack.Timestamp(1)]}),
+            msgpack.packb(msgpack.Timestamp(1)),
+        ]:
+            with self.subTest(body=body):
+                response = self.client.post(reverse('create_memory'), body, content_type='application/msgpack')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_json_body(self):
+        response = self.client.post(reverse('create_memory'), b'{"title": ', content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip(self):
+        plain = self.client.get(self.url).content
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+    def test_brotli_preferred(self):
+        plain = self.client.get(self.url).content
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain)
+
+    def test_compressed_etag_revalidates(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')['ETag']
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(COMPRESSION_MIN_SIZE=1024)
+    def test_small_responses_not_compressed(self):
+        Memory.objects.exclude(title='Memory 0').delete()
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accept_encoding(self):
+        self.assertEqual(parse_accept_encoding('gzip;q=1.0, br;q=0, identity'), {'gzip', 'identity'})
+        self.assertEqual(parse_accept_encoding(''), set())
+
+
+class RequestTimingTestCase(APITestCase):
+    def setUp(self):
+        url_cache.clear()
+        self.user = User.objects.create_user(username='timing-user', password='timing-password')
+        self.account = Account.objects.create(owner_user=self.user, name='Timing Account')
+        self.memory = Memory.objects.create(title='Timing Memory', account=self.account)
+        self.video = Video.objects.create(memory=self.memory, file='videos/timing.mp4')
+        self.client.force_authenticate(user=self.user)
+
+    def server_timing(self, response):
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('list_memories'))
+
+        metrics = self.server_timing(response)
+        self.assertEqual(metrics['db']['desc'], f'"{len(queries)} queries"')
+        for name in ('permissions', 'serialize', 'render'):
+            self.assertGreaterEqual(float(metrics[name]['dur']), 0)
+        self.assertGreater(float(metrics['app']['dur']), float(metrics['db']['dur']))
+
+    def test_storage_timing(self):
+        response = self.client.get(reverse('retrieve_memory_video', args=[self.video.id]))
+
+        self.assertIn('storage', self.server_timing(response))
+
+    def test_log_line(self):
+        with self.assertLogs('griot_backend.timing', 'INFO') as logs:
+            self.client.get(reverse('list_memories'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'list_memories')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('over_budget', record)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0, REQUEST_TIME_BUDGET_MS=None)
+    def test_over_budget(self):
+        with self.assertLogs('griot_backend.timing', 'WARNING') as logs:
+            self.client.get(reverse('list_memories'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        self.assertEqual(record['over_budget'], ['queries'])
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('list_memories'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_repeated_queries_and_nesting(self):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            execute = lambda sql, params, many, context: None
+            for index in range(3):
+                record_query(execute, 'SELECT %s', [index], False, {})
+            record_query(execute, 'SELECT 1', None, False, {})
+            with timed('storage'):
+                with timed('storage'):
+                    pass
+        finally:
+            _current.reset(token)
+
+        self.assertEqual(timings.query_count, 4)
+        self.assertEqual(timings.most_repeated_query, 3)
+        self.assertEqual(timings.calls['storage'], 1)
+
+
+class SeedBenchmarkTestCase(APITestCase):
+    def test_seed_writes_manifest(self):
+        output = os.path.join(tempfile.mkdtemp(), 'manifest.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output), ignore_errors=True)
+
+        call_command('seed_benchmark', users=6, seed=3, output=output, stdout=io.StringIO())
+
+        with open(output) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(manifest['counts']['users'], User.objects.filter(username__startswith='bench-').count())
+        self.assertEqual(manifest['counts']['memories'], Memory.objects.count())
+        self.assertEqual(manifest['counts']['videos'], Video.objects.count())
+        user = manifest['users'][0]
+        self.assertEqual(Token.objects.get(user_id=user['id']).key, user['token'])
+        self.assertEqual(sorted(user['memories']), sorted(Memory.objects.filter(account__owner_user_id=user['id']).values_list('id', flat=True)))
+        self.assertTrue(self.client.login(username=user['username'], password=manifest['password']))
+        # The search vector is stored, so seeded profiles are searchable
+        self.assertTrue(Profile.objects.filter(search_vector=user['username']).exists())
+
+    def test_clear(self):
+        seeding.seed(3)
+        seeding.seed(2, prefix='other')
+
+        seeding.clear()
+
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+        self.assertEqual(User.objects.filter(username__startswith='other-').count(), 2)
+
+
+# The most queries one request to each route may run, however much data is behind it
+QUERY_BUDGETS = {
+    'create_user': 4,
+    'authenticate_user': 2,
+    'logout_user': 2,
+    'reset_password': 2,
+    'reset_password_confirm': 7,
+    'list_accounts': 5,
+    'retrieve_profile': 2,
+    'update_profile': 3,
+    'list-profiles': 2,
+    'create_account': 3,
+    'update_account': 5,
+    'delete_account': 4,
+    'add_beloved_one': 5,
+    'remove_beloved_one': 5,
+    'update_beloved_ones': 9,
+    'list_beloved_ones': 4,
+    'create_character': 6,
+    'update_character': 4,
+    'delete_character': 3,
+    'create_memory': 3,
+    'retrieve_memory': 4,
+    'update_memory': 4,
+    'list_memories': 3,
+    'delete_memory': 3,
+    'upload_memory_video': 6,
+    'initiate_memory_video_upload': 2,
+    'complete_memory_video_upload': 2,
+    'abort_memory_video_upload': 0,
+    'create_resumable_memory_video_upload': 3,
+    'resumable_memory_video_upload': 5,
+    'finish_resumable_memory_video_upload': 12,
+    'retrieve_memory_video': 2,
+    'hls_playlist': 1,
+    'add_character_to_memory': 7,
+    'remove_character_from_memory': 7,
+    'update_memory_characters': 9,
+    'delete_video': 3,
+    'batch': 13,
+    'sync': 8,
+}
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Every route in api/urls.py, as a user with many accounts, beloved ones,
+    memories, characters and videos. The budgets are fixed, so a query per
+    row anywhere blows one, and the failure lists the SQL that ran.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manifest = seeding.seed(
+            12, seed=8, memories=(20, 40), beloved_ones=(6, 15), characters=(4, 10), videos=(2, 4), tags=(2, 3),
+        )
+        # The most popular seeded user is a beloved one of the most accounts
+        cls.entry = cls.manifest['users'][0]
+        cls.user = User.objects.get(pk=cls.entry['id'])
+        cls.other_users = list(User.objects.filter(username__startswith='bench-').exclude(pk=cls.user.pk))
+        cls.account = Account.objects.filter(owner_user=cls.user).order_by('id').first()
+        cls.account.beloved_ones.add(*cls.other_users[1:])
+        cls.memory = Memory.objects.filter(account__owner_user=cls.user, characters__isnull=False).annotate(
+            video_count=Count('videos', distinct=True),
+        ).order_by('-video_count', 'id').first()
+        cls.video, cls.hls_video = cls.memory.videos.order_by('id')[:2]
+        cls.character = Character.objects.filter(account=cls.memory.account).exclude(memories=cls.memory).first()
+        cls.tagged_character = cls.memory.characters.first()
+        cls.untagged_characters = list(Character.objects.filter(account=cls.memory.account).exclude(memories=cls.memory))
+        cls.other_user = cls.other_users[0]
+
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, staging_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_dir, RESUMABLE_UPLOAD_DIR=staging_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_data_is_at_scale(self):
+        self.assertGreaterEqual(len(self.entry['beloved_accounts']), 10)
+        self.assertGreaterEqual(len(self.entry['memories']), 15)
+        self.assertGreaterEqual(len(self.entry['videos']), 25)
+        self.assertGreaterEqual(self.account.beloved_ones.count(), 10)
+        self.assertGreaterEqual(self.memory.video_count, 3)
+
+    def test_every_route_has_a_budget(self):
+        routes = {pattern.name for pattern in api_urls.urlpatterns}
+
+        self.assertEqual(set(QUERY_BUDGETS), routes)
+        self.assertEqual(set(self.route_requests()), routes)
+
+    def test_routes_stay_within_budget(self):
+        route_requests = self.route_requests()
+        for name, (make_request, expected_status) in route_requests.items():
+            with self.subTest(route=name):
+                # Cold caches, the worst case
+                cache.clear()
+                acl_cache.clear_local()
+                token_cache.clear_local()
+                url_cache.clear()
+                self.client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+                # Every route starts from the seeded data
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        response = make_request()
+                    transaction.set_rollback(True)
+
+                self.assertEqual(response.status_code, expected_status, getattr(response, 'data', None))
+                budget = QUERY_BUDGETS[name]
+                if len(queries) > budget:
+                    statements = '\n'.join(f'{index}. {query["sql"]}' for index, query in enumerate(queries.captured_queries, 1))
+                    self.fail(f'{name} ran {len(queries)} queries, its budget is {budget}:\n{statements}')
+
+    def create_upload(self, content):
+        response = self.client.post(reverse('create_resumable_memory_video_upload'), {
+            'memory': self.memory.id, 'filename': 'clip.mp4', 'size': 5,
+        }, format='json')
+        if content:
+            self.client.generic(
+                'PATCH', response['Location'], content,
+                content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+            )
+        return response.data['id']
+
+    def create_playlist(self):
+        self.hls_video.hls_playlist = default_storage.save(
+            f'hls/{self.hls_video.id}/master.m3u8', ContentFile(b'#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000\n360p/index.m3u8\n'),
+        )
+        self.hls_video.hls_status = Video.HLS_READY
+        self.hls_video.save()
+        return make_playlist_token(self.hls_video)
+
+    def route_requests(self):
+        """{route name: (function sending one request, expected status)}"""
+        client = self.client
+        memory_url = lambda name: reverse(name, args=[self.memory.id])
+        # Set up here, so that none of it counts against the budgets
+        self.client.force_authenticate(user=self.user)
+        direct_upload_token = make_upload_token(self.user, self.memory, 'videos/direct.mp4', 'upload-id')
+        empty_upload = self.create_upload(b'')
+        full_upload = self.create_upload(b'video')
+        playlist_token = self.create_playlist()
+        return {
+            'create_user': (lambda: client.post(reverse('create_user'), {
+                'username': 'budget-user', 'password': 'BudgetPassword123', 'email': 'budget@example.com',
+            }, format='json'), status.HTTP_201_CREATED),
+            'authenticate_user': (lambda: client.post(reverse('authenticate_user'), {
+                'username': self.user.username, 'password': self.manifest['password'],
+            }, format='json'), status.HTTP_200_OK),
+            'logout_user': (lambda: client.post(reverse('logout_user')), status.HTTP_200_OK),
+            'reset_password': (lambda: client.post(reverse('reset_password'), {'email': self.user.email}, format='json'), status.HTTP_200_OK),
+            'reset_password_confirm': (lambda: client.post(reverse('reset_password_confirm', kwargs={
+                'uidb64': urlsafe_base64_encode(force_bytes(self.user.pk)),
+                'token': default_token_generator.make_token(self.user),
+            }), {'new_password': 'BudgetPassword123'}, format='json'), status.HTTP_200_OK),
+            'list_accounts': (lambda: client.get(reverse('list_accounts')), status.HTTP_200_OK),
+            'retrieve_profile': (lambda: client.get(reverse('retrieve_profile')), status.HTTP_200_OK),
+            'update_profile': (lambda: client.patch(reverse('update_profile'), {'middle_name': 'Budget'}, format='json'), status.HTTP_200_OK),
+            'list-profiles': (lambda: client.get(reverse('list-profiles'), {'q': 'Silva'}), status.HTTP_200_OK),
+            'create_account': (lambda: client.post(reverse('create_account'), {'name': 'Budget'}, format='json'), status.HTTP_201_CREATED),
+            'update_account': (lambda: client.patch(reverse('update_account', args=[self.account.id]), {'name': 'Budget'}, format='json'), status.HTTP_200_OK),
+            'delete_account': (lambda: client.delete(reverse('delete_account', args=[self.account.id])), status.HTTP_204_NO_CONTENT),
+            'add_beloved_one': (lambda: client.patch(reverse('add_beloved_one', args=[self.account.id, self.other_user.id])), status.HTTP_200_OK),
+            'remove_beloved_one': (lambda: client.patch(reverse('remove_beloved_one', args=[self.account.id, self.other_users[1].id])), status.HTTP_200_OK),
+            'update_beloved_ones': (lambda: client.patch(reverse('update_beloved_ones', args=[self.account.id]), {
+                'add': [self.other_user.id, self.other_user.email, 'nobody@example.com'],
+                'remove': [user.email for user in self.other_users[1:]],
+            }, format='json'), status.HTTP_200_OK),
+            'list_beloved_ones': (lambda: client.get(reverse('list_beloved_ones', args=[self.account.id])), status.HTTP_200_OK),
+            'create_character': (lambda: client.post(reverse('create_character'), {
+                'account': self.account.id, 'name': 'Budget', 'memories': self.entry['memories'],
+            }, format='json'), status.HTTP_201_CREATED),
+            'update_character': (lambda: client.patch(reverse('update_character', args=[self.character.id]), {'name': 'Budget'}, format='json'), status.HTTP_200_OK),
+            'delete_character': (lambda: client.delete(reverse('delete_character', args=[self.character.id])), status.HTTP_204_NO_CONTENT),
+            'create_memory': (lambda: client.post(reverse('create_memory'), {'account': self.account.id, 'title': 'Budget'}, format='json'), status.HTTP_201_CREATED),
+            'retrieve_memory': (lambda: client.get(memory_url('retrieve_memory')), status.HTTP_200_OK),
+            'update_memory': (lambda: client.patch(memory_url('update_memory'), {'title': 'Budget'}, format='json'), status.HTTP_200_OK),
+            'list_memories': (lambda: client.get(reverse('list_memories')), status.HTTP_200_OK),
+            'delete_memory': (lambda: client.delete(memory_url('delete_memory')), status.HTTP_204_NO_CONTENT),
+            'upload_memory_video': (lambda: client.post(reverse('upload_memory_video'), {
+                'memory': self.memory.id, 'file': SimpleUploadedFile('clip.mp4', b'video', content_type='video/mp4'),
+            }, format='multipart'), status.HTTP_201_CREATED),
+            # File system storage: the direct upload routes stop short of S3, after their queries
+            'initiate_memory_video_upload': (lambda: client.post(reverse('initiate_memory_video_upload'), {
+                'memory': self.memory.id, 'filename': 'clip.mp4', 'size': 1024,
+            }, format='json'), status.HTTP_400_BAD_REQUEST),
+            'complete_memory_video_upload': (lambda: client.post(reverse('complete_memory_video_upload'), {
+                'upload_token': direct_upload_token, 'parts': [{'part_number': 1, 'etag': 'etag'}],
+            }, format='json'), status.HTTP_400_BAD_REQUEST),
+            'abort_memory_video_upload': (lambda: client.post(reverse('abort_memory_video_upload'), {'upload_token': direct_upload_token}, format='json'), status.HTTP_400_BAD_REQUEST),
+            'create_resumable_memory_video_upload': (lambda: client.post(reverse('create_resumable_memory_video_upload'), {
+                'memory': self.memory.id, 'filename': 'clip.mp4', 'size': 5,
+            }, format='json'), status.HTTP_201_CREATED),
+            'resumable_memory_video_upload': (lambda: client.generic(
+                'PATCH', reverse('resumable_memory_video_upload', args=[empty_upload]), b'video',
+                content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+            ), status.HTTP_204_NO_CONTENT),
+            'finish_resumable_memory_video_upload': (lambda: client.post(
+                reverse('finish_resumable_memory_video_upload', args=[full_upload]),
+            ), status.HTTP_201_CREATED),
+            'retrieve_memory_video': (lambda: client.get(reverse('retrieve_memory_video', args=[self.video.id])), status.HTTP_200_OK),
+            'hls_playlist': (lambda: client.get(reverse('hls_playlist', kwargs={
+                'token': playlist_token, 'name': 'master.m3u8',
+            })), status.HTTP_200_OK),
+            'add_character_to_memory': (lambda: client.patch(memory_url('add_character_to_memory'), {'character_id': self.character.id}, format='json'), status.HTTP_200_OK),
+            'remove_character_from_memory': (lambda: client.patch(memory_url('remove_character_from_memory'), {
+                'character_id': self.tagged_character.id,
+            }, format='json'), status.HTTP_200_OK),
+            'update_memory_characters': (lambda: client.patch(memory_url('update_memory_characters'), {
+                'add': [character.id for character in self.untagged_characters],
+                'remove': [self.tagged_character.id],
+            }, format='json'), status.HTTP_200_OK),
+            'delete_video': (lambda: client.delete(reverse('delete_video', args=[self.video.id])), status.HTTP_204_NO_CONTENT),
+            'batch': (lambda: client.post(reverse('batch'), {'requests': [
+                {'path': reverse('retrieve_profile')},
+                {'path': reverse('list_accounts')},
+                {'path': reverse('list_memories')},
+                {'path': reverse('retrieve_memory_video', args=[self.video.id])},
+            ]}, format='json'), status.HTTP_200_OK),
+            'sync': (lambda: client.get(reverse('sync')), status.HTTP_200_OK),
+        }
@@ -0,0 +1,161 @@
+import io
+import subprocess
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image
+
+from griot_backend.media_urls import invalidate_urls
+from memories.models import Video
+
+DEFAULT_SIZES = {'small': 160, 'medium': 320, 'large': 640}
+
+
+class FrameExtractionError(Exception):
+    pass
+
+
+class TransientFrameExtractionError(FrameExtractionError):
+    """ffmpeg failed to run or exited non-zero, which a later attempt may not."""
+
+
+def get_sizes():
+    return getattr(settings, 'VIDEO_THUMBNAIL_SIZES', DEFAULT_SIZES)
+
+
+def get_video_source(file):
+    # ffmpeg seeks over HTTP range requests, so remote videos are never downloaded in full
+    try:
+        return file.storage.path(file.name)
+    except NotImplementedError:
+        return file.storage.url(file.name)
+
+
+def extract_frame(source, offset):
+    command = [
+        getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'),
+        '-v', 'error',
+        '-ss', str(offset),
+        '-i', source,
+        '-frames:v', '1',
+        '-f', 'image2pipe',
+        '-vcodec', 'png',
+        '-',
+    ]
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=getattr(settings, 'VIDEO_THUMBNAIL_TIMEOUT', 60),
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        raise TransientFrameExtractionError(str(e))
+    return result.stdout
+
+
+def extract_poster_frame(file):
+    """Returns the poster frame of a video as a Pillow image."""
+    source = get_video_source(file)
+    offset = getattr(settings, 'VIDEO_POSTER_OFFSET', 1)
+    data = extract_frame(source, offset)
+    if not data and offset:
+        # Clips shorter than the offset yield no frame, so fall back to the first one
+        data = extract_frame(source, 0)
+    if not data:
+        raise FrameExtractionError('The video has no frames.')
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image.convert('RGB')
+
+
+def encode_jpeg(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=getattr(settings, 'VIDEO_THUMBNAIL_QUALITY', 80), optimize=True)
+    return buffer.getvalue()
+
+
+def resize_to_width(image, width):
+    if image.width <= width:
+        return image
+    height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def get_image_stem(video):
+    # A fresh name per run: storages that overwrite would otherwise have a
+    # regeneration delete the images it just wrote, and the id keeps apart
+    # videos whose files have the same name.
+    return f'{video.id}-{uuid.uuid4().hex[:8]}'
+
+
+def store_images(video, image):
+    """Stores the poster and every size of ``image``. Returns their names, as (poster, {size: name})."""
+    storage = video.file.storage
+    stem = get_image_stem(video)
+    saved = []
+    try:
+        poster = storage.save(video.poster.field.generate_filename(video, f'{stem}.jpg'), ContentFile(encode_jpeg(image)))
+        saved.append(poster)
+        thumbnails = {}
+        for size, width in sorted(get_sizes().items(), key=lambda item: item[1]):
+            name = video.thumbnail.field.generate_filename(video, f'{stem}_{size}.jpg')
+            thumbnails[size] = storage.save(name, ContentFile(encode_jpeg(resize_to_width(image, width))))
+            saved.append(thumbnails[size])
+    except Exception:
+        for name in saved:
+            storage.delete(name)
+        raise
+    return poster, thumbnails
+
+
+def generate_thumbnails(video_id, retry=False):
+    """
+    Extracts the poster frame of a video and stores it along with every size
+    in VIDEO_THUMBNAIL_SIZES. Returns the new thumbnail status, or None when
+    the video no longer exists.
+
+    With ``retry``, a transient failure (ffmpeg or storage) is raised for the
+    job queue to retry, instead of being recorded as failed.
+    """
+    video = Video.objects.filter(id=video_id).first()
+    if video is None:
+        return None
+
+    try:
+        poster, thumbnails = store_images(video, extract_poster_frame(video.file))
+    except (TransientFrameExtractionError, OSError):
+        if retry:
+            raise
+        Video.objects.filter(id=video.id).update(thumbnail_status=Video.THUMBNAILS_FAILED, updated_at=timezone.now())
+        return Video.THUMBNAILS_FAILED
+    except FrameExtractionError:
+        Video.objects.filter(id=video.id).update(thumbnail_status=Video.THUMBNAILS_FAILED, updated_at=timezone.now())
+        return Video.THUMBNAILS_FAILED
+
+    fields = {
+        'poster': poster,
+        'thumbnails': thumbnails,
+        'thumbnail_status': Video.THUMBNAILS_READY,
+        # update() skips auto_now, and ETags are computed from updated_at
+        'updated_at': timezone.now(),
+    }
+    default_size = getattr(settings, 'VIDEO_THUMBNAIL_DEFAULT_SIZE', 'medium')
+    uploaded_thumbnail = video.thumbnail and video.thumbnail.name not in video.thumbnails.values()
+    if not uploaded_thumbnail and default_size in thumbnails:
+        # Uploaded thumbnails win over generated ones
+        fields['thumbnail'] = thumbnails[default_size]
+    # update() so that changes made to the video meanwhile are not overwritten
+    Video.objects.filter(id=video.id).update(**fields)
+
+    # Regenerating replaces the previous images, never the ones just stored
+    stored = {poster, *thumbnails.values()}
+    storage = video.file.storage
+    stale = [name for name in [video.poster.name, *video.thumbnails.values()] if name and name not in stored]
+    for name in stale:
+        storage.delete(name)
+    invalidate_urls(storage, *stale)
+    return Video.THUMBNAILS_READY
@@ -0,0 +1,267 @@
+import json
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.utils import timezone
+
+from griot_backend.media_urls import get_storage_url
+from memories.models import Video
+
+from .thumbnails import get_video_source
+
+PLAYLIST_TOKEN_SALT = 'api.transcoding.playlist'
+MASTER_PLAYLIST = 'master.m3u8'
+
+DEFAULT_RENDITIONS = [
+    {'name': '360p', 'height': 360, 'video_bitrate': 800000, 'audio_bitrate': 96000},
+    {'name': '480p', 'height': 480, 'video_bitrate': 1400000, 'audio_bitrate': 128000},
+    {'name': '720p', 'height': 720, 'video_bitrate': 2800000, 'audio_bitrate': 128000},
+    {'name': '1080p', 'height': 1080, 'video_bitrate': 5000000, 'audio_bitrate': 192000},
+]
+
+
+class TranscodingError(Exception):
+    pass
+
+
+class TransientTranscodingError(TranscodingError):
+    """ffmpeg or ffprobe failed to run or exited non-zero, which a later attempt may not."""
+
+
+def run(command):
+    try:
+        return subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=getattr(settings, 'VIDEO_HLS_TIMEOUT', 60 * 60),
+            check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        raise TransientTranscodingError(str(e))
+
+
+def probe(source):
+    """Returns the display width, height and whether the video has an audio track."""
+    output = run([
+        getattr(settings, 'FFPROBE_BINARY', 'ffprobe'),
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,width,height:stream_tags=rotate:stream_side_data=rotation',
+        '-of', 'json',
+        source,
+    ])
+    try:
+        streams = json.loads(output)['streams']
+        video = next(stream for stream in streams if stream['codec_type'] == 'video')
+        width, height = int(video['width']), int(video['height'])
+    except (ValueError, KeyError, StopIteration):
+        raise TranscodingError('The file has no video stream.')
+
+    rotation = video.get('tags', {}).get('rotate')
+    for side_data in video.get('side_data_list', []):
+        rotation = side_data.get('rotation', rotation)
+    # Phones record portrait videos as rotated landscape frames
+    if rotation is not None and abs(int(rotation)) % 180 == 90:
+        width, height = height, width
+    has_audio = any(stream['codec_type'] == 'audio' for stream in streams)
+    return width, height, has_audio
+
+
+def even(value):
+    return max(int(round(value / 2)) * 2, 2)
+
+
+def plan_renditions(width, height):
+    """
+    Picks the configured renditions that do not upscale the source. A rendition's
+    height applies to the shorter side, so portrait videos get the same quality.
+    """
+    renditions = getattr(settings, 'VIDEO_HLS_RENDITIONS', DEFAULT_RENDITIONS)
+    short_side = min(width, height)
+    fitting = [rendition for rendition in renditions if rendition['height'] <= short_side]
+    if not fitting:
+        fitting = [dict(renditions[0], height=short_side)]
+
+    planned = []
+    for rendition in sorted(fitting, key=lambda rendition: rendition['height']):
+        scale = rendition['height'] / short_side
+        planned.append(dict(rendition, width=even(width * scale), height=even(height * scale)))
+    return planned
+
+
+def transcode_rendition(source, output_dir, rendition, has_audio):
+    os.makedirs(os.path.join(output_dir, rendition['name']))
+    video_bitrate = rendition['video_bitrate'] // 1000
+    command = [
+        getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'),
+        '-v', 'error',
+        '-i', source,
+        '-map', '0:v:0',
+        '-vf', f"scale={rendition['width']}:{rendition['height']}",
+        '-c:v', 'libx264',
+        '-preset', getattr(settings, 'VIDEO_HLS_PRESET', 'veryfast'),
+        '-profile:v', 'main',
+        '-b:v', f'{video_bitrate}k',
+        '-maxrate', f'{video_bitrate * 107 // 100}k',
+        '-bufsize', f'{video_bitrate * 3 // 2}k',
+        # Keyframes on segment boundaries so every segment starts cleanly
+        '-force_key_frames', f"expr:gte(t,n_forced*{getattr(settings, 'VIDEO_HLS_SEGMENT_SECONDS', 6)})",
+    ]
+    if has_audio:
+        command += ['-map', '0:a:0', '-c:a', 'aac', '-ac', '2', '-b:a', f"{rendition['audio_bitrate'] // 1000}k"]
+    command += [
+        '-f', 'hls',
+        '-hls_time', str(getattr(settings, 'VIDEO_HLS_SEGMENT_SECONDS', 6)),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, rendition['name'], 'segment_%05d.ts'),
+        os.path.join(output_dir, rendition['name'], 'index.m3u8'),
+    ]
+    run(command)
+
+
+def render_master_playlist(renditions, has_audio):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for rendition in renditions:
+        bandwidth = rendition['video_bitrate'] + (rendition['audio_bitrate'] if has_audio else 0)
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={rendition['width']}x{rendition['height']}"
+        )
+        lines.append(f"{rendition['name']}/index.m3u8")
+    return '\n'.join(lines) + '\n'
+
+
+def get_hls_prefix(video):
+    # A fresh directory per run, so a new transcode never overwrites files being streamed
+    directory = posixpath.dirname(video.file.name)
+    return posixpath.join(directory, 'hls', f'{video.id}-{uuid.uuid4().hex[:8]}')
+
+
+def store_directory(storage, local_dir, prefix):
+    stored = []
+    try:
+        for root, _, filenames in os.walk(local_dir):
+            for filename in sorted(filenames):
+                path = os.path.join(root, filename)
+                name = posixpath.join(prefix, os.path.relpath(path, local_dir).replace(os.sep, '/'))
+                with open(path, 'rb') as content:
+                    saved = storage.save(name, File(content))
+                stored.append(saved)
+                if saved != name:
+                    # Playlists reference segments by name, a renamed file breaks them
+                    raise TranscodingError(f'{name} already exists in storage.')
+    except BaseException:
+        delete_files(storage, stored)
+        raise
+    return stored
+
+
+def list_files(storage, prefix):
+    directories, files = storage.listdir(prefix)
+    names = [posixpath.join(prefix, name) for name in files]
+    for directory in directories:
+        names += list_files(storage, posixpath.join(prefix, directory))
+    return names
+
+
+def delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def delete_renditions(storage, playlist):
+    if playlist:
+        delete_files(storage, list_files(storage, posixpath.dirname(playlist)))
+
+
+def transcode(video_id, retry=False):
+    """
+    Transcodes a video into the HLS renditions in VIDEO_HLS_RENDITIONS and stores
+    them with a master playlist next to the original. Returns the new HLS
+    status, or None when the video no longer exists.
+
+    With ``retry``, a transient failure (ffmpeg or storage) puts the video back
+    to pending and is raised for the job queue to retry, instead of being
+    recorded as failed.
+    """
+    video = Video.objects.filter(id=video_id).first()
+    if video is None:
+        return None
+    Video.objects.filter(id=video.id).update(hls_status=Video.HLS_PROCESSING, updated_at=timezone.now())
+
+    storage = video.file.storage
+    prefix = get_hls_prefix(video)
+    output_dir = tempfile.mkdtemp(prefix='griot-hls-')
+    try:
+        source = get_video_source(video.file)
+        width, height, has_audio = probe(source)
+        renditions = plan_renditions(width, height)
+        for rendition in renditions:
+            transcode_rendition(source, output_dir, rendition, has_audio)
+        with open(os.path.join(output_dir, MASTER_PLAYLIST), 'w') as master:
+            master.write(render_master_playlist(renditions, has_audio))
+        store_directory(storage, output_dir, prefix)
+    except (TransientTranscodingError, OSError):
+        if retry:
+            Video.objects.filter(id=video.id).update(hls_status=Video.HLS_PENDING, updated_at=timezone.now())
+            raise
+        Video.objects.filter(id=video.id).update(hls_status=Video.HLS_FAILED, updated_at=timezone.now())
+        return Video.HLS_FAILED
+    except TranscodingError:
+        Video.objects.filter(id=video.id).update(hls_status=Video.HLS_FAILED, updated_at=timezone.now())
+        return Video.HLS_FAILED
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    Video.objects.filter(id=video.id).update(
+        hls_playlist=posixpath.join(prefix, MASTER_PLAYLIST),
+        hls_renditions=[
+            {
+                'name': rendition['name'],
+                'width': rendition['width'],
+                'height': rendition['height'],
+                'bandwidth': rendition['video_bitrate'] + (rendition['audio_bitrate'] if has_audio else 0),
+                'playlist': posixpath.join(prefix, rendition['name'], 'index.m3u8'),
+            }
+            for rendition in renditions
+        ],
+        hls_status=Video.HLS_READY,
+        # update() skips auto_now, and ETags are computed from updated_at
+        updated_at=timezone.now(),
+    )
+    delete_renditions(storage, video.hls_playlist)
+    return Video.HLS_READY
+
+
+def make_playlist_token(video):
+    return signing.dumps({'video': video.id, 'playlist': video.hls_playlist}, salt=PLAYLIST_TOKEN_SALT)
+
+
+def read_playlist_token(token):
+    max_age = getattr(settings, 'VIDEO_HLS_TOKEN_MAX_AGE', 6 * 60 * 60)
+    return signing.loads(token, salt=PLAYLIST_TOKEN_SALT, max_age=max_age)
+
+
+def rewrite_playlist(storage, playlist, content, make_playlist_url):
+    """
+    Rewrites the relative URIs of a stored playlist: nested playlists go through
+    ``make_playlist_url(name)`` and segments become (signed) storage URLs, so
+    clients can play videos from a private bucket.
+    """
+    directory = posixpath.dirname(playlist)
+    lines = []
+    for line in content.splitlines():
+        if line and not line.startswith('#'):
+            name = posixpath.normpath(posixpath.join(directory, line))
+            if name.endswith('.m3u8'):
+                line = make_playlist_url(name)
+            else:
+                line = get_storage_url(storage, name)
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,102 @@
+import math
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+from memories.models import Video
+
+UPLOAD_TOKEN_SALT = 'api.uploads.multipart'
+MAX_PARTS = 10000
+
+
+class DirectUploadNotSupported(Exception):
+    pass
+
+
+def get_video_storage():
+    return Video._meta.get_field('file').storage
+
+
+def get_s3_target(storage):
+    # Only S3-compatible storages can hand out presigned part URLs
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is None or not hasattr(storage, '_normalize_name'):
+        raise DirectUploadNotSupported('The configured storage does not support direct uploads.')
+    return bucket.meta.client, storage.bucket_name
+
+
+def generate_video_name(filename):
+    field = Video._meta.get_field('file')
+    return field.generate_filename(None, f'{uuid.uuid4().hex}_{filename}')
+
+
+def get_part_size(size):
+    part_size = getattr(settings, 'VIDEO_UPLOAD_PART_SIZE', 16 * 1024 * 1024)
+    # S3 caps a multipart upload at 10,000 parts
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def create_multipart_upload(filename, size, content_type):
+    storage = get_video_storage()
+    client, bucket_name = get_s3_target(storage)
+    name = generate_video_name(filename)
+    key = storage._normalize_name(name)
+    expires_in = getattr(settings, 'VIDEO_UPLOAD_URL_EXPIRY', 3600)
+
+    upload_id = client.create_multipart_upload(
+        Bucket=bucket_name, Key=key, ContentType=content_type
+    )['UploadId']
+
+    part_size = get_part_size(size)
+    parts = []
+    for part_number in range(1, math.ceil(size / part_size) + 1):
+        url = client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': bucket_name, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expires_in,
+        )
+        parts.append({'part_number': part_number, 'url': url})
+
+    return {
+        'name': name,
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'parts': parts,
+    }
+
+
+def complete_multipart_upload(name, upload_id, parts):
+    storage = get_video_storage()
+    client, bucket_name = get_s3_target(storage)
+    key = storage._normalize_name(name)
+    client.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            'Parts': [
+                {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                for part in sorted(parts, key=lambda part: part['part_number'])
+            ]
+        },
+    )
+    return client.head_object(Bucket=bucket_name, Key=key)['ContentLength']
+
+
+def abort_multipart_upload(name, upload_id):
+    storage = get_video_storage()
+    client, bucket_name = get_s3_target(storage)
+    client.abort_multipart_upload(Bucket=bucket_name, Key=storage._normalize_name(name), UploadId=upload_id)
+
+
+def make_upload_token(user, memory, name, upload_id):
+    return signing.dumps(
+        {'user': user.id, 'memory': memory.id, 'name': name, 'upload_id': upload_id},
+        salt=UPLOAD_TOKEN_SALT,
+    )
+
+
+def read_upload_token(token):
+    max_age = getattr(settings, 'VIDEO_UPLOAD_TOKEN_MAX_AGE', 24 * 60 * 60)
+    return signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=max_age)
@@ -1,11 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI the I/O-bound endpoints are served by their async variants
+if getattr(settings, 'ASYNC_VIEWS', False):
+    PasswordResetView = views.AsyncPasswordResetView
+    CreateVideoMemoryView = views.AsyncCreateVideoMemoryView
+    RetrieveVideoMemoryView = views.AsyncRetrieveVideoMemoryView
+else:
+    PasswordResetView = views.PasswordResetView
+    CreateVideoMemoryView = views.CreateVideoMemoryView
+    RetrieveVideoMemoryView = views.RetrieveVideoMemoryView
+
 urlpatterns = [
     path('user/create/', views.CreateUserView.as_view(), name='create_user'),
     path('user/auth/', views.AuthenticateUserView.as_view(), name='authenticate_user'),
     path('user/logout/', views.LogoutView.as_view(), name='logout_user'),
-    path('user/password-reset/', views.PasswordResetView.as_view(), name='reset_password'),
+    path('user/password-reset/', PasswordResetView.as_view(), name='reset_password'),
     path('user/password-reset-confirm/<uidb64>/<token>/', views.PasswordResetConfirmView.as_view(), name='reset_password_confirm'),
     path('user/list-accounts/', views.ListUserAccountsViews.as_view(), name='list_accounts'),
     path('profile/retrieve/', views.RetrieveProfileView.as_view(), name='retrieve_profile'),
@@ -16,6 +27,7 @@ urlpatterns = [
     path('account/delete/<int:pk>/', views.DeleteAccountView.as_view(), name='delete_account'),
     path('account/add-beloved-one/<int:pk>/<int:beloved_one_id>/', views.AddBelovedOneToAccountView.as_view(), name='add_beloved_one'),
     path('account/remove-beloved-one/<int:pk>/<int:beloved_one_id>/', views.RemoveBelovedOneFromAccountView.as_view(), name='remove_beloved_one'),
+    path('account/update-beloved-ones/<int:pk>/', views.UpdateBelovedOnesView.as_view(), name='update_beloved_ones'),
     path('account/list-beloved-ones/<int:pk>/', views.ListBelovedOneFromAccountView.as_view(), name='list_beloved_ones'),
     path('character/create/', views.CreateCharacterView.as_view(), name='create_character'),
     path('character/update/<int:pk>/', views.UpdateCharacterView.as_view(), name='update_character'),
@@ -25,11 +37,21 @@ urlpatterns = [
     path('memory/update/<int:pk>/', views.UpdateMemoryView.as_view(), name='update_memory'),
     path('memory/list/', views.ListMemoriesView.as_view(), name='list_memories'),
     path('memory/delete/<int:pk>/', views.DeleteMemoryView.as_view(), name='delete_memory'),
-    path('memory/video/upload/', views.CreateVideoMemoryView.as_view(), name='upload_memory_video'),
-    path('memory/video/retrieve/<int:pk>/', views.RetrieveVideoMemoryView.as_view(), name='retrieve_memory_video'),
+    path('memory/video/upload/', CreateVideoMemoryView.as_view(), name='upload_memory_video'),
+    path('memory/video/upload/initiate/', views.InitiateVideoUploadView.as_view(), name='initiate_memory_video_upload'),
+    path('memory/video/upload/complete/', views.CompleteVideoUploadView.as_view(), name='complete_memory_video_upload'),
+    path('memory/video/upload/abort/', views.AbortVideoUploadView.as_view(), name='abort_memory_video_upload'),
+    path('memory/video/resumable/', views.CreateResumableVideoUploadView.as_view(), name='create_resumable_memory_video_upload'),
+    path('memory/video/resumable/<uuid:pk>/', views.ResumableVideoUploadView.as_view(), name='resumable_memory_video_upload'),
+    path('memory/video/resumable/<uuid:pk>/finish/', views.FinishResumableVideoUploadView.as_view(), name='finish_resumable_memory_video_upload'),
+    path('memory/video/retrieve/<int:pk>/', RetrieveVideoMemoryView.as_view(), name='retrieve_memory_video'),
+    path('memory/video/hls/<str:token>/<path:name>', views.HLSPlaylistView.as_view(), name='hls_playlist'),
     path('memory/add_character/<int:pk>/', views.AddCharacterToMemoryView.as_view(), name='add_character_to_memory'),
     path('memory/remove_character/<int:pk>/', views.RemoveCharacterToMemoryView.as_view(), name='remove_character_from_memory'),
+    path('memory/update_characters/<int:pk>/', views.UpdateMemoryCharactersView.as_view(), name='update_memory_characters'),
     path('video/delete/<int:pk>/', views.DeleteVideoMemoryView.as_view(), name='delete_video'),
+    path('batch/', views.BatchView.as_view(), name='batch'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
 
 ]
 
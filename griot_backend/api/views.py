@@ -1,10 +1,26 @@
+import posixpath
 
 from rest_framework.response import Response
 from rest_framework import generics, status
 from rest_framework.authtoken.models import Token
+from rest_framework.reverse import reverse
 from django.shortcuts import get_object_or_404
-from django.contrib.postgres.search import SearchQuery, SearchVector
-
+from django.http import HttpResponse
+from django.core import signing
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, TextField, Value
+from django.db.models.functions import MD5, Cast, Concat
+from django.utils import timezone
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from asgiref.sync import sync_to_async
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .async_views import AsyncAPIViewMixin, save_file
+from .conditional import ConditionalGetMixin, get_versions
+from .fieldsets import SparseFieldsetMixin
+from .pagination import KeysetPagination, SearchPagination
 from .serializers import (
     UserSerializer, 
     AuthenticationSerializer, 
@@ -12,18 +28,30 @@ from .serializers import (
     PasswordResetConfirmSerializer,
     ProfileSerializer, 
     AccountSerializer, 
+    AccountBelovedOnesSerializer,
     CharacterSerializer, 
     UserAccountSerializer, 
     MemorySerializer, 
-    VideoSerializer
+    MemoryCharactersSerializer,
+    VideoSerializer,
+    VideoUploadInitiateSerializer,
+    VideoUploadCompleteSerializer,
+    VideoUploadTokenSerializer,
+    VideoUploadSerializer,
+    BatchSerializer,
+    SyncSerializer,
 )
+from . import batch, resumable, sync, transcoding, uploads
+from .tasks import schedule_video_processing
 from django.contrib.auth.models import User
 from profiles.models import Profile
 from accounts.models import Account
 from characters.models import Character
-from memories.models import Memory, Video
+from memories.models import Memory, Video, VideoUpload
 
-from griot_backend.authentication import CustomTokenAuthentication
+from griot_backend.authentication import CustomTokenAuthentication, invalidate_token, invalidate_user_tokens
+from griot_backend.acl import invalidate_acl, invalidate_account_acl
+from griot_backend.media_urls import get_file_url, get_storage_url, get_url_ttl, invalidate_file_urls, invalidate_urls, is_signed
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from griot_backend.permissions import (
     ProfilePermissions, 
@@ -59,6 +87,14 @@ class PasswordResetView(generics.GenericAPIView):
         serializer.save()
         return Response({"detail": "Password reset e-mail has been sent."}, status=status.HTTP_200_OK)
 
+class AsyncPasswordResetView(AsyncAPIViewMixin, PasswordResetView):
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=await self.get_request_data())
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        # Only queues the e-mail, SMTP is never on the request path
+        await sync_to_async(serializer.save)()
+        return Response({"detail": "Password reset e-mail has been sent."}, status=status.HTTP_200_OK)
+
 class PasswordResetConfirmView(generics.GenericAPIView):
     http_method_names = ['post']
     serializer_class = PasswordResetConfirmSerializer
@@ -80,6 +116,7 @@ class LogoutView(generics.GenericAPIView):
 
     def post(self, request):
         token = Token.objects.get(user=request.user)
+        invalidate_token(token.key)
         token.delete()
         return Response({"detail": "User logged out successfully."})
 
@@ -89,27 +126,46 @@ class UpdateProfileView(generics.UpdateAPIView):
     serializer_class = ProfileSerializer
         
     def get_object(self):
-        profile = Profile.objects.get(user__id=self.request.user.id)
+        profile = Profile.objects.select_related('user').get(user__id=self.request.user.id)
         return profile
+
+    def perform_update(self, serializer):
+        serializer.save()
+        # The cached token carries the profile, so drop the stale copy
+        invalidate_user_tokens(self.request.user)
     
-class RetrieveProfileView(generics.RetrieveAPIView):
+class RetrieveProfileView(SparseFieldsetMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     http_method_names = ['get']
     permission_classes = [IsAuthenticated, ProfilePermissions]
     serializer_class = ProfileSerializer
 
     def get_object(self):
-        profile = Profile.objects.get(user__id=self.request.user.id)
+        queryset = self.only_requested(Profile.objects.defer('search_vector'), 'user')
+        if self.is_requested('user'):
+            queryset = queryset.select_related('user')
+        profile = queryset.get(user__id=self.request.user.id)
         return profile
 
+    def get_etag_parts(self):
+        user = self.request.user
+        return [user.id, user.username, user.email, *get_versions(Profile.objects.filter(user_id=user.id))]
+
 
-class SearchProfileView(generics.ListAPIView):
+class SearchProfileView(SparseFieldsetMixin, generics.ListAPIView):
     serializer_class = ProfileSerializer
+    pagination_class = SearchPagination
 
     def get_queryset(self):
         query = self.request.query_params.get('q', '')
-        search_vector = SearchVector('user__email', 'first_name', 'last_name')
-        search_query = SearchQuery(query)
-        return Profile.objects.annotate(search=search_vector).filter(search=search_query)
+        search_query = SearchQuery(query, config='simple')
+        queryset = Profile.objects.filter(
+            search_vector=search_query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).defer('search_vector').order_by('-rank', 'id')
+        if self.is_requested('user'):
+            queryset = queryset.select_related('user')
+        return self.only_requested(queryset)
 
 class CreateAccountView(generics.CreateAPIView):
     http_method_names = ['post']
@@ -119,8 +175,9 @@ class CreateAccountView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(owner_user=self.request.user)
+        invalidate_acl(self.request.user.id)
     
-class ListUserAccountsViews(generics.RetrieveAPIView):
+class ListUserAccountsViews(SparseFieldsetMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     http_method_names = ['get']
     permission_classes = [IsAuthenticated]
     serializer_class = UserAccountSerializer
@@ -128,55 +185,126 @@ class ListUserAccountsViews(generics.RetrieveAPIView):
     def get_object(self):
         return self.request.user
 
+    def get_etag_parts(self):
+        user = self.request.user
+        accounts = Account.active.filter(Q(owner_user=user) | Q(pk__in=user.beloved_accounts.values('pk')))
+        # Users have no updated_at, so the fields the profiles expand to are hashed instead
+        beloved_ones = StringAgg(
+            Concat('beloved_ones__id', Value(':'), 'beloved_ones__username', Value(':'), 'beloved_ones__email'),
+            delimiter=',',
+            ordering='beloved_ones__id',
+        )
+        return [user.id, *get_versions(accounts, 'beloved_ones__profile', beloved_ones=MD5(beloved_ones))]
+
 class UpdateAccountView(generics.UpdateAPIView):
     http_method_names = ['patch']
     permission_classes = [IsAuthenticated, AccountPermissions]
     serializer_class = AccountSerializer
-    queryset = Account.objects.all().filter(is_active=True)
+    queryset = Account.active.all()
 
 class DeleteAccountView(generics.UpdateAPIView):
     http_method_names = ['delete']
     permission_classes = [IsAuthenticated, AccountPermissions]
     serializer_class = AccountSerializer
-    queryset = Account.objects.all().filter(is_active=True)
+    queryset = Account.active.all()
 
     def delete(self, request, pk):
         account = self.get_object()
         account.is_active = False
         account.save()
+        invalidate_account_acl(account)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
 class AddBelovedOneToAccountView(generics.UpdateAPIView):
     http_method_names = ['patch']
     permission_classes = [AccountPermissions]
-    queryset = Account.objects.all()
+    queryset = Account.active.all()
 
     def update(self, request, *args, **kwargs):
         account = self.get_object()
         beloved_one_id = kwargs.get('beloved_one_id')
         beloved_one = get_object_or_404(User, pk=beloved_one_id)
         account.beloved_ones.add(beloved_one)
+        # Bumps updated_at, which the account ETags are computed from
+        account.save(update_fields=['updated_at'])
+        invalidate_acl(beloved_one.id)
         return Response({'message': 'Beloved one added successfully.'})
     
 class RemoveBelovedOneFromAccountView(generics.UpdateAPIView):
     http_method_names = ['patch']
     permission_classes = [AccountPermissions]
-    queryset = Account.objects.all()
+    queryset = Account.active.all()
 
     def update(self, request, *args, **kwargs):
         account = self.get_object()
         beloved_one_id = kwargs.get('beloved_one_id')
         beloved_one = get_object_or_404(User, pk=beloved_one_id)
         account.beloved_ones.remove(beloved_one)
+        account.save(update_fields=['updated_at'])
+        invalidate_acl(beloved_one.id)
         return Response({'message': 'Beloved one removed successfully.'})
 
-class ListBelovedOneFromAccountView(generics.RetrieveAPIView):
+class UpdateBelovedOnesView(generics.GenericAPIView):
+    """
+    Adds and removes any number of beloved ones, by user id or e-mail, in one
+    transaction. Answers with the outcome of each item, in request order.
+    """
+    http_method_names = ['patch']
+    queryset = Account.active.all()
+    serializer_class = AccountBelovedOnesSerializer
+    permission_classes = [IsAuthenticated, AccountPermissions]
+
+    def patch(self, request, *args, **kwargs):
+        account = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        users = data['users']
+        add = {users[reference] for reference in data['add'] if reference in users}
+        remove = {users[reference] for reference in data['remove'] if reference in users}
+
+        through = Account.beloved_ones.through
+        with transaction.atomic():
+            current = set(
+                through.objects.filter(account_id=account.pk, user_id__in=add | remove).values_list('user_id', flat=True)
+            )
+            added, removed = add - current, remove & current
+            if removed:
+                through.objects.filter(account_id=account.pk, user_id__in=removed).delete()
+            if added:
+                through.objects.bulk_create(
+                    [through(account_id=account.pk, user_id=pk) for pk in sorted(added)], ignore_conflicts=True
+                )
+            if added or removed:
+                account.save(update_fields=['updated_at'])
+        if added or removed:
+            invalidate_acl(*added, *removed)
+
+        return Response({
+            'add': [self.result(reference, users, added, 'added') for reference in data['add']],
+            'remove': [self.result(reference, users, removed, 'removed') for reference in data['remove']],
+        })
+
+    def result(self, reference, users, changed, changed_status):
+        user_id = users.get(reference)
+        if user_id is None:
+            item_status = 'not_found'
+        elif user_id in changed:
+            item_status = changed_status
+        else:
+            item_status = 'unchanged'
+        return {'user': reference, 'id': user_id, 'status': item_status}
+
+class ListBelovedOneFromAccountView(SparseFieldsetMixin, generics.RetrieveAPIView):
     http_method_names = ['get']
-    queryset = Account.objects.all().filter(is_active=True)
+    queryset = Account.active.all()
     permission_classes = [IsAuthenticated, AccountPermissions]
     serializer_class = AccountSerializer
     lookup_field = 'pk'
 
+    def get_queryset(self):
+        return self.only_requested(super().get_queryset())
+
 class CreateCharacterView(generics.CreateAPIView):
     http_method_names = ['post']
     serializer_class = CharacterSerializer
@@ -186,13 +314,13 @@ class UpdateCharacterView(generics.UpdateAPIView):
     http_method_names = ['patch']
     serializer_class = CharacterSerializer
     permission_classes = [IsAuthenticated, CharacterPermissions]
-    queryset = Character.objects.all().filter(is_active=True)   
+    queryset = Character.active.all()
 
 class DeleteCharacterView(generics.UpdateAPIView):
     http_method_names = ['delete']
     serializer_class = CharacterSerializer
     permission_classes = [IsAuthenticated, CharacterPermissions]
-    queryset = Character.objects.all().filter(is_active=True)
+    queryset = Character.active.all()
 
     def delete(self, request, pk):
         character = self.get_object()
@@ -205,20 +333,28 @@ class CreateMemoryView(generics.CreateAPIView):
     serializer_class = MemorySerializer
     permission_classes = [IsAuthenticated, MemoryPermissions]
 
-class RetrieveMemoryView(generics.RetrieveAPIView):
+class RetrieveMemoryView(SparseFieldsetMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     http_method_names = ['get']
-    queryset = Memory.objects.all()
+    queryset = Memory.active.all()
     serializer_class = MemorySerializer
     permission_classes = [MemoryPermissions]
 
+    def get_queryset(self):
+        # The permission check reads the account, the ETag updated_at
+        return self.only_requested(super().get_queryset(), 'account', 'updated_at')
+
+    def get_etag_parts(self):
+        memory = self.get_object()
+        return [memory.pk, memory.updated_at, *get_versions(Video.active.filter(memory_id=memory.pk))]
+
 class UpdateMemoryView(generics.UpdateAPIView):
     http_method_names = ['patch']
-    queryset = Memory.objects.all()
+    queryset = Memory.active.all()
     serializer_class = MemorySerializer
     permission_classes = [MemoryPermissions]
 
 class DeleteMemoryView(generics.DestroyAPIView):
-    queryset = Memory.objects.all()
+    queryset = Memory.active.all()
     serializer_class = MemorySerializer
     permission_classes = [IsAuthenticated, MemoryPermissions]
 
@@ -226,25 +362,32 @@ class DeleteMemoryView(generics.DestroyAPIView):
         instance.is_active = False
         instance.save()
 
-class ListMemoriesView(generics.ListAPIView):
+class ListMemoriesView(SparseFieldsetMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = MemorySerializer
     permission_classes = [IsAuthenticated, MemoryPermissions]
 
+    pagination_class = KeysetPagination
+
+    def get_etag_parts(self):
+        # Only the rows of the requested page, not the user's whole history
+        page = self.paginator.get_page_queryset(self.filter_queryset(self.get_queryset()), self.request)
+        # A row deleted from the page lets the next one in, which the count and
+        # latest updated_at can miss, so the page's ids are versioned too
+        ids = StringAgg(Cast('pk', output_field=TextField()), delimiter=',', ordering='pk')
+        return get_versions(Memory.objects.filter(pk__in=page.values('pk')), 'videos', ids=MD5(ids))
+
     def get_queryset(self):
         user = self.request.user
-        owner_memories = Memory.objects.filter(
-            is_active=True,
-            account__owner_user=user
-        )
-        beloved_memories = Memory.objects.filter(
-            is_active=True,
-            account__beloved_ones=user
+        beloved_accounts = Account.beloved_ones.through.objects.filter(user=user).values('account_id')
+        memories = Memory.active.filter(
+            Q(account__owner_user=user) | Q(account__in=beloved_accounts), account__is_active=True,
         )
-        return owner_memories.union(beloved_memories)
+        # The pagination cursor is made of created_at and id
+        return self.only_requested(memories, 'created_at')
 
 class AddCharacterToMemoryView(generics.UpdateAPIView):
     http_method_names = ['patch']
-    queryset = Memory.objects.all()
+    queryset = Memory.active.all()
     serializer_class = MemorySerializer
     permission_classes = [MemoryPermissions]
 
@@ -253,19 +396,20 @@ class AddCharacterToMemoryView(generics.UpdateAPIView):
         character_id = request.data.get('character_id')
 
         try:
-            character = Character.objects.get(id=character_id, is_active=True)
+            character = Character.active.get(id=character_id)
         except Character.DoesNotExist:
             return Response({"detail": "Character not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if character not in memory.characters.all():
+        if not memory.characters.filter(pk=character.pk).exists():
             memory.characters.add(character)
-            memory.save()
+            # Bumps updated_at, which the memory ETags are computed from
+            memory.save(update_fields=['updated_at'])
 
         return Response(self.get_serializer(memory).data)
 
 class RemoveCharacterToMemoryView(generics.UpdateAPIView):
     http_method_names = ['patch']
-    queryset = Memory.objects.all()
+    queryset = Memory.active.all()
     serializer_class = MemorySerializer
     permission_classes = [MemoryPermissions]
 
@@ -278,13 +422,38 @@ class RemoveCharacterToMemoryView(generics.UpdateAPIView):
         except Character.DoesNotExist:
             return Response({"detail": "Character not found."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if character in memory.characters.all():
+        if memory.characters.filter(pk=character.pk).exists():
             memory.characters.remove(character)
-            memory.save()
+            memory.save(update_fields=['updated_at'])
             return Response(self.get_serializer(memory).data)
 
         return Response({"detail": "Character not associated with this memory."}, status=status.HTTP_400_BAD_REQUEST)
 
+class UpdateMemoryCharactersView(generics.GenericAPIView):
+    """Tags and untags any number of the account's characters on a memory at once."""
+    http_method_names = ['patch']
+    queryset = Memory.active.all()
+    serializer_class = MemoryCharactersSerializer
+    permission_classes = [IsAuthenticated, MemoryPermissions]
+
+    def patch(self, request, *args, **kwargs):
+        memory = self.get_object()
+        serializer = self.get_serializer(data=request.data, context={**self.get_serializer_context(), 'memory': memory})
+        serializer.is_valid(raise_exception=True)
+        add, remove = serializer.validated_data['add'], serializer.validated_data['remove']
+
+        through = Character.memories.through
+        with transaction.atomic():
+            if remove:
+                through.objects.filter(memory_id=memory.pk, character_id__in=remove).delete()
+            if add:
+                through.objects.bulk_create(
+                    [through(memory_id=memory.pk, character_id=pk) for pk in sorted(add)], ignore_conflicts=True
+                )
+            memory.save(update_fields=['updated_at'])
+
+        return Response(MemorySerializer(memory, context=self.get_serializer_context()).data)
+
 class CreateVideoMemoryView(generics.CreateAPIView):
     http_method_names =['post']
     queryset = Video.objects.all()
@@ -292,32 +461,379 @@ class CreateVideoMemoryView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated, MemoryPermissions]
 
     def perform_create(self, serializer):
-        memory = Memory.objects.get(id=self.request.data.get('memory'))
+        memory = Memory.active.get(id=self.request.data.get('memory'))
         self.check_object_permissions(self.request, memory)
-        serializer.save(memory=memory, file=self.request.data.get('file'))
+        video = serializer.save(memory=memory, file=self.request.data.get('file'))
+        schedule_video_processing(video)
+
+class AsyncCreateVideoMemoryView(AsyncAPIViewMixin, CreateVideoMemoryView):
+    async def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=await self.get_request_data())
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        memory = serializer.validated_data['memory']
+        await sync_to_async(self.check_object_permissions)(request, memory)
+
+        # Files go to storage first so the request's database thread is never held during the upload
+        for name in ('file', 'thumbnail'):
+            content = serializer.validated_data.get(name)
+            if content:
+                serializer.validated_data[name] = await save_file(Video._meta.get_field(name), content)
+
+        await sync_to_async(self.save_video)(serializer, memory)
+        data = await sync_to_async(lambda: serializer.data)()
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
+
+    def save_video(self, serializer, memory):
+        video = serializer.save(memory=memory)
+        schedule_video_processing(video)
 
 class RetrieveVideoMemoryView(generics.RetrieveAPIView):
     http_method_names =['get']
-    queryset = Video.objects.all().filter(is_active=True)
+    queryset = Video.active.select_related('memory')
     serializer_class = VideoSerializer
     permission_classes = [VideoPermissions]
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
 
-        # For local development with Django's built-in server, you can use this:
-        video_url = request.build_absolute_uri(instance.file.url)
+        if instance.hls_status == Video.HLS_READY and instance.hls_playlist:
+            return Response({"url": self.get_playlist_url(instance), "format": "hls"})
+
+        # Signed S3 URLs are reused until shortly before they expire
+        video_url = request.build_absolute_uri(get_file_url(instance.file))
+
+        return Response({"url": video_url, "format": "original"})
+
+    def get_playlist_url(self, instance):
+        storage = instance.file.storage
+        if not is_signed(storage):
+            return self.request.build_absolute_uri(get_storage_url(storage, instance.hls_playlist))
+        # Relative segment URIs cannot carry a signature, so private playlists are rewritten on the way out
+        token = transcoding.make_playlist_token(instance)
+        return reverse('hls_playlist', kwargs={'token': token, 'name': transcoding.MASTER_PLAYLIST}, request=self.request)
+
+class AsyncRetrieveVideoMemoryView(AsyncAPIViewMixin, RetrieveVideoMemoryView):
+    async def get(self, request, *args, **kwargs):
+        instance = await sync_to_async(self.get_object)()
+
+        if instance.hls_status == Video.HLS_READY and instance.hls_playlist:
+            return Response({"url": self.get_playlist_url(instance), "format": "hls"})
+
+        # Signing is local CPU work and usually a cache hit, so it stays on the event loop
+        video_url = request.build_absolute_uri(get_file_url(instance.file))
 
-        # In production, with AWS S3, you would use something like this instead:
-        # video_url = generate_presigned_url(instance.file.name)
+        return Response({"url": video_url, "format": "original"})
 
-        return Response({"url": video_url})
+class HLSPlaylistView(generics.GenericAPIView):
+    http_method_names = ['get']
+    # Players cannot send the Authorization header, the signed token in the URL grants access
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token, name):
+        try:
+            data = transcoding.read_playlist_token(token)
+        except signing.BadSignature:
+            return Response({"detail": "Invalid or expired playlist link."}, status=status.HTTP_404_NOT_FOUND)
+
+        directory = posixpath.dirname(data['playlist'])
+        playlist = posixpath.normpath(posixpath.join(directory, name))
+        if not playlist.startswith(directory + '/') or not playlist.endswith('.m3u8'):
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        video = Video.active.filter(id=data['video'], hls_playlist=data['playlist']).first()
+        if video is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        storage = video.file.storage
+        with storage.open(playlist) as stored:
+            content = stored.read().decode()
+
+        def make_playlist_url(nested):
+            nested_name = posixpath.relpath(nested, directory)
+            return reverse('hls_playlist', kwargs={'token': token, 'name': nested_name}, request=request)
+
+        response = HttpResponse(
+            transcoding.rewrite_playlist(storage, playlist, content, make_playlist_url),
+            content_type='application/vnd.apple.mpegurl',
+        )
+        # Segment URLs are signed, so never cache the playlist longer than they stay valid
+        response['Cache-Control'] = f'private, max-age={min(get_url_ttl(storage), 300)}'
+        return response
 
 class DeleteVideoMemoryView(generics.DestroyAPIView):
-    queryset = Video.objects.all()
+    queryset = Video.active.select_related('memory')
     serializer_class = VideoSerializer
     permission_classes = [VideoPermissions]
 
     def perform_destroy(self, instance):
         instance.is_active = False
-        instance.save()
\ No newline at end of file
+        instance.save()
+        # Every name a URL is signed for: the source, its images and the HLS playlists and segments
+        invalidate_file_urls(instance.file, instance.thumbnail, instance.poster)
+        storage = instance.file.storage
+        invalidate_urls(storage, *instance.thumbnails.values())
+        if instance.hls_playlist:
+            invalidate_urls(storage, *transcoding.list_files(storage, posixpath.dirname(instance.hls_playlist)))
+
+class InitiateVideoUploadView(generics.GenericAPIView):
+    http_method_names = ['post']
+    serializer_class = VideoUploadInitiateSerializer
+    permission_classes = [IsAuthenticated, MemoryPermissions]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        memory = serializer.validated_data['memory']
+        self.check_object_permissions(request, memory)
+
+        try:
+            upload = uploads.create_multipart_upload(
+                serializer.validated_data['filename'],
+                serializer.validated_data['size'],
+                serializer.validated_data['content_type'],
+            )
+        except uploads.DirectUploadNotSupported as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload['upload_token'] = uploads.make_upload_token(request.user, memory, upload['name'], upload['upload_id'])
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+class CompleteVideoUploadView(generics.GenericAPIView):
+    http_method_names = ['post']
+    serializer_class = VideoUploadCompleteSerializer
+    permission_classes = [IsAuthenticated, MemoryPermissions]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['upload_token']
+        if upload['user'] != request.user.id:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        memory = get_object_or_404(Memory.active, pk=upload['memory'])
+        self.check_object_permissions(request, memory)
+
+        try:
+            size = uploads.complete_multipart_upload(upload['name'], upload['upload_id'], serializer.validated_data['parts'])
+        except uploads.DirectUploadNotSupported as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (BotoCoreError, ClientError):
+            return Response({"detail": "The upload could not be completed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if size > getattr(settings, 'VIDEO_UPLOAD_MAX_SIZE', 5 * 1024 ** 3):
+            uploads.get_video_storage().delete(upload['name'])
+            return Response({"detail": "The uploaded video is too large."}, status=status.HTTP_400_BAD_REQUEST)
+
+        video = Video.objects.create(memory=memory, file=upload['name'])
+        schedule_video_processing(video)
+        return Response(VideoSerializer(video, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
+
+class AbortVideoUploadView(generics.GenericAPIView):
+    http_method_names = ['post']
+    serializer_class = VideoUploadTokenSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['upload_token']
+        if upload['user'] != request.user.id:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            uploads.abort_multipart_upload(upload['name'], upload['upload_id'])
+        except uploads.DirectUploadNotSupported as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except (BotoCoreError, ClientError):
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+TUS_HEADERS = {'Tus-Resumable': '1.0.0'}
+
+class CreateResumableVideoUploadView(generics.CreateAPIView):
+    http_method_names = ['post']
+    serializer_class = VideoUploadSerializer
+    permission_classes = [IsAuthenticated, MemoryPermissions]
+
+    def perform_create(self, serializer):
+        self.check_object_permissions(self.request, serializer.validated_data['memory'])
+        serializer.save(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response['Location'] = reverse('resumable_memory_video_upload', kwargs={'pk': response.data['id']}, request=request)
+        response['Upload-Offset'] = '0'
+        for header, value in TUS_HEADERS.items():
+            response[header] = value
+        return response
+
+class ResumableVideoUploadView(generics.GenericAPIView):
+    http_method_names = ['head', 'patch', 'delete']
+    serializer_class = VideoUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return VideoUpload.objects.filter(user=self.request.user, is_active=True, video__isnull=True)
+
+    def offset_headers(self, upload):
+        return {'Upload-Offset': str(upload.offset), 'Upload-Length': str(upload.size), 'Cache-Control': 'no-store', **TUS_HEADERS}
+
+    def head(self, request, *args, **kwargs):
+        upload = self.get_object()
+        return Response(status=status.HTTP_200_OK, headers=self.offset_headers(upload))
+
+    def patch(self, request, *args, **kwargs):
+        if request.content_type != 'application/offset+octet-stream':
+            return Response({"detail": "Content-Type must be application/offset+octet-stream."}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            checksum = resumable.parse_checksum(request.headers.get('Upload-Checksum'))
+        except (KeyError, ValueError):
+            return Response({"detail": "Invalid Upload-Offset, Content-Length or Upload-Checksum header."}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = self.get_object()
+        if offset != upload.offset:
+            return Response({"detail": "Upload-Offset does not match the current offset."}, status=status.HTTP_409_CONFLICT, headers=self.offset_headers(upload))
+        max_chunk_size = getattr(settings, 'RESUMABLE_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024)
+        if length <= 0 or length > max_chunk_size or offset + length > upload.size:
+            return Response({"detail": "Invalid chunk size."}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # Receive the bytes without holding the row lock, then commit them
+        # only if no other request moved the offset meanwhile.
+        try:
+            temp_path, chunk = resumable.stage_chunk(upload, request.stream, length, checksum)
+        except resumable.ChecksumMismatch:
+            return Response({"detail": "Checksum mismatch."}, status=460, headers=self.offset_headers(upload))
+        except resumable.IncompleteChunk:
+            return Response({"detail": "Incomplete chunk."}, status=status.HTTP_400_BAD_REQUEST, headers=self.offset_headers(upload))
+
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=upload.pk)
+            if upload.offset != chunk['offset']:
+                resumable.drop_chunk(temp_path)
+                return Response({"detail": "Upload-Offset does not match the current offset."}, status=status.HTTP_409_CONFLICT, headers=self.offset_headers(upload))
+            resumable.commit_chunk(upload, temp_path, chunk)
+            upload.save(update_fields=['chunks', 'offset', 'updated_at'])
+
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=self.offset_headers(upload))
+
+    def delete(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if resumable.is_assembling(upload):
+            return Response({"detail": "The upload is being finished."}, status=status.HTTP_409_CONFLICT, headers=TUS_HEADERS)
+        upload.is_active = False
+        upload.save(update_fields=['is_active', 'updated_at'])
+        resumable.discard(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT, headers=TUS_HEADERS)
+
+class FinishResumableVideoUploadView(generics.GenericAPIView):
+    http_method_names = ['post']
+    serializer_class = VideoSerializer
+    permission_classes = [IsAuthenticated, MemoryPermissions]
+
+    def get_queryset(self):
+        # A memory deleted while the upload was staged, or copied, gets no video
+        return VideoUpload.objects.filter(
+            user=self.request.user, is_active=True, video__isnull=True, memory__is_active=True,
+        ).select_related('memory')
+
+    def post(self, request, *args, **kwargs):
+        # Claim the upload in a short transaction, copy it to storage without
+        # holding the row lock, then save the video in another one.
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(of=('self',)), pk=kwargs['pk'])
+            self.check_object_permissions(request, upload.memory)
+            if upload.offset != upload.size:
+                return Response(
+                    {"detail": "The upload is not complete.", "offset": upload.offset, "size": upload.size},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if resumable.is_assembling(upload):
+                return Response({"detail": "The upload is already being finished."}, status=status.HTTP_409_CONFLICT)
+            upload.assembling_at = timezone.now()
+            upload.save(update_fields=['assembling_at', 'updated_at'])
+
+        try:
+            video = resumable.store(upload)
+        except resumable.ChecksumMismatch:
+            # The staged chunks can't be trusted any more, the client starts over
+            upload.is_active = False
+            upload.assembling_at = None
+            upload.save(update_fields=['is_active', 'assembling_at', 'updated_at'])
+            resumable.discard(upload)
+            return Response({"detail": "A staged chunk failed its checksum, upload the video again."}, status=460)
+        except BaseException:
+            VideoUpload.objects.filter(pk=upload.pk).update(assembling_at=None)
+            raise
+
+        with transaction.atomic():
+            claimed = self.get_queryset().select_for_update(of=('self',)).filter(
+                pk=upload.pk, assembling_at=upload.assembling_at,
+            ).first()
+            if claimed is None:
+                # Deleted, its memory deleted, or its claim timed out and another request finished it
+                video.file.delete(save=False)
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            video.save()
+            schedule_video_processing(video)
+            claimed.video = video
+            claimed.assembling_at = None
+            claimed.save(update_fields=['video', 'assembling_at', 'updated_at'])
+        resumable.discard(upload)
+        return Response(self.get_serializer(video).data, status=status.HTTP_201_CREATED)
+
+class BatchView(generics.GenericAPIView):
+    """
+    Runs a list of sub-requests, in order, and answers with all their responses.
+    The batch is authenticated once, sub-requests skip the middleware and are
+    rendered together. Each runs on its own like a separate request would, so
+    one failing doesn't undo the ones before it.
+    """
+    http_method_names = ['post']
+    serializer_class = BatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Sub-requests that write pin the user to the primary themselves
+        request._request.replica_pin = False
+        responses = [
+            batch.dispatch(request, item['method'], item['path'], item.get('body'), item['headers'])
+            for item in serializer.validated_data['requests']
+        ]
+        return Response({'responses': responses})
+
+class SyncView(generics.GenericAPIView):
+    """
+    What changed for the user since ``?since=``, the cursor the previous sync
+    answered with: the visible accounts, profiles, memories, videos and
+    characters saved after it, and the ids of the ones deleted since. Without
+    a cursor it answers with everything live.
+    """
+    http_method_names = ['get']
+    serializer_class = SyncSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        # Before any read, a row saved during the sync is sent again next time
+        started_at = timezone.now()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since, synced_accounts = serializer.validated_data.get('since') or (None, set())
+        rows, deleted, visible = sync.get_changes(request.user, since, synced_accounts)
+
+        context = self.get_serializer_context()
+        data = {'cursor': sync.get_next_cursor(started_at, visible)}
+        for name, serializer_class, expand in [
+            ('accounts', AccountSerializer, ['beloved_ones']),
+            ('profiles', ProfileSerializer, []),
+            ('memories', MemorySerializer, []),
+            ('videos', VideoSerializer, []),
+            ('characters', CharacterSerializer, []),
+        ]:
+            fieldset = sync.make_fieldset(*expand)
+            data[name] = serializer_class(rows[name], many=True, context=context, fieldset=fieldset).data
+        data['tags'] = rows['tags']
+        data['deleted'] = deleted
+        return Response(data)
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import Q
+
+from griot_backend.managers import ActiveManager
 from accounts.models import Account
 from memories.models import Memory
 
@@ -22,5 +25,16 @@ class Character(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, blank=True)
 
+    objects = models.Manager()
+    # Live rows only, what the partial indexes below cover
+    active = ActiveManager()
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account'], condition=Q(is_active=True), name='character_account_active_idx'),
+            # /api/sync/ reads what changed per account, deleted rows included
+            models.Index(fields=['account', 'updated_at'], name='character_account_updated_idx'),
+        ]
\ No newline at end of file
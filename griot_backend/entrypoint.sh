@@ -19,5 +19,13 @@ python manage.py collectstatic --no-input
 # python manage.py runserver 0.0.0.0:8000
 
 # Start the Gunicorn development server
-echo "Starting Gunicorn development server..."
-gunicorn griot_backend.wsgi:application
+# The runtime profile (workers, preloading, recycling) lives next to this script
+GUNICORN_CONFIG="${GUNICORN_CONFIG:-$(dirname "$(readlink -f "$0")")/gunicorn.conf.py}"
+# SERVER_MODE=asgi serves the ASGI app with uvicorn workers instead of sync WSGI workers
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "Starting Gunicorn development server (ASGI)..."
+    exec gunicorn griot_backend.asgi:application -c "$GUNICORN_CONFIG"
+else
+    echo "Starting Gunicorn development server..."
+    exec gunicorn griot_backend.wsgi:application -c "$GUNICORN_CONFIG"
+fi
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from accounts.models import Account
+
+from .cache import TwoLevelCache
+
+OWNER = 'owner'
+BELOVED_ONE = 'beloved_one'
+
+# Per-user index of {account_id: role} over the active accounts the user can reach.
+acl_cache = TwoLevelCache(
+    'acl',
+    alias=getattr(settings, 'ACL_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'ACL_CACHE_TIMEOUT', 300),
+    local_max_size=getattr(settings, 'ACL_CACHE_LOCAL_SIZE', 1024),
+    local_ttl=getattr(settings, 'ACL_CACHE_LOCAL_TTL', 10),
+)
+
+
+def build_account_roles(user_id):
+    roles = {}
+    # Cached for minutes, so always built from the primary rather than a lagging replica
+    accounts = Account.active.using(DEFAULT_DB_ALIAS).filter(
+        Q(owner_user_id=user_id) | Q(beloved_ones__id=user_id)
+    ).values_list('id', 'owner_user_id').distinct()
+    for account_id, owner_user_id in accounts:
+        roles[account_id] = OWNER if owner_user_id == user_id else BELOVED_ONE
+    return roles
+
+
+def get_account_roles(user):
+    roles = acl_cache.get(user.id)
+    if roles is None:
+        roles = build_account_roles(user.id)
+        acl_cache.set(user.id, roles)
+    return roles
+
+
+def get_account_role(user, account_id):
+    if not user or not user.is_authenticated:
+        return None
+    return get_account_roles(user).get(account_id)
+
+
+def invalidate_acl(*user_ids):
+    acl_cache.delete_many(set(user_ids))
+
+
+def invalidate_account_acl(account):
+    user_ids = list(account.beloved_ones.values_list('id', flat=True))
+    invalidate_acl(account.owner_user_id, *user_ids)
@@ -1,10 +1,51 @@
+import pickle
+
+from django.conf import settings
+from django.db import transaction
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import AuthenticationFailed
 
+from .cache import TwoLevelCache
+
+# Resolved tokens (with their user and the user's profile) keyed by token key.
+# Entries are stored pickled so every request gets its own copy of the user.
+token_cache = TwoLevelCache(
+    'auth-token',
+    alias=getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300),
+    local_max_size=getattr(settings, 'AUTH_TOKEN_CACHE_LOCAL_SIZE', 1024),
+    local_ttl=getattr(settings, 'AUTH_TOKEN_CACHE_LOCAL_TTL', 10),
+)
+
+
+# Entries are dropped once the change commits: dropped earlier, a concurrent
+# request could still read the old rows and cache them again until the timeout.
+
+def invalidate_token(key):
+    transaction.on_commit(lambda: token_cache.delete(key))
+
+
+def invalidate_user_tokens(user):
+    # Read now, the tokens may be deleted in the same transaction
+    keys = list(Token.objects.filter(user=user).values_list('key', flat=True))
+    if keys:
+        transaction.on_commit(lambda: token_cache.delete_many(keys))
+
+
 class CustomTokenAuthentication(TokenAuthentication):
     def authenticate_credentials(self, key):
-        try:
-            return super().authenticate_credentials(key)
-        except AuthenticationFailed as e:
-            # Handle the invalid token error here
+        cached = token_cache.get(key)
+        if cached is not None:
+            token = pickle.loads(cached)
+        else:
+            try:
+                token = Token.objects.select_related('user', 'user__profile').get(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed('Invalid token', code=401)
+            token_cache.set(key, pickle.dumps(token, pickle.HIGHEST_PROTOCOL))
+
+        if not token.user.is_active:
             raise AuthenticationFailed('Invalid token', code=401)
+
+        return (token.user, token)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """
+    Small thread-safe, per-process LRU with a time-to-live on every entry.
+
+    It sits in front of the shared cache backend so the hottest keys are
+    served without a network round trip.
+    """
+
+    def __init__(self, max_size=1024, ttl=10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoLevelCache:
+    """
+    Per-process LRU backed by one of the configured Django cache aliases.
+
+    Reads try the local LRU first, then the shared backend, and promote
+    shared hits into the LRU. Deletes clear both levels for this process;
+    other processes drop their copy once the local TTL runs out, so keep
+    ``local_ttl`` short.
+    """
+
+    def __init__(self, prefix, alias='default', timeout=300, local_max_size=1024, local_ttl=10):
+        self.prefix = prefix
+        self.alias = alias
+        self.timeout = timeout
+        self.local = LocalLRUCache(max_size=local_max_size, ttl=min(local_ttl, timeout))
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def make_key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get(self, key, default=None):
+        cache_key = self.make_key(key)
+        value = self.local.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(cache_key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.local.set(cache_key, value)
+        return value
+
+    def get_many(self, keys):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self.local.get(self.make_key(key), _MISSING)
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            values = self.shared.get_many([self.make_key(key) for key in remote])
+            for key in remote:
+                cache_key = self.make_key(key)
+                if cache_key in values:
+                    found[key] = values[cache_key]
+                    self.local.set(cache_key, values[cache_key])
+        return found
+
+    def set(self, key, value, timeout=None):
+        cache_key = self.make_key(key)
+        timeout = self.timeout if timeout is None else timeout
+        self.shared.set(cache_key, value, timeout)
+        self.local.set(cache_key, value, min(self.local.ttl, timeout))
+
+    def set_many(self, mapping, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        self.shared.set_many({self.make_key(key): value for key, value in mapping.items()}, timeout)
+        for key, value in mapping.items():
+            self.local.set(self.make_key(key), value, min(self.local.ttl, timeout))
+
+    def delete(self, key):
+        cache_key = self.make_key(key)
+        self.local.delete(cache_key)
+        self.shared.delete(cache_key)
+
+    def delete_many(self, keys):
+        cache_keys = [self.make_key(key) for key in keys]
+        for cache_key in cache_keys:
+            self.local.delete(cache_key)
+        self.shared.delete_many(cache_keys)
+
+    def clear_local(self):
+        self.local.clear()
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/msgpack',
+    'application/javascript',
+    'application/xml',
+    'application/vnd.apple.mpegurl',
+    'text/',
+)
+
+
+def parse_accept_encoding(header):
+    """Returns the content codings the client accepts, ignoring those with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip for API responses over COMPRESSION_MIN_SIZE bytes. Smaller
+    bodies fit in a packet or two anyway and aren't worth the CPU time.
+    Streaming responses (media files) are left alone, they're compressed
+    formats already.
+    """
+    # Gzip filename padding against BREACH-style length oracles, as in Django's GZipMiddleware
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            coding = 'br'
+            compressed = brotli.compress(
+                response.content,
+                quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4),
+            )
+        elif 'gzip' in accepted:
+            coding = 'gzip'
+            compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = coding
+        # The body is no longer byte-for-byte what the strong ETag described
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class ActiveManager(models.Manager):
+    """
+    Rows that weren't soft-deleted (``is_active=False``). Declared after
+    ``objects``, which stays the default manager so the admin, related
+    managers and /api/sync/ tombstones still see every row.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
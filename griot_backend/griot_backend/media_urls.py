@@ -0,0 +1,70 @@
+import time
+
+from django.conf import settings
+
+from .cache import LocalLRUCache
+
+# Per-process only: signing a URL is cheaper than a round trip to the shared
+# cache, so there is nothing to gain from sharing them between workers.
+url_cache = LocalLRUCache(max_size=getattr(settings, 'MEDIA_URL_CACHE_SIZE', 10000))
+
+
+def is_signed(storage):
+    return getattr(storage, 'querystring_auth', False)
+
+
+def get_url_ttl(storage):
+    if is_signed(storage):
+        # Reuse a signed URL until shortly before its signature expires
+        margin = getattr(settings, 'MEDIA_URL_CACHE_MARGIN', 300)
+        return max(storage.querystring_expire - margin, 0)
+    return getattr(settings, 'MEDIA_URL_CACHE_TIMEOUT', 3600)
+
+
+def get_url_version(storage):
+    """
+    Changes every MEDIA_URL_CACHE_MARGIN seconds for signed storages. A client
+    revalidating a response by an ETag that includes it never keeps a URL past
+    its signature, since cached URLs outlive their margin by less than that.
+    """
+    if not is_signed(storage):
+        return 0
+    return int(time.time() // max(getattr(settings, 'MEDIA_URL_CACHE_MARGIN', 300), 1))
+
+
+def make_key(storage, name):
+    return f'{storage.__class__.__name__}:{name}'
+
+
+def get_storage_url(storage, name):
+    if not name:
+        return None
+    if not getattr(settings, 'MEDIA_URL_CACHE_ENABLED', True):
+        return storage.url(name)
+
+    key = make_key(storage, name)
+    url = url_cache.get(key)
+    if url is None:
+        url = storage.url(name)
+        ttl = get_url_ttl(storage)
+        if ttl > 0:
+            url_cache.set(key, url, ttl)
+    return url
+
+
+def get_file_url(file):
+    if not file:
+        return None
+    return get_storage_url(file.storage, file.name)
+
+
+def invalidate_urls(storage, *names):
+    for name in names:
+        if name:
+            url_cache.delete(make_key(storage, name))
+
+
+def invalidate_file_urls(*files):
+    for file in files:
+        if file:
+            invalidate_urls(file.storage, file.name)
@@ -0,0 +1,40 @@
+SMAPS_FIELDS = {
+    'Rss': 'rss',
+    'Pss': 'pss',
+    'Shared_Clean': 'shared',
+    'Shared_Dirty': 'shared',
+    'Private_Clean': 'private',
+    'Private_Dirty': 'private',
+}
+
+
+def read_memory_stats(pid='self'):
+    """
+    Returns the memory of a process in kB from /proc: ``rss`` counts every
+    resident page, ``shared`` the pages still shared with other processes
+    (copy-on-write pages inherited from a preloading master), ``private`` the
+    pages only this process holds and ``pss`` its proportional share of both.
+    ``private`` is what one more worker really costs.
+    """
+    stats = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps:
+            for line in smaps:
+                name, _, value = line.partition(':')
+                if name in SMAPS_FIELDS:
+                    stats[SMAPS_FIELDS[name]] += int(value.split()[0])
+    except OSError:
+        if pid != 'self':
+            raise
+        # No smaps_rollup (older kernels, macOS): only the peak RSS is known
+        try:
+            import resource
+            stats['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            pass
+    return stats
+
+
+def format_memory_stats(stats):
+    return ' '.join(f'{name}={value / 1024:.1f}MB' for name, value in stats.items())
+
@@ -5,6 +5,8 @@ from memories.models import Memory, Video
 from profiles.models import Profile
 from characters.models import Character
 
+from .acl import OWNER, BELOVED_ONE, get_account_role, get_account_roles
+
 
 class ProfilePermissions(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -12,11 +14,16 @@ class ProfilePermissions(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # Owners can perform any operation
-        if request.user == obj.user:
+        if request.user.id == obj.user_id:
             return True
         # Beloved ones can read profiles
         elif request.method in permissions.SAFE_METHODS:
-            return request.user in obj.user.account_set.filter(beloved_ones=request.user)
+            owned = get_account_roles(obj.user)
+            return any(
+                owned.get(account_id) == OWNER
+                for account_id, role in get_account_roles(request.user).items()
+                if role == BELOVED_ONE
+            )
         # Deny if none of the above
         return False
 
@@ -25,11 +32,12 @@ class AccountPermissions(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
+        role = get_account_role(request.user, obj.id)
         # Owners can perform any operation
-        if request.user == obj.owner_user:
+        if role == OWNER:
             return True
         # Beloved ones can only read account details
-        elif request.method in permissions.SAFE_METHODS and request.user in obj.beloved_ones.all():
+        elif request.method in permissions.SAFE_METHODS and role == BELOVED_ONE:
             return True
         # Deny if none of the above
         return False
@@ -39,11 +47,12 @@ class MemoryPermissions(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
+        role = get_account_role(request.user, obj.account_id)
         # Owners can perform any operation
-        if request.user == obj.account.owner_user:
+        if role == OWNER:
             return True
         # Beloved ones can only read memory details
-        elif request.method in permissions.SAFE_METHODS and request.user in obj.account.beloved_ones.all():
+        elif request.method in permissions.SAFE_METHODS and role == BELOVED_ONE:
             return True
         # Deny if none of the above
         return False
@@ -53,11 +62,12 @@ class CharacterPermissions(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
+        role = get_account_role(request.user, obj.account_id)
         # Owners can perform any operation
-        if request.user == obj.account.owner_user:
+        if role == OWNER:
             return True
         # Beloved ones can only read memory details
-        elif request.method in permissions.SAFE_METHODS and request.user in obj.account.beloved_ones.all():
+        elif request.method in permissions.SAFE_METHODS and role == BELOVED_ONE:
             return True
         # Deny if none of the above
         return False
@@ -67,11 +77,12 @@ class VideoPermissions(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
+        role = get_account_role(request.user, obj.memory.account_id)
         # Owners can perform any operation
-        if request.user == obj.memory.account.owner_user:
+        if role == OWNER:
             return True
         # Beloved ones can only read video details
-        elif request.method in permissions.SAFE_METHODS and request.user in obj.memory.account.beloved_ones.all():
+        elif request.method in permissions.SAFE_METHODS and role == BELOVED_ONE:
             return True
         # Deny if none of the above
         return False
\ No newline at end of file
@@ -0,0 +1,116 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The request whose reads may go to a replica, set by ReplicaRoutingMiddleware
+_current_request = contextvars.ContextVar('replica_request', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_READ_REPLICAS', [])
+
+
+def get_pin_cache():
+    return caches[getattr(settings, 'DATABASE_REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def make_pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Sends the user's reads to the primary until the replicas have caught up with their writes."""
+    timeout = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5)
+    if timeout > 0:
+        get_pin_cache().set(make_pin_key(user_id), True, timeout)
+
+
+def is_pinned(user_id):
+    return get_pin_cache().get(make_pin_key(user_id), False)
+
+
+def get_read_alias(request):
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        # Reads inside a transaction must see its own writes
+        return DEFAULT_DB_ALIAS
+    if not hasattr(request, 'auth'):
+        # DRF has not authenticated the request yet: token lookups stay on the primary
+        # so a token created by a login moments ago is always found
+        return DEFAULT_DB_ALIAS
+
+    alias = getattr(request, '_read_alias', None)
+    if alias is None:
+        user = request.user
+        if user.is_authenticated and is_pinned(user.id):
+            alias = DEFAULT_DB_ALIAS
+        else:
+            # One replica per request, so its reads see a single consistent snapshot
+            alias = random.choice(get_replicas())
+        request._read_alias = alias
+    return alias
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of safe-method API requests to DATABASE_READ_REPLICAS and
+    everything else to the primary. Users who wrote in the last
+    DATABASE_REPLICA_PIN_SECONDS keep reading from the primary, so they see
+    their own writes while the replicas lag behind.
+    """
+
+    def db_for_read(self, model, **hints):
+        request = _current_request.get()
+        if request is None:
+            return DEFAULT_DB_ALIAS
+        return get_read_alias(request)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+@contextmanager
+def routing(request):
+    """
+    Routes the reads made in the block for ``request``. Requests that wrote
+    nothing themselves, like a batch of sub-requests that are routed on their
+    own, set ``replica_pin = False`` so they don't pin the user.
+    """
+    if not get_replicas():
+        yield
+        return
+
+    if request.method not in SAFE_METHODS:
+        token = _current_request.set(None)
+        try:
+            yield
+        finally:
+            _current_request.reset(token)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and getattr(request, 'replica_pin', True):
+            pin_to_primary(user.id)
+        return
+
+    token = _current_request.set(request)
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing(request):
+            return self.get_response(request)
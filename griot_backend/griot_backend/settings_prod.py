@@ -26,6 +26,56 @@ AWS_S3_SIGNATURE_VERSION = 's3v4'
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com/'
 
+# Media URL cache: signed URLs are reused until MARGIN seconds before expiry
+MEDIA_URL_CACHE_ENABLED = True
+MEDIA_URL_CACHE_SIZE = 10000
+MEDIA_URL_CACHE_MARGIN = 5 * 60
+
+# Direct (presigned multipart) video uploads
+VIDEO_UPLOAD_PART_SIZE = 16 * 1024 * 1024
+VIDEO_UPLOAD_MAX_SIZE = 5 * 1024 * 1024 * 1024
+VIDEO_UPLOAD_URL_EXPIRY = 60 * 60
+VIDEO_UPLOAD_TOKEN_MAX_AGE = 24 * 60 * 60
+
+# Resumable (tus-style) video uploads, staged on local disk until finished
+RESUMABLE_UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
+RESUMABLE_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# After this long a finish that never completed (the process died) may be retried
+RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT = 60 * 60
+
+# Background jobs, run by `manage.py run_worker`
+JOB_WORKER_CONCURRENCY = 2
+JOB_POLL_INTERVAL = 1.0
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 60 * 60
+# Running jobs locked for longer than this are assumed dead; keep it above VIDEO_HLS_TIMEOUT
+JOB_LOCK_TIMEOUT = 2 * 60 * 60
+JOB_REAP_INTERVAL = 60
+JOB_KEEP_SUCCEEDED = False
+
+# Poster frame and thumbnails generated with ffmpeg
+VIDEO_THUMBNAILS_ENABLED = True
+VIDEO_THUMBNAIL_SIZES = {'small': 160, 'medium': 320, 'large': 640}
+VIDEO_THUMBNAIL_DEFAULT_SIZE = 'medium'
+VIDEO_THUMBNAIL_TIMEOUT = 60
+VIDEO_POSTER_OFFSET = 1
+FFMPEG_BINARY = 'ffmpeg'
+FFPROBE_BINARY = 'ffprobe'
+
+# HLS renditions transcoded after every upload; heights apply to the shorter side
+VIDEO_HLS_ENABLED = True
+VIDEO_HLS_RENDITIONS = [
+    {'name': '360p', 'height': 360, 'video_bitrate': 800000, 'audio_bitrate': 96000},
+    {'name': '480p', 'height': 480, 'video_bitrate': 1400000, 'audio_bitrate': 128000},
+    {'name': '720p', 'height': 720, 'video_bitrate': 2800000, 'audio_bitrate': 128000},
+    {'name': '1080p', 'height': 1080, 'video_bitrate': 5000000, 'audio_bitrate': 192000},
+]
+VIDEO_HLS_SEGMENT_SECONDS = 6
+VIDEO_HLS_PRESET = 'veryfast'
+VIDEO_HLS_TIMEOUT = 60 * 60
+VIDEO_HLS_TOKEN_MAX_AGE = 6 * 60 * 60
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -50,6 +100,7 @@ INSTALLED_APPS = [
     'accounts',
     'characters',
     'memories',
+    'jobs',
     'storages',
     'rest_framework',
     'rest_framework.authtoken',
@@ -62,11 +113,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'griot_backend.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'griot_backend.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'griot_backend.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,21 +146,77 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'griot_backend.wsgi.application'
+ASGI_APPLICATION = 'griot_backend.asgi.application'
+
+# SERVER_MODE=asgi serves the app with uvicorn workers and routes the I/O-bound
+# endpoints (uploads, video retrieval, password reset) to their async views
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Seconds to keep a connection open across requests ('none' for no limit, 0 to close it
+# after every request). ASGI requests don't reuse their thread's connection, so the default
+# there is 0: put a pooler in front of the database instead.
+DATABASE_CONN_MAX_AGE = os.environ.get('DATABASE_CONN_MAX_AGE', '0' if ASYNC_VIEWS else '60')
+DATABASE_CONN_MAX_AGE = None if DATABASE_CONN_MAX_AGE.lower() == 'none' else int(DATABASE_CONN_MAX_AGE)
+# Checks a reused connection before the first query of a request and reconnects if the
+# server dropped it (failover, idle timeout) instead of failing the request
+DATABASE_CONN_HEALTH_CHECKS = os.environ.get('DATABASE_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+# Set to 'transaction' when DATABASE_HOST is a transaction-level pooler (PgBouncer
+# pool_mode=transaction, RDS Proxy). Session state does not survive between transactions there.
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': 'griotdb',
         'USER': 'djangodbuser',
         'PASSWORD': 'DB_Pass!',
-        'HOST': 'griot-database.cubmeht6dhdd.us-east-1.rds.amazonaws.com',
-        'PORT': '5432',
+        'HOST': os.environ.get('DATABASE_HOST', 'griot-database.cubmeht6dhdd.us-east-1.rds.amazonaws.com'),
+        'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DATABASE_CONN_HEALTH_CHECKS,
+        # A transaction pooler may run each transaction on a different server connection, so
+        # cursors that outlive a transaction (QuerySet.iterator()) must not be server-side
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_POOLER == 'transaction',
+        # Bind parameters client-side: psycopg never prepares statements on the server then
+        'OPTIONS': {'server_side_binding': False} if DATABASE_POOLER == 'transaction' else {},
+    }
+}
+
+# Read replicas: comma-separated hosts, each becomes a replica_<n> alias. Reads of safe-method
+# API requests go to a random replica; users who wrote in the last DATABASE_REPLICA_PIN_SECONDS
+# keep reading from the primary so they always see their own writes.
+DATABASE_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',') if host.strip()]
+for index, host in enumerate(DATABASE_REPLICA_HOSTS, 1):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+DATABASE_READ_REPLICAS = [f'replica_{index}' for index in range(1, len(DATABASE_REPLICA_HOSTS) + 1)]
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 5))
+DATABASE_ROUTERS = ['griot_backend.replicas.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://cache:6379/0'),
     }
 }
+
+# Token authentication cache (seconds)
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_CACHE_LOCAL_TTL = 10
+AUTH_TOKEN_CACHE_LOCAL_SIZE = 1024
+
+# Account access-control index cache (seconds)
+ACL_CACHE_TIMEOUT = 300
+ACL_CACHE_LOCAL_TTL = 10
+ACL_CACHE_LOCAL_SIZE = 1024
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -151,9 +261,56 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Per-request timings: Server-Timing header and one JSON log line per request, at WARNING
+# when a request goes over one of the budgets (None to disable a budget)
+REQUEST_TIMING_ENABLED = os.environ.get('REQUEST_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_HEADER = True
+REQUEST_QUERY_BUDGET = 30
+REQUEST_REPEATED_QUERY_BUDGET = 10  # executions of the same SQL, usually an N+1
+REQUEST_DB_TIME_BUDGET_MS = 250
+REQUEST_TIME_BUDGET_MS = 1000
+
+# Most sub-requests one /api/batch/ call may carry
+BATCH_MAX_REQUESTS = 20
+
+# How far back /api/sync/ cursors look, for rows saved while a sync ran
+SYNC_CURSOR_OVERLAP_SECONDS = 60
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'griot_backend.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Response compression: brotli when the client accepts it, gzip otherwise
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_BROTLI_QUALITY = 4  # 0-11, the higher levels are too slow for dynamic responses
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'griot_backend.authentication.CustomTokenAuthentication',
     ],
     
     'DEFAULT_PERMISSION_CLASSES': [
@@ -0,0 +1,182 @@
+import contextvars
+import functools
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger('griot_backend.timing')
+
+# Timings of the request being handled, set by RequestTimingMiddleware
+_current = contextvars.ContextVar('request_timings', default=None)
+
+STORAGE_METHODS = ('save', 'open', 'delete', 'exists', 'size', 'url', 'listdir')
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = Counter()
+        self.calls = Counter()
+        self.active = set()
+        self.queries = Counter()
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def most_repeated_query(self):
+        return max(self.queries.values(), default=0)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to the current request's ``name`` timing."""
+    timings = _current.get()
+    # Nested calls (a storage save checking whether the name exists) count once
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - start
+        timings.calls[name] += 1
+        timings.active.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.durations['db'] += time.perf_counter() - start
+        # The SQL still has its placeholders, so an N+1 shows up as one statement repeated
+        timings.queries[sql] += 1
+
+
+def add_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_function(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed(name):
+            return func(*args, **kwargs)
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument(owner, attribute, name):
+    value = owner.__dict__.get(attribute) or getattr(owner, attribute)
+    if isinstance(value, property):
+        if not getattr(value.fget, 'timed', False):
+            setattr(owner, attribute, property(timed_function(name, value.fget)))
+    elif not getattr(value, 'timed', False):
+        setattr(owner, attribute, timed_function(name, value))
+
+
+def install():
+    """Hooks the timers into the ORM, DRF and the storage classes. Safe to call more than once."""
+    connection_created.connect(add_query_recorder, dispatch_uid='griot_backend.timing')
+    for connection in connections.all(initialized_only=True):
+        add_query_recorder(connection)
+
+    for serializer_class in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        instrument(serializer_class, 'data', 'serialize')
+    instrument(Response, 'rendered_content', 'render')
+    instrument(APIView, 'check_permissions', 'permissions')
+    instrument(APIView, 'check_object_permissions', 'permissions')
+    # default_storage is lazy, its __class__ is the configured backend's
+    for storage_class in {FileSystemStorage, default_storage.__class__}:
+        for method in STORAGE_METHODS:
+            instrument(storage_class, method, 'storage')
+
+
+def get_budgets():
+    return {
+        'queries': getattr(settings, 'REQUEST_QUERY_BUDGET', 30),
+        'repeated_query': getattr(settings, 'REQUEST_REPEATED_QUERY_BUDGET', 10),
+        'db_ms': getattr(settings, 'REQUEST_DB_TIME_BUDGET_MS', 250),
+        'total_ms': getattr(settings, 'REQUEST_TIME_BUDGET_MS', 1000),
+    }
+
+
+def format_server_timing(timings, total):
+    metrics = [f'db;dur={timings.durations["db"] * 1000:.1f};desc="{timings.query_count} queries"']
+    for name in ('permissions', 'serialize', 'render', 'storage'):
+        if timings.calls[name]:
+            metrics.append(f'{name};dur={timings.durations[name] * 1000:.1f}')
+    metrics.append(f'app;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+class RequestTimingMiddleware:
+    """
+    Records the query count, SQL time and the time spent in permission
+    checks, serializers, rendering and storage calls of each request. Sends
+    them to the client in a Server-Timing header and logs them as one JSON
+    line, at WARNING when the request is over one of the REQUEST_*_BUDGET
+    settings. The ORM hook costs two clock reads per query.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        if getattr(settings, 'REQUEST_TIMING_HEADER', True):
+            response['Server-Timing'] = format_server_timing(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    def log(self, request, response, timings, total):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(getattr(request, 'resolver_match', None), 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'queries': timings.query_count,
+            'repeated_query': timings.most_repeated_query,
+            'db_ms': round(timings.durations['db'] * 1000, 1),
+        }
+        for name in ('permissions', 'serialize', 'render', 'storage'):
+            if timings.calls[name]:
+                record[f'{name}_ms'] = round(timings.durations[name] * 1000, 1)
+
+        budgets = get_budgets()
+        over_budget = [name for name, budget in budgets.items() if budget is not None and record[name] > budget]
+        if over_budget:
+            record['over_budget'] = over_budget
+            logger.warning(orjson.dumps(record).decode())
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(orjson.dumps(record).decode())
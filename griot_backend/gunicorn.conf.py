@@ -1,7 +1,91 @@
-bind = '0.0.0.0:8000'  # Replace 8000 with the desired port number
-workers = 4  # Adjust the number of workers based on your application's needs
+import gc
+import os
+import threading
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+if hasattr(os, 'sched_getaffinity'):
+    cpu_count = len(os.sched_getaffinity(0))
+else:
+    cpu_count = os.cpu_count() or 1
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# SERVER_MODE=asgi (see entrypoint.sh) runs griot_backend.asgi on uvicorn workers. An event
+# loop keeps one core busy, sync workers spend most of their time waiting on the database.
+if os.environ.get('SERVER_MODE') == 'asgi':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = env_int('WEB_CONCURRENCY', cpu_count)
+else:
+    threads = env_int('GUNICORN_THREADS', 1)
+    worker_class = 'gthread' if threads > 1 else 'sync'
+    workers = env_int('WEB_CONCURRENCY', 2 * cpu_count + 1)
+
+# Import the app once in the master, workers then share its pages copy-on-write
+preload_app = True
+
+# Recycle workers to cap slow leaks and fragmentation, jittered so they don't all restart at once
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+# Heartbeat files on tmpfs, a disk-backed /tmp can block workers in containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Seconds between worker memory reports, 0 to only report at startup and exit
+memory_report_interval = env_int('GUNICORN_MEMORY_REPORT_INTERVAL', 300)
 
 # Logging configuration
 accesslog = '-'  # Log to stdout
 errorlog = '-'  # Log to stdout
-loglevel = 'info'  # Adjust log level as needed
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def log_memory(log, label):
+    from griot_backend.memory import format_memory_stats, read_memory_stats
+    log.info('%s memory: %s', label, format_memory_stats(read_memory_stats()))
+
+
+def when_ready(server):
+    try:
+        from django.db import connections
+        # Workers must open their own connections, a socket shared across a fork breaks both ends
+        connections.close_all()
+    except Exception:
+        pass
+    # Objects created so far are never collected, so collections in workers don't
+    # write to (and un-share) the preloaded pages
+    gc.freeze()
+    server.log.info(
+        'Starting %s %s workers on %s CPUs (max_requests=%s, jitter=%s)',
+        server.cfg.workers, server.cfg.worker_class_str, cpu_count, max_requests, max_requests_jitter,
+    )
+    log_memory(server.log, f'Master {os.getpid()}')
+
+
+def post_worker_init(worker):
+    log_memory(worker.log, f'Worker {worker.pid} booted,')
+    if memory_report_interval <= 0:
+        return
+
+    def report():
+        while not stopped.wait(memory_report_interval):
+            log_memory(worker.log, f'Worker {worker.pid} after {getattr(worker, "nr", 0)} requests,')
+
+    stopped = threading.Event()
+    worker.memory_reporter_stopped = stopped
+    threading.Thread(target=report, name='memory-report', daemon=True).start()
+
+
+def worker_exit(server, worker):
+    stopped = getattr(worker, 'memory_reporter_stopped', None)
+    if stopped is not None:
+        stopped.set()
+    log_memory(server.log, f'Worker {worker.pid} exiting after {getattr(worker, "nr", 0)} requests,')
@@ -0,0 +1,79 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs import queue
+
+
+class Worker:
+    def __init__(self, worker_id, poll_interval, stop_event, stdout):
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event
+        self.stdout = stdout
+        self.processed = 0
+
+    def run_pending(self):
+        """Runs due jobs until none are left or the worker is stopped."""
+        while not self.stop_event.is_set():
+            jobs = queue.claim(self.worker_id)
+            if not jobs:
+                return
+            job = jobs[0]
+            result = queue.execute(job)
+            self.processed += 1
+            self.stdout.write(f'[{self.worker_id}] {job.name} #{job.id}: {result}')
+
+    def run(self, burst=False):
+        try:
+            while not self.stop_event.is_set():
+                # Drops connections that broke or outlived CONN_MAX_AGE between polls
+                close_old_connections()
+                self.run_pending()
+                if burst:
+                    return
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'JOB_WORKER_CONCURRENCY', 2))
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOB_POLL_INTERVAL', 1.0))
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            # Finish the running jobs on shutdown instead of abandoning them mid-run
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop_event.set())
+
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        workers = [
+            Worker(f'{prefix}:{index}', options['poll_interval'], stop_event, self.stdout)
+            for index in range(options['concurrency'])
+        ]
+        threads = [threading.Thread(target=worker.run, args=(options['burst'],)) for worker in workers]
+        for thread in threads:
+            thread.start()
+
+        # Stale jobs are released here so that worker threads stay busy with real work
+        alive = threads
+        while alive:
+            released = queue.requeue_stale()
+            if released:
+                self.stdout.write(f'Released {released} stale jobs.')
+            alive[0].join(timeout=getattr(settings, 'JOB_REAP_INTERVAL', 60))
+            alive = [thread for thread in threads if thread.is_alive()]
+        connection.close()
+
+        self.stdout.write(f'Processed {sum(worker.processed for worker in workers)} jobs.')
@@ -0,0 +1,148 @@
+import contextvars
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+_registry = {}
+# The job execute() is running, for tasks that act differently on their last attempt
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=None):
+    """
+    Registers a function as a task that can be enqueued. Arguments must be JSON
+    serializable, so pass ids rather than model instances.
+    """
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__qualname__}'
+        func.task_priority = priority
+        func.task_max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(func, *args, priority=None, run_at=None, delay=None, max_attempts=None, **kwargs):
+    """
+    Inserts a job for a registered task. The row is part of the caller's
+    transaction, so workers only see it once that transaction commits.
+    """
+    if not hasattr(func, 'task_name'):
+        raise UnknownTask(f'{func!r} is not registered with @task.')
+    if run_at is None:
+        run_at = timezone.now()
+    if delay is not None:
+        run_at += timedelta(seconds=delay)
+    if max_attempts is None:
+        max_attempts = func.task_max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5)
+    return Job.objects.create(
+        name=func.task_name,
+        args=list(args),
+        kwargs=kwargs,
+        priority=func.task_priority if priority is None else priority,
+        run_at=run_at,
+        max_attempts=max_attempts,
+    )
+
+
+def claim(worker_id, limit=1):
+    """
+    Locks up to ``limit`` due jobs for this worker. SKIP LOCKED lets concurrent
+    workers claim different rows without waiting on each other.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')
+            .select_for_update(skip_locked=True)[:limit]
+        )
+        if jobs:
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+            )
+    for job in jobs:
+        job.status, job.locked_by, job.locked_at = Job.RUNNING, worker_id, now
+        job.attempts += 1
+    return jobs
+
+
+def get_backoff(attempts):
+    base = getattr(settings, 'JOB_RETRY_BACKOFF', 10)
+    cap = getattr(settings, 'JOB_RETRY_BACKOFF_MAX', 60 * 60)
+    delay = min(base * 2 ** (attempts - 1), cap)
+    # Jitter spreads out retries of jobs that failed together
+    return delay * random.uniform(0.5, 1)
+
+
+def is_last_attempt():
+    """False while the running job would be retried if it raised. Outside a job, always True."""
+    job = _current_job.get()
+    return job is None or job.attempts >= job.max_attempts
+
+
+def execute(job):
+    """Runs a claimed job and records its outcome. Returns the job's new status."""
+    claimed = Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=job.locked_by)
+    try:
+        token = _current_job.set(job)
+        try:
+            get_task(job.name)(*job.args, **job.kwargs)
+        finally:
+            _current_job.reset(token)
+    except UnknownTask:
+        claimed.update(status=Job.FAILED, last_error=f'Unknown task {job.name}.', locked_by='', locked_at=None)
+        return Job.FAILED
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            claimed.update(status=Job.FAILED, last_error=error, locked_by='', locked_at=None)
+            return Job.FAILED
+        claimed.update(
+            status=Job.QUEUED,
+            last_error=error,
+            run_at=timezone.now() + timedelta(seconds=get_backoff(job.attempts)),
+            locked_by='',
+            locked_at=None,
+        )
+        return Job.QUEUED
+
+    if getattr(settings, 'JOB_KEEP_SUCCEEDED', False):
+        claimed.update(status=Job.SUCCEEDED, last_error='', locked_by='', locked_at=None)
+    else:
+        claimed.delete()
+    return Job.SUCCEEDED
+
+
+def requeue_stale(timeout=None):
+    """
+    Hands jobs of workers that died mid-run back to the queue, or fails them
+    once they are out of attempts. Returns the number of jobs released.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'JOB_LOCK_TIMEOUT', 2 * 60 * 60)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='The worker running this job stopped.', locked_by='', locked_at=None,
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_at=None)
+    return failed + requeued
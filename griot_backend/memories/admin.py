@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Memory, Video
+from .models import Memory, Video, VideoUpload
 
 admin.site.register(Memory)
 admin.site.register(Video)
+admin.site.register(VideoUpload)
@@ -1,6 +1,10 @@
+import uuid
+
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from accounts.models import Account
+from griot_backend.managers import ActiveManager
 
 class Memory(models.Model):
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='memories')
@@ -12,14 +16,91 @@ class Memory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True, blank=True)
 
+    objects = models.Manager()
+    # Live rows only, what the partial indexes below cover
+    active = ActiveManager()
+
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', '-created_at', '-id'], condition=Q(is_active=True), name='memory_account_created_idx'),
+            models.Index(fields=['-created_at', '-id'], condition=Q(is_active=True), name='memory_created_idx'),
+            # /api/sync/ reads what changed per account, deleted rows included
+            models.Index(fields=['account', 'updated_at'], name='memory_account_updated_idx'),
+        ]
+
 class Video(models.Model):
+    THUMBNAILS_PENDING = 'pending'
+    THUMBNAILS_READY = 'ready'
+    THUMBNAILS_FAILED = 'failed'
+    THUMBNAIL_STATUS_CHOICES = [
+        (THUMBNAILS_PENDING, 'Pending'),
+        (THUMBNAILS_READY, 'Ready'),
+        (THUMBNAILS_FAILED, 'Failed'),
+    ]
+
+    HLS_PENDING = 'pending'
+    HLS_PROCESSING = 'processing'
+    HLS_READY = 'ready'
+    HLS_FAILED = 'failed'
+    HLS_STATUS_CHOICES = [
+        (HLS_PENDING, 'Pending'),
+        (HLS_PROCESSING, 'Processing'),
+        (HLS_READY, 'Ready'),
+        (HLS_FAILED, 'Failed'),
+    ]
+
     memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name='videos')
     thumbnail = models.FileField(upload_to='thumbnails/', null=True, blank=True)
     file = models.FileField(upload_to='videos/')
 
+    poster = models.FileField(upload_to='posters/', null=True, blank=True)
+    # {size name: storage name} for every size in VIDEO_THUMBNAIL_SIZES
+    thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnail_status = models.CharField(max_length=10, choices=THUMBNAIL_STATUS_CHOICES, default=THUMBNAILS_PENDING)
+
+    # Storage name of the HLS master playlist, set once every rendition is stored
+    hls_playlist = models.CharField(max_length=255, blank=True)
+    # [{'name', 'width', 'height', 'bandwidth', 'playlist'}, ...] from lowest to highest
+    hls_renditions = models.JSONField(default=list, blank=True)
+    hls_status = models.CharField(max_length=10, choices=HLS_STATUS_CHOICES, default=HLS_PENDING)
+
+    is_active = models.BooleanField(default=True, null=False, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+    # Live rows only, what the partial indexes below cover
+    active = ActiveManager()
+
+    class Meta:
+        indexes = [
+            # A memory's videos, in upload order
+            models.Index(fields=['memory', 'id'], condition=Q(is_active=True), name='video_memory_active_idx'),
+            # /api/sync/ reads what changed per memory, deleted rows included
+            models.Index(fields=['memory', 'updated_at'], name='video_memory_updated_idx'),
+        ]
+
+class VideoUpload(models.Model):
+    """A resumable upload whose chunks are staged on local disk until finished."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name='video_uploads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='video_uploads')
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    # [{'offset': int, 'length': int, 'sha256': hex digest}, ...] in upload order
+    chunks = models.JSONField(default=list, blank=True)
+    # Set while a finish request copies the chunks to storage, see api/resumable.py
+    assembling_at = models.DateTimeField(null=True, blank=True)
+
     is_active = models.BooleanField(default=True, null=False, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
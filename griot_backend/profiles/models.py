@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Value
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 
 TIMEZONE_CHOICES = [
     ('UTC', 'Coordinated Universal Time'),
@@ -44,9 +47,33 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Kept in sync on every save; see build_search_vector
+    search_vector = SearchVectorField(null=True, editable=False)
+
     def __str__(self):
         return f'{self.name} {self.last_name}'
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_vector' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['search_vector']
+        self.search_vector = build_search_vector(self.user.email, self.name, self.middle_name, self.last_name)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = 'Profile'
-        verbose_name_plural = 'Profiles'
\ No newline at end of file
+        verbose_name_plural = 'Profiles'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='profile_search_vector_idx'),
+        ]
+
+
+def build_search_vector(email, name, middle_name, last_name):
+    # 'simple' config: names and e-mails must not be stemmed. The e-mail is
+    # parsed as one lexeme, so its local part is indexed on its own as well.
+    email = email or ''
+    return (
+        SearchVector(Value(name or ''), Value(last_name or ''), config='simple', weight='A')
+        + SearchVector(Value(middle_name or ''), config='simple', weight='B')
+        + SearchVector(Value(email), Value(email.split('@')[0]), config='simple', weight='C')
+    )
\ No newline at end of file
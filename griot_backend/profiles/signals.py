@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Profile
+
+
+@receiver(post_save, sender=User)
+def sync_profile_search_vector(sender, instance, created, update_fields=None, **kwargs):
+    # The profile search vector indexes the user's e-mail
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    for profile in Profile.objects.filter(user=instance):
+        profile.user = instance
+        profile.save(update_fields=['search_vector'])
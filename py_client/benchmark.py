@@ -0,0 +1,484 @@
+"""
+Benchmark harness: drives every route in api/urls.py with a weighted mix of
+user flows, reports throughput and p50/p95/p99 latency per endpoint and saves
+the results as JSON, so runs can be compared across commits.
+
+Seed the database first. The manifest it writes tells the load generator
+which users, tokens and objects exist:
+
+    python manage.py seed_benchmark --users 1000 --output benchmark-manifest.json
+
+    python benchmark.py --manifest benchmark-manifest.json --scenario mixed \\
+        --concurrency 20 --duration 60 --output results/$(git rev-parse --short HEAD).json
+
+    python benchmark.py --compare results/1b31e0a.json results/9c74913.json
+
+Users are picked in proportion to how much data they have, so the heavy
+accounts get most of the traffic like they do in production. Flows that
+write create their own accounts, characters, memories and videos and delete
+them again, the seeded data stays the same from one run to the next. The
+direct upload routes need S3 storage, and the HLS playlist route a signed
+storage and transcoded videos. Routes a run could not reach are listed under
+"not exercised".
+"""
+import argparse
+import base64
+import bisect
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+from load_test import percentile
+
+# Route names in api/urls.py
+ROUTES = [
+    'create_user', 'authenticate_user', 'logout_user', 'reset_password', 'reset_password_confirm',
+    'list_accounts', 'retrieve_profile', 'update_profile', 'list-profiles',
+    'create_account', 'update_account', 'delete_account', 'add_beloved_one', 'remove_beloved_one', 'update_beloved_ones', 'list_beloved_ones',
+    'create_character', 'update_character', 'delete_character',
+    'create_memory', 'retrieve_memory', 'update_memory', 'list_memories', 'delete_memory',
+    'upload_memory_video', 'initiate_memory_video_upload', 'complete_memory_video_upload', 'abort_memory_video_upload',
+    'create_resumable_memory_video_upload', 'resumable_memory_video_upload', 'finish_resumable_memory_video_upload',
+    'retrieve_memory_video', 'hls_playlist', 'add_character_to_memory', 'remove_character_from_memory',
+    'update_memory_characters', 'delete_video', 'batch', 'sync',
+]
+
+LAST_NAMES = ['Silva', 'Santos', 'Smith', 'Oliveira', 'Johnson', 'Souza', 'Brown', 'Costa', 'Garcia', 'Pereira']
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def add(self, route, status_code, latency, size, ok):
+        with self.lock:
+            self.samples[route].append((status_code, latency, size, ok))
+
+
+class Client:
+    """One per worker thread: a keep-alive session that times every API call."""
+
+    def __init__(self, base_url, recorder, manifest, rng, upload_size):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.manifest = manifest
+        self.rng = rng
+        self.upload_size = upload_size
+        # Sync cursor per user id, the app's local copy
+        self.cursors = {}
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'br, gzip'
+
+    def call(self, route, method, path, user=None, expected=(200,), **kwargs):
+        headers = kwargs.pop('headers', {})
+        if user is not None:
+            headers['Authorization'] = f'Token {user["token"]}'
+        url = path if path.startswith('http') else self.base_url + path
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=60, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(route, None, time.perf_counter() - start, 0, False)
+            return None
+        latency = time.perf_counter() - start
+        ok = response.status_code in expected
+        self.recorder.add(route, response.status_code, latency, len(response.content), ok)
+        return response if ok else None
+
+    def pick(self, ids):
+        return self.rng.choice(ids) if ids else None
+
+    def video_content(self):
+        return b'\0' * self.upload_size
+
+
+# Flows. Each one is what a user does in one visit to a screen of the app.
+
+def home(client, user):
+    client.call('list_accounts', 'GET', 'user/list-accounts/', user)
+    client.call('retrieve_profile', 'GET', 'profile/retrieve/', user)
+    response = client.call('list_memories', 'GET', 'memory/list/?page_size=50', user)
+    # Scroll to the second page when there is one
+    link = response.headers.get('Link') if response is not None else None
+    if link:
+        client.call('list_memories', 'GET', link[1:link.index('>')], user)
+
+
+def home_batched(client, user):
+    # The home screen and its first videos in one round trip
+    prefix = urlsplit(client.base_url).path
+    paths = ['user/list-accounts/', 'profile/retrieve/', 'memory/list/?page_size=50']
+    paths += [f'memory/video/retrieve/{video}/' for video in user['videos'][:5]]
+    client.call('batch', 'POST', 'batch/', user, json={'requests': [{'path': prefix + path} for path in paths]})
+
+
+def launch_synced(client, user):
+    # An app that keeps a local copy: everything on the first launch, only the changes after
+    cursor = client.cursors.get(user['id'])
+    response = client.call('sync', 'GET', 'sync/', user, params={'since': cursor} if cursor else None)
+    if response is not None:
+        client.cursors[user['id']] = response.json()['cursor']
+
+
+def view_memory(client, user):
+    memory = client.pick(user['memories'])
+    if memory is not None:
+        client.call('retrieve_memory', 'GET', f'memory/retrieve/{memory}/', user)
+    video = client.pick(user['videos'])
+    if video is None:
+        return
+    response = client.call('retrieve_memory_video', 'GET', f'memory/video/retrieve/{video}/', user)
+    if response is not None and '/memory/video/hls/' in response.json()['url']:
+        # Players fetch playlists without the Authorization header
+        client.call('hls_playlist', 'GET', response.json()['url'])
+
+
+def search(client, user):
+    client.call('list-profiles', 'GET', 'profile/list/', user, params={'q': client.rng.choice(LAST_NAMES)})
+
+
+def beloved_ones(client, user):
+    account = client.pick(user['accounts'])
+    client.call('list_beloved_ones', 'GET', f'account/list-beloved-ones/{account}/', user)
+
+
+def edit_profile(client, user):
+    client.call('update_profile', 'PATCH', 'profile/update/', user, json={'middle_name': client.rng.choice(LAST_NAMES)})
+
+
+def manage_account(client, user):
+    response = client.call('create_account', 'POST', 'account/create/', user, expected=(201,), json={'name': 'Benchmark account'})
+    if response is None:
+        return
+    account = response.json()['id']
+    client.call('update_account', 'PATCH', f'account/update/{account}/', user, json={'name': 'Benchmark account (renamed)'})
+    beloved_one = client.rng.choice(client.manifest['users'])['id']
+    if beloved_one != user['id']:
+        client.call('add_beloved_one', 'PATCH', f'account/add-beloved-one/{account}/{beloved_one}/', user)
+        client.call('list_beloved_ones', 'GET', f'account/list-beloved-ones/{account}/', user)
+        client.call('remove_beloved_one', 'PATCH', f'account/remove-beloved-one/{account}/{beloved_one}/', user)
+    # A family onboarded at once, half of them by e-mail
+    users = client.manifest['users']
+    family = [other for other in client.rng.sample(users, min(12, len(users))) if other['id'] != user['id']]
+    client.call('update_beloved_ones', 'PATCH', f'account/update-beloved-ones/{account}/', user, json={
+        'add': [other['email'] if index % 2 else other['id'] for index, other in enumerate(family)],
+    })
+    client.call('update_beloved_ones', 'PATCH', f'account/update-beloved-ones/{account}/', user, json={
+        'remove': [other['id'] for other in family[::2]],
+    })
+    client.call('delete_account', 'DELETE', f'account/delete/{account}/', user, expected=(204,))
+
+
+def manage_character(client, user):
+    account = client.pick(user['accounts'])
+    response = client.call('create_character', 'POST', 'character/create/', user, expected=(201,), json={
+        'account': account, 'name': 'Benchmark character', 'relationship': 'friend',
+    })
+    if response is None:
+        return
+    character = response.json()['id']
+    client.call('update_character', 'PATCH', f'character/update/{character}/', user, json={'relationship': 'family'})
+    client.call('delete_character', 'DELETE', f'character/delete/{character}/', user, expected=(204,))
+
+
+def manage_memory(client, user):
+    account = client.pick(user['accounts'])
+    response = client.call('create_memory', 'POST', 'memory/create/', user, expected=(201,), json={
+        'account': account, 'title': 'Benchmark memory',
+    })
+    if response is None:
+        return
+    memory = response.json()['id']
+    client.call('update_memory', 'PATCH', f'memory/update/{memory}/', user, json={'title': 'Benchmark memory (renamed)'})
+
+    # JSON object keys are strings
+    characters = user['characters'].get(str(account), [])
+    if characters:
+        character = client.pick(characters)
+        client.call('add_character_to_memory', 'PATCH', f'memory/add_character/{memory}/', user, json={'character_id': character})
+        client.call('remove_character_from_memory', 'PATCH', f'memory/remove_character/{memory}/', user, json={'character_id': character})
+        # Everyone in the video at once
+        client.call('update_memory_characters', 'PATCH', f'memory/update_characters/{memory}/', user, json={'add': characters[:8]})
+
+    files = {'file': ('benchmark.mp4', client.video_content(), 'video/mp4')}
+    response = client.call('upload_memory_video', 'POST', 'memory/video/upload/', user, expected=(201,), data={'memory': memory}, files=files)
+    if response is not None:
+        video = response.json()['id']
+        client.call('retrieve_memory_video', 'GET', f'memory/video/retrieve/{video}/', user)
+        client.call('delete_video', 'DELETE', f'video/delete/{video}/', user, expected=(204,))
+    client.call('delete_memory', 'DELETE', f'memory/delete/{memory}/', user, expected=(204,))
+
+
+def resumable_upload(client, user):
+    memory = client.pick(user['memories'])
+    if memory is None:
+        return
+    content = client.video_content()
+    tus = {'Tus-Resumable': '1.0.0'}
+    response = client.call('create_resumable_memory_video_upload', 'POST', 'memory/video/resumable/', user, expected=(201,), json={
+        'memory': memory, 'filename': 'benchmark.mp4', 'size': len(content),
+    })
+    if response is None:
+        return
+    location = response.headers['Location']
+    client.call('resumable_memory_video_upload', 'PATCH', location, user, expected=(204,), data=content, headers={
+        **tus, 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': '0',
+    })
+    client.call('resumable_memory_video_upload', 'HEAD', location, user, headers=tus)
+    response = client.call('finish_resumable_memory_video_upload', 'POST', location.rstrip('/') + '/finish/', user, expected=(201,))
+    if response is not None:
+        client.call('delete_video', 'DELETE', f'video/delete/{response.json()["id"]}/', user, expected=(204,))
+
+
+def direct_upload(client, user):
+    memory = client.pick(user['memories'])
+    if memory is None:
+        return
+    content = client.video_content()
+    body = {'memory': memory, 'filename': 'benchmark.mp4', 'size': len(content)}
+    # Without S3 storage the server answers 400 and the flow stops here
+    response = client.call('initiate_memory_video_upload', 'POST', 'memory/video/upload/initiate/', user, expected=(201, 400), json=body)
+    if response is None or response.status_code != 201:
+        return
+    upload = response.json()
+    parts = []
+    for part in upload['parts']:
+        offset = (part['part_number'] - 1) * upload['part_size']
+        # Goes straight to S3, it isn't one of our endpoints
+        uploaded = client.session.put(part['url'], data=content[offset:offset + upload['part_size']], timeout=60)
+        parts.append({'part_number': part['part_number'], 'etag': uploaded.headers.get('ETag', '')})
+    response = client.call('complete_memory_video_upload', 'POST', 'memory/video/upload/complete/', user, expected=(201,), json={
+        'upload_token': upload['upload_token'], 'parts': parts,
+    })
+    if response is not None:
+        client.call('delete_video', 'DELETE', f'video/delete/{response.json()["id"]}/', user, expected=(204,))
+
+    response = client.call('initiate_memory_video_upload', 'POST', 'memory/video/upload/initiate/', user, expected=(201,), json=body)
+    if response is not None:
+        client.call('abort_memory_video_upload', 'POST', 'memory/video/upload/abort/', user, expected=(204,), json={
+            'upload_token': response.json()['upload_token'],
+        })
+
+
+def sign_up(client, user):
+    # A fresh user, logging out deletes the token the seeded users share between workers
+    username = f'{client.manifest["prefix"]}-signup-{uuid.uuid4().hex[:12]}'
+    email = f'{username}@example.com'
+    password = client.manifest['password'] + '-signup'
+    client.call('create_user', 'POST', 'user/create/', expected=(201,), json={
+        'username': username, 'password': password, 'email': email,
+    })
+    response = client.call('authenticate_user', 'POST', 'user/auth/', json={'username': username, 'password': password})
+    if response is not None:
+        client.call('logout_user', 'POST', 'user/logout/', {'token': response.json()['token']})
+    client.call('reset_password', 'POST', 'user/password-reset/', json={'email': email})
+    # The reset token is only in the e-mail, so this measures the rejection path
+    uidb64 = base64.urlsafe_b64encode(str(user['id']).encode()).decode().rstrip('=')
+    client.call('reset_password_confirm', 'POST', f'user/password-reset-confirm/{uidb64}/invalid-token/', expected=(400,), json={
+        'new_password': password,
+    })
+
+
+FLOWS = {
+    'home': home,
+    'home_batched': home_batched,
+    'launch_synced': launch_synced,
+    'view_memory': view_memory,
+    'search': search,
+    'beloved_ones': beloved_ones,
+    'edit_profile': edit_profile,
+    'manage_account': manage_account,
+    'manage_character': manage_character,
+    'manage_memory': manage_memory,
+    'resumable_upload': resumable_upload,
+    'direct_upload': direct_upload,
+    'sign_up': sign_up,
+}
+
+# Relative weights of the flows
+SCENARIOS = {
+    'read': {'home': 40, 'view_memory': 40, 'search': 10, 'beloved_ones': 10},
+    # The same reads with the home screen as one /api/batch/ call
+    'read_batched': {'home_batched': 40, 'view_memory': 40, 'search': 10, 'beloved_ones': 10},
+    # The same reads with the home screen served from a synced local copy
+    'read_synced': {'launch_synced': 40, 'view_memory': 40, 'search': 10, 'beloved_ones': 10},
+    'mixed': {
+        'home': 30, 'view_memory': 30, 'search': 8, 'beloved_ones': 7, 'edit_profile': 5, 'manage_account': 4,
+        'manage_character': 4, 'manage_memory': 6, 'resumable_upload': 2, 'direct_upload': 1, 'sign_up': 3,
+    },
+    'write': {
+        'edit_profile': 15, 'manage_account': 20, 'manage_character': 20, 'manage_memory': 25,
+        'resumable_upload': 8, 'direct_upload': 4, 'sign_up': 8,
+    },
+    # Every flow equally often, to check that each endpoint still works
+    'coverage': {name: 1 for name in FLOWS},
+}
+
+
+def run(args, manifest):
+    recorder = Recorder()
+    scenario = SCENARIOS[args.scenario]
+    flows = [FLOWS[name] for name in scenario]
+    flow_weights = list(itertools.accumulate(scenario.values()))
+    users = manifest['users']
+    # Busy users send more requests
+    user_weights = list(itertools.accumulate(len(user['memories']) + len(user['beloved_accounts']) + 1 for user in users))
+    deadline = time.perf_counter() + args.duration
+    remaining = itertools.count()
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = Client(args.url, recorder, manifest, rng, args.upload_size)
+        while time.perf_counter() < deadline:
+            if args.iterations and next(remaining) >= args.iterations:
+                break
+            flow = flows[bisect.bisect(flow_weights, rng.random() * flow_weights[-1])]
+            user = users[bisect.bisect(user_weights, rng.random() * user_weights[-1])]
+            flow(client, user)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    return recorder, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(latency for _, latency, _, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, _, ok in samples if not ok),
+        'throughput': round(len(samples) / elapsed, 2),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'mean_bytes': round(statistics.mean(size for _, _, size, _ in samples)),
+        'statuses': dict(Counter(str(status_code) for status_code, _, _, _ in samples)),
+    }
+
+
+def git(*command):
+    try:
+        return subprocess.run(
+            ['git', *command], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_results(args, manifest, recorder, elapsed):
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        'meta': {
+            'commit': args.commit or git('rev-parse', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')) if not args.commit else None,
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'url': args.url,
+            'scenario': args.scenario,
+            'concurrency': args.concurrency,
+            'duration': round(elapsed, 2),
+            'seed': args.seed,
+            'upload_size': args.upload_size,
+            'data': manifest['counts'],
+            'client_host': platform.node(),
+        },
+        'total': summarize(all_samples, elapsed) if all_samples else None,
+        'endpoints': {route: summarize(recorder.samples[route], elapsed) for route in ROUTES if recorder.samples[route]},
+        'not_exercised': [route for route in ROUTES if not recorder.samples[route]],
+    }
+
+
+def print_report(results):
+    meta = results['meta']
+    print(f'{meta["scenario"]} scenario, concurrency {meta["concurrency"]}, {meta["duration"]} s, commit {(meta["commit"] or "unknown")[:10]}')
+    header = f'{"endpoint":40} {"requests":>8} {"errors":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+    print(header)
+    print('-' * len(header))
+    rows = list(results['endpoints'].items())
+    if results['total']:
+        rows.append(('total', results['total']))
+    for route, stats in rows:
+        print(
+            f'{route:40} {stats["requests"]:8} {stats["errors"]:6} {stats["throughput"]:8.1f}'
+            f' {stats["p50_ms"]:8.1f} {stats["p95_ms"]:8.1f} {stats["p99_ms"]:8.1f}'
+        )
+    if results['not_exercised']:
+        print(f'Not exercised: {", ".join(results["not_exercised"])}')
+
+
+def change(old, new):
+    if not old:
+        return '     n/a'
+    return f'{(new - old) / old * 100:+7.1f}%'
+
+
+def compare(baseline_path, candidate_path):
+    with open(baseline_path) as baseline_file, open(candidate_path) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+    print(f'{(baseline["meta"]["commit"] or baseline_path)[:10]} -> {(candidate["meta"]["commit"] or candidate_path)[:10]}')
+    header = f'{"endpoint":40} {"req/s":>17} {"p50 ms":>17} {"p95 ms":>17} {"p99 ms":>17}'
+    print(header)
+    print('-' * len(header))
+    for route in ROUTES + ['total']:
+        old = baseline['total'] if route == 'total' else baseline['endpoints'].get(route)
+        new = candidate['total'] if route == 'total' else candidate['endpoints'].get(route)
+        if not old or not new:
+            continue
+        columns = [
+            f'{new[key]:8.1f} {change(old[key], new[key])}'
+            for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms')
+        ]
+        print(f'{route:40} ' + ' '.join(columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000/api/')
+    parser.add_argument('--manifest', default='benchmark-manifest.json', help='Written by manage.py seed_benchmark.')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run for.')
+    parser.add_argument('--iterations', type=int, default=0, help='Stop after this many flows, 0 for no limit.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--upload-size', type=int, default=64 * 1024)
+    parser.add_argument('--commit', help='Commit the server runs, when it is not this checkout\'s HEAD.')
+    parser.add_argument('--output', help='Save the results as JSON.')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'), help='Compare two saved runs and exit.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if not args.url.endswith('/'):
+        args.url += '/'
+    with open(args.manifest) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    recorder, elapsed = run(args, manifest)
+    results = build_results(args, manifest, recorder, elapsed)
+    print_report(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Results saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Concurrent load test for the I/O-bound endpoints, to compare serving modes.
+
+Start the server with a single worker in each mode and run the same test:
+
+    SERVER_MODE=wsgi gunicorn griot_backend.wsgi:application -w 1
+    SERVER_MODE=asgi gunicorn griot_backend.asgi:application -w 1 -k uvicorn_worker.UvicornWorker
+
+    python load_test.py --token <token> --memory 1 --video 1 --concurrency 50 --requests 1000
+
+A sync worker serves one request at a time, so its throughput stays flat as
+concurrency grows while latency climbs. An async worker keeps accepting
+connections while requests wait on storage or the database.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+base_url = "http://127.0.0.1:8000/api/"
+
+_local = threading.local()
+
+
+def get_session(token):
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+        if token:
+            _local.session.headers['Authorization'] = f'Token {token}'
+    return _local.session
+
+
+def retrieve(args, index):
+    return get_session(args.token).get(base_url + f"memory/video/retrieve/{args.video}/")
+
+
+def upload(args, index):
+    files = {'file': (f'load-test-{index}.mp4', b'\0' * args.upload_size, 'video/mp4')}
+    return get_session(args.token).post(base_url + "memory/video/upload/", data={'memory': args.memory}, files=files)
+
+
+def password_reset(args, index):
+    return get_session(args.token).post(base_url + "user/password-reset/", data={'email': args.email})
+
+
+SCENARIOS = {
+    'retrieve': retrieve,
+    'upload': upload,
+    'password-reset': password_reset,
+}
+
+
+def timed(scenario, args, index):
+    start = time.perf_counter()
+    try:
+        status_code = scenario(args, index).status_code
+    except requests.RequestException:
+        status_code = None
+    return status_code, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    global base_url
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=base_url)
+    parser.add_argument('--token', help='Auth token of the memory owner.')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='retrieve')
+    parser.add_argument('--memory', type=int, help='Memory to upload videos to.')
+    parser.add_argument('--video', type=int, help='Video to retrieve.')
+    parser.add_argument('--email', default='nobody@example.com')
+    parser.add_argument('--upload-size', type=int, default=256 * 1024)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+    base_url = args.url
+
+    scenario = SCENARIOS[args.scenario]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda index: timed(scenario, args, index), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    codes = {}
+    for status_code, _ in results:
+        codes[status_code] = codes.get(status_code, 0) + 1
+
+    print(f'Scenario: {args.scenario}, concurrency {args.concurrency}, {args.requests} requests')
+    print(f'Status codes: {codes}')
+    print(f'Throughput: {args.requests / elapsed:.1f} req/s')
+    print(
+        f'Latency: mean {statistics.mean(latencies) * 1000:.1f} ms, '
+        f'p50 {percentile(latencies, 0.5) * 1000:.1f} ms, '
+        f'p95 {percentile(latencies, 0.95) * 1000:.1f} ms, '
+        f'p99 {percentile(latencies, 0.99) * 1000:.1f} ms'
+    )
+
+
+if __name__ == '__main__':
+    main()